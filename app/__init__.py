@@ -1,7 +1,7 @@
 from flask import Flask
 from flask_pymongo import PyMongo
+from werkzeug.local import LocalProxy
 import logging
-from datetime import datetime, timezone
 
 # Configure logging
 logging.basicConfig(
@@ -10,54 +10,59 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object('app.config')
+# MongoDB extension (bound to the app in create_app)
+mongo = PyMongo()
 
-# Initialize MongoDB
-mongo = PyMongo(app)
-db = mongo.db
+# Database handle for models and services. It is resolved on each use, so
+# modules can import it before the app and its Mongo client exist.
+db = LocalProxy(lambda: mongo.db)
 
-# Add datetime utility to db for use in queries
-db.datetime = datetime
-
-# Import and register routes
-from app.routes import register_routes
-register_routes(app)
-
-# Import scheduler (for background tasks)
-from app.services.scheduler import SchedulerService
-
-# Create global scheduler instance
-scheduler = SchedulerService()
-
-# Start scheduler when app starts
-@app.before_first_request
-def start_scheduler():
-    scheduler.start()
-
-# Create database indexes
-@app.before_first_request
-def create_indexes():
-    # User indexes
-    db.users.create_index('email', unique=True)
-    
-    # Listing indexes
-    db.listings.create_index('external_id', unique=True)
-    db.listings.create_index('address')
-    db.listings.create_index('status')
-    db.listings.create_index('date_found')
-    
-    # Match indexes
-    db.matches.create_index([('user_id', 1), ('listing_id', 1)], unique=True)
-    db.matches.create_index('status')
-    db.matches.create_index('contacted')
-    db.matches.create_index('date_matched')
-    
-    # Communication indexes
-    db.communications.create_index([('user_id', 1), ('listing_id', 1)])
-    db.communications.create_index('status')
-    db.communications.create_index('created_at')
-
-# Export flask app
-from app import routes
\ No newline at end of file
+def create_app(config=None):
+    """
+    Create and configure the Flask app
+    
+    Services are not built here; they are created on first use in each
+    worker process (see app.services), which keeps startup and forking cheap.
+    
+    Args:
+        config: Optional dict of config overrides (e.g. for tests)
+        
+    Returns:
+        Flask: The configured app
+    """
+    app = Flask(__name__)
+    app.config.from_object('app.config')
+    if config:
+        app.config.update(config)
+    
+    # Encode responses with orjson (when installed), with ObjectId and model support
+    from app.utils.serialization import JSONProvider
+    app.json = JSONProvider(app)
+    
+    # Record query shapes for the index advisor when enabled
+    event_listeners = []
+    if app.config.get('INDEX_ADVISOR_LOG'):
+        from app.index_advisor import QueryShapeRecorder
+        event_listeners.append(QueryShapeRecorder(app.config['INDEX_ADVISOR_LOG']))
+    
+    # Initialize MongoDB. The client connects on first query, so an app built
+    # before forking (gunicorn --preload) gives each worker a client that
+    # hasn't started its monitor threads or opened sockets yet
+    mongo.init_app(app, connect=False, event_listeners=event_listeners)
+    
+    # Import and register routes
+    from app.routes import register_routes
+    register_routes(app)
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Start the background scheduler when the app starts serving
+    if app.config.get('SCHEDULER_ENABLED'):
+        @app.before_first_request
+        def start_scheduler():
+            from app.services import get_scheduler
+            get_scheduler().start()
+    
+    return app
@@ -1,10 +1,13 @@
-import openai
 import logging
-from app.config import OPENAI_API_KEY
+from app.config import OPENAI_API_KEY, OPENAI_MAX_IN_FLIGHT
 
 class OpenAIClient:
     def __init__(self, api_key=OPENAI_API_KEY):
+        # Imported here rather than at module level because the openai
+        # package is slow to import and only needed once a client exists
+        import openai
         openai.api_key = api_key
+        self.openai = openai
     
     def generate_email(self, template_type, context):
         """
@@ -13,6 +16,16 @@ class OpenAIClient:
         template_type: String indicating email type ('initial_outreach', 'follow_up', etc.)
         context: Dict containing data to include in the email
         """
+        try:
+            response = self.openai.ChatCompletion.create(**self._email_request(template_type, context))
+            return response.choices[0].message.content
+        except Exception as e:
+            logging.error(f"OpenAI API error: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _email_request(template_type, context):
+        """Build the chat completion arguments for generate_email"""
         prompts = {
             'initial_outreach': f"""
             Write a professional email to inquire about a rental property. Be friendly but concise.
@@ -65,20 +78,15 @@ class OpenAIClient:
             """
         }
         
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an assistant helping a tenant find rental properties. Write professional, clear, and concise emails."},
-                    {"role": "user", "content": prompts.get(template_type, "Write a professional email.")}
-                ],
-                max_tokens=600,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logging.error(f"OpenAI API error: {str(e)}")
-            return None
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are an assistant helping a tenant find rental properties. Write professional, clear, and concise emails."},
+                {"role": "user", "content": prompts.get(template_type, "Write a professional email.")}
+            ],
+            "max_tokens": 600,
+            "temperature": 0.7
+        }
             
     def analyze_email_response(self, email_content):
         """
@@ -107,7 +115,7 @@ class OpenAIClient:
             Return your analysis as JSON.
             """
             
-            response = openai.ChatCompletion.create(
+            response = self.openai.ChatCompletion.create(
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": "You are an AI assistant that analyzes emails and extracts structured information."},
@@ -144,4 +152,47 @@ class OpenAIClient:
                 "contact_phone": None,
                 "intent": "error",
                 "sentiment": "neutral"
-            }
\ No newline at end of file
+            }
+
+class AsyncOpenAIClient(OpenAIClient):
+    """
+    OpenAI client for the ASGI app: the same prompts as OpenAIClient, with
+    awaitable calls sharing one HTTP session, so a worker can wait on many
+    completions at once without a thread for each
+    """
+    
+    def __init__(self, api_key=OPENAI_API_KEY, max_connections=OPENAI_MAX_IN_FLIGHT):
+        super().__init__(api_key)
+        self.max_connections = max_connections
+        self._session = None
+    
+    async def generate_email(self, template_type, context):
+        """
+        Generate an email using GPT-4 (see OpenAIClient.generate_email)
+        
+        Returns:
+            str: Email content, or None if the call failed
+        """
+        # The openai package reads its HTTP session from a context variable
+        token = self.openai.aiosession.set(self._get_session())
+        try:
+            response = await self.openai.ChatCompletion.acreate(**self._email_request(template_type, context))
+            return response.choices[0].message.content
+        except Exception as e:
+            logging.error(f"OpenAI API error: {str(e)}")
+            return None
+        finally:
+            self.openai.aiosession.reset(token)
+    
+    async def close(self):
+        """Close the HTTP session (call before the event loop stops)"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    def _get_session(self):
+        # Created on first use, as it must be created inside the event loop
+        if self._session is None:
+            import aiohttp
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections))
+        return self._session
@@ -0,0 +1,183 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from a2wsgi import WSGIMiddleware
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from itsdangerous import BadSignature
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from app import create_app
+from app.config import ASGI_WSGI_THREADS, LISTING_INDEX_WARM_TIMEOUT_SECONDS
+from app.models.base import RAW_CODEC_OPTIONS
+from app.models.listing import Listing
+from app.models.user import User
+from app.services import get_listing_index
+from app.services.async_email_service import AsyncEmailService
+from app.utils.admission import Overloaded, check_rate_limit_async, provider_gate, record_rejection
+
+def create_asgi_app(config=None):
+    """
+    Create the ASGI app
+    
+    Endpoints that spend most of their time waiting on external services
+    have async versions here, served on the event loop with Motor and the
+    async OpenAI client. Every other request goes to the Flask app from
+    create_app, run on a pool of ASGI_WSGI_THREADS threads, so both modes
+    share the same routes, services and session cookie.
+    
+    Args:
+        config: Optional dict of config overrides (e.g. for tests)
+    
+    Returns:
+        Starlette: The ASGI app
+    """
+    flask_app = create_app(config)
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        # Motor clients belong to the event loop they're first used on
+        client = AsyncIOMotorClient(flask_app.config['MONGO_URI'])
+        app.state.db = client.get_default_database()
+        app.state.email_service = AsyncEmailService(app.state.db)
+        
+        # Load the listing index before serving, off the event loop
+        index = get_listing_index()
+        index.start()
+        await asyncio.get_running_loop().run_in_executor(None, index.wait_loaded, LISTING_INDEX_WARM_TIMEOUT_SECONDS)
+        try:
+            yield
+        finally:
+            await app.state.email_service.close()
+            client.close()
+    
+    app = Starlette(
+        routes=[
+            Route('/api/communications/draft/{listing_id}', create_draft, methods=['POST']),
+            Mount('/', app=WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS))
+        ],
+        lifespan=lifespan
+    )
+    app.state.flask_app = flask_app
+    return app
+
+async def create_draft(request):
+    """Create a draft email for a listing (async version of the communications route)"""
+    flask_app = request.app.state.flask_app
+    adb = request.app.state.db
+    
+    user_id = session_user_id(flask_app, request)
+    if not user_id:
+        return json_response(flask_app, {"error": "Not logged in"}, 401)
+    
+    retry_after = await check_rate_limit_async(adb, "draft", user_id)
+    if retry_after:
+        record_rejection("draft", "rate_limit")
+        return too_many_requests(flask_app, "Rate limit exceeded, try again later", retry_after)
+    
+    user = await find_model(adb, User, user_id)
+    if not user:
+        return json_response(flask_app, {"error": "User not found"}, 404)
+    
+    listing_id = request.path_params['listing_id']
+    listing = await find_model(adb, Listing, listing_id)
+    if not listing:
+        return json_response(flask_app, {"error": "Listing not found"}, 404)
+    
+    # Check if there's already a draft
+    existing_draft = await adb.communications.find_one({
+        "user_id": user._id,
+        "listing_id": listing._id,
+        "direction": "outgoing",
+        "status": "draft"
+    })
+    
+    if existing_draft:
+        return json_response(flask_app, {
+            "message": "Draft already exists",
+            "communication": {
+                "id": str(existing_draft["_id"]),
+                "subject": existing_draft["subject"],
+                "content": existing_draft["content"],
+                "recipient": existing_draft["recipient"],
+                "created_at": existing_draft["created_at"]
+            }
+        })
+    
+    try:
+        data = await request.json()
+    except ValueError:
+        return json_response(flask_app, {"error": "Invalid JSON body"}, 400)
+    
+    email_type = data.get('type', 'initial_outreach')
+    if email_type not in ('initial_outreach', 'follow_up'):
+        return json_response(flask_app, {"error": "Invalid email type"}, 400)
+    
+    email_service = request.app.state.email_service
+    try:
+        async with provider_gate.slot_async(adb, "openai"):
+            if email_type == 'initial_outreach':
+                communication = await email_service.create_initial_contact_email(user, listing)
+            else:
+                # Find the initial contact date
+                initial_comm = await adb.communications.find_one({
+                    "user_id": user._id,
+                    "listing_id": listing._id,
+                    "direction": "outgoing",
+                    "status": "sent"
+                }, sort=[("created_at", 1)])
+                
+                initial_date = initial_comm.get("sent_at") if initial_comm else datetime.utcnow()
+                
+                communication = await email_service.create_follow_up_email(user, listing, initial_date)
+    except Overloaded as e:
+        return too_many_requests(flask_app, str(e), e.retry_after)
+    
+    if not communication:
+        return json_response(flask_app, {"error": "Failed to create email draft"}, 500)
+    
+    return json_response(flask_app, {
+        "message": "Draft created successfully",
+        "communication": {
+            "id": str(communication._id),
+            "subject": communication.subject,
+            "content": communication.content,
+            "recipient": communication.recipient,
+            "created_at": communication.created_at
+        }
+    })
+
+def session_user_id(flask_app, request):
+    """Get the logged-in user's ID from the Flask session cookie (None if absent or invalid)"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return None
+    
+    try:
+        session = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return session.get('user_id')
+
+async def find_model(adb, model, model_id):
+    """Find a model instance by ID with Motor (None if not found or the ID is invalid)"""
+    try:
+        query = {"_id": ObjectId(model_id)}
+    except InvalidId:
+        return None
+    
+    raw = await adb.get_collection(model.COLLECTION, codec_options=RAW_CODEC_OPTIONS).find_one(query)
+    return model.from_raw(raw) if raw else None
+
+def json_response(flask_app, payload, status=200, headers=None):
+    """Build a JSON response encoded like Flask's (ObjectIds, HTTP dates)"""
+    return Response(flask_app.json.dumps(payload) + "\n", status_code=status, headers=headers,
+                    media_type=flask_app.json.mimetype)
+
+def too_many_requests(flask_app, message, retry_after):
+    """Build a 429 response telling the client when to retry"""
+    return json_response(flask_app, {"error": message, "retry_after": retry_after}, 429,
+                         {"Retry-After": str(retry_after)})
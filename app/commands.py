@@ -0,0 +1,226 @@
+import json
+import time
+import threading
+import click
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from app.index_advisor import advise, load_shapes
+from app.models.listing_raw import ListingRaw
+from app.models.user import User
+from app.models.user_stats import UserStats
+from app.services import get_archive_service, get_listing_expiry_service, get_matching_service
+from app.utils.geo import point
+from app.utils.address import blocking_key, normalize_address
+from app.indexes import (
+    ensure_collections, index_name, index_options, missing_indexes, unregistered_indexes,
+    index_build_progress
+)
+from app import db
+
+# Seconds between progress reports while an index builds
+PROGRESS_INTERVAL = 5
+
+def register_commands(app):
+    """Register maintenance commands with the Flask CLI"""
+    @app.cli.command('index-advisor')
+    @click.argument('shapes_path')
+    def index_advisor(shapes_path):
+        """
+        Explain query shapes recorded with INDEX_ADVISOR_LOG and flag
+        collection scans and unused indexes
+        """
+        report = advise(db, load_shapes(shapes_path))
+        
+        for entry in report["collscans"]:
+            click.echo(f"COLLSCAN {entry['collection']}.{entry['command_name']}: {json.dumps(entry['shape'], sort_keys=True)}")
+        
+        for entry in report["unused_indexes"]:
+            note = " (unique constraint)" if entry["unique"] else ""
+            note += "" if entry["registered"] else " (not in registry)"
+            click.echo(f"UNUSED {entry['collection']}.{entry['index']}{note}")
+        
+        for entry in report["errors"]:
+            click.echo(f"ERROR {entry['collection']}: {entry['error']}")
+        
+        click.echo(f"{len(report['collscans'])} collection scans, {len(report['unused_indexes'])} unused indexes")
+    
+    @app.cli.command('bootstrap-indexes')
+    @click.option('--drop-unregistered', is_flag=True, help='Drop indexes that are not in the registry')
+    def bootstrap_indexes(drop_unregistered):
+        """
+        Build missing registry indexes ahead of serving traffic, reporting
+        progress while each build runs
+        """
+        for collection_name in ensure_collections(db):
+            click.echo(f"Created collection {collection_name}")
+        
+        missing = missing_indexes(db)
+        click.echo(f"{len(missing)} index(es) to build")
+        
+        # Progress needs the inprog privilege, which least-privilege users lack
+        report_progress = True
+        
+        for position, (collection_name, spec) in enumerate(missing, start=1):
+            name = f"{collection_name}.{index_name(spec)}"
+            click.echo(f"[{position}/{len(missing)}] Building {name}")
+            
+            errors = []
+            
+            def build():
+                try:
+                    db[collection_name].create_index(spec["keys"], **index_options(spec))
+                except Exception as e:
+                    errors.append(e)
+            
+            started = time.monotonic()
+            builder = threading.Thread(target=build, daemon=True)
+            builder.start()
+            
+            while builder.is_alive():
+                builder.join(PROGRESS_INTERVAL)
+                if builder.is_alive() and report_progress:
+                    try:
+                        messages = index_build_progress(db, collection_name)
+                    except OperationFailure as e:
+                        click.echo(f"    Build progress unavailable ({e}), waiting for builds to finish")
+                        report_progress = False
+                        continue
+                    for message in messages:
+                        click.echo(f"    {message}")
+            
+            if errors:
+                raise click.ClickException(f"Failed to build {name}: {errors[0]}")
+            
+            click.echo(f"    done in {time.monotonic() - started:.1f}s")
+        
+        for collection_name, name in unregistered_indexes(db):
+            if drop_unregistered:
+                db[collection_name].drop_index(name)
+                click.echo(f"Dropped unregistered index {collection_name}.{name}")
+            else:
+                click.echo(f"Unregistered index {collection_name}.{name} (use --drop-unregistered to drop)")
+        
+        click.echo("Indexes ready")
+    
+    @app.cli.command('migrate-listing-raw')
+    @click.option('--batch-size', default=500, show_default=True)
+    def migrate_listing_raw(batch_size):
+        """Move raw API payloads embedded in listings to the listing_raw collection"""
+        size_before = db.command("collStats", "listings")["size"]
+        migrated = 0
+        
+        while True:
+            listings = list(db.listings.find(
+                {"metadata": {"$exists": True}},
+                {"metadata": 1}
+            ).limit(batch_size))
+            
+            if not listings:
+                break
+            
+            db.listings.bulk_write([
+                UpdateOne(
+                    {"_id": listing["_id"]},
+                    {
+                        "$set": {"raw_id": ListingRaw.store(listing["metadata"])},
+                        "$unset": {"metadata": ""}
+                    }
+                )
+                for listing in listings
+            ], ordered=False)
+            
+            migrated += len(listings)
+            click.echo(f"Migrated {migrated} listings")
+        
+        size_after = db.command("collStats", "listings")["size"]
+        click.echo(f"listings data size: {size_before / 1024 / 1024:.1f} MiB -> {size_after / 1024 / 1024:.1f} MiB")
+    
+    @app.cli.command('score-matches')
+    def score_matches():
+        """Compute fit scores for every user's matches (e.g. after deploying scoring)"""
+        scoring_service = get_matching_service().scoring_service
+        updated = 0
+        
+        for user_data in db.users.find({}, {"rental_preferences": 1}):
+            updated += scoring_service.score_user_matches(User(**user_data))
+        
+        click.echo(f"Updated {updated} match scores")
+    
+    @app.cli.command('backfill-listing-locations')
+    @click.option('--batch-size', default=500, show_default=True)
+    def backfill_listing_locations(batch_size):
+        """Store GeoJSON locations on listings ingested before they were kept"""
+        def update(listing):
+            latitude, longitude = listing.get("latitude"), listing.get("longitude")
+            if latitude is None and listing.get("raw_id"):
+                payload = ListingRaw.load(listing["raw_id"]) or {}
+                latitude, longitude = payload.get("latitude"), payload.get("longitude")
+            
+            return {
+                "$set": {"location": point(latitude, longitude)},
+                "$unset": {"latitude": "", "longitude": ""}
+            }
+        
+        _backfill_listings("location", {"raw_id": 1, "latitude": 1, "longitude": 1}, update, batch_size)
+    
+    @app.cli.command('backfill-address-keys')
+    @click.option('--batch-size', default=500, show_default=True)
+    def backfill_address_keys(batch_size):
+        """Store canonical address keys on listings ingested before they were kept"""
+        def update(listing):
+            address_key = normalize_address(listing.get("address"))
+            return {"$set": {"address_key": address_key, "address_block": blocking_key(address_key)}}
+        
+        _backfill_listings("address_key", {"address": 1}, update, batch_size)
+    
+    @app.cli.command('expire-listings')
+    def expire_listings():
+        """Expire listings that ingestion hasn't seen within LISTING_EXPIRY_DAYS"""
+        result = get_listing_expiry_service().run_sweep()
+        click.echo(f"Expired {result['expired_listings']} listings and {result['expired_matches']} matches")
+    
+    @app.cli.command('archive-records')
+    def archive_records():
+        """Move matches and communications past their retention to the archive collections"""
+        result = get_archive_service().run()
+        for collection_name, archived in result.items():
+            click.echo(f"Archived {archived} {collection_name}")
+    
+    @app.cli.command('reconcile-user-stats')
+    @click.option('--batch-size', default=500, show_default=True)
+    def reconcile_user_stats(batch_size):
+        """Rebuild every user's dashboard counters from matches and communications"""
+        reconciled = UserStats.rebuild_all(batch_size)
+        click.echo(f"Reconciled dashboard counters for {reconciled} users")
+
+
+def _backfill_listings(field, projection, update, batch_size):
+    """
+    Set a new field on every listing that doesn't have it yet, in batches
+    
+    Args:
+        field: Field the backfill sets (listings that have it are skipped)
+        projection: Listing fields update reads
+        update: Function building the update for a listing
+        batch_size: Listings per bulk write
+    """
+    updated = 0
+    last_id = None
+    
+    while True:
+        query = {field: {"$exists": False}}
+        if last_id:
+            query["_id"] = {"$gt": last_id}
+        
+        listings = list(db.listings.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not listings:
+            break
+        last_id = listings[-1]["_id"]
+        
+        db.listings.bulk_write([
+            UpdateOne({"_id": listing["_id"]}, update(listing))
+            for listing in listings
+        ], ordered=False)
+        
+        updated += len(listings)
+        click.echo(f"Updated {updated} listings")
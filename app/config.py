@@ -4,6 +4,12 @@ import os
 SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
 DEBUG = True
 
+# Seconds to cache the logged-in user's document between requests
+SESSION_USER_CACHE_SECONDS = int(os.environ.get('SESSION_USER_CACHE_SECONDS') or 30)
+
+# Background scheduler configuration
+SCHEDULER_ENABLED = (os.environ.get('SCHEDULER_ENABLED') or 'True') == 'True'
+
 # MongoDB configuration
 MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/rental_agent'
 
@@ -18,4 +24,59 @@ EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD') or 'your-email-password'
 EMAIL_USE_TLS = True
 
 # OpenAI API configuration
-OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or 'your-openai-api-key-here'
\ No newline at end of file
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or 'your-openai-api-key-here'
+
+# Listing ingestion configuration (zlib-compress raw API payloads)
+LISTING_RAW_COMPRESSION = (os.environ.get('LISTING_RAW_COMPRESSION') or 'True') == 'True'
+
+# Listing search index configuration (seconds between incremental refreshes)
+LISTING_INDEX_REFRESH_SECONDS = int(os.environ.get('LISTING_INDEX_REFRESH_SECONDS') or 60)
+# Longest a starting worker waits for the listing index to load before serving anyway
+LISTING_INDEX_WARM_TIMEOUT_SECONDS = int(os.environ.get('LISTING_INDEX_WARM_TIMEOUT_SECONDS') or 20)
+
+# Listing expiry configuration (days a listing can go unseen by ingestion before it expires)
+LISTING_EXPIRY_DAYS = int(os.environ.get('LISTING_EXPIRY_DAYS') or 14)
+LISTING_EXPIRY_BATCH_SIZE = int(os.environ.get('LISTING_EXPIRY_BATCH_SIZE') or 1000)
+LISTING_EXPIRY_SWEEP_HOURS = int(os.environ.get('LISTING_EXPIRY_SWEEP_HOURS') or 6)
+
+# Archive configuration (days before finished matches and communications move to *_archive)
+MATCH_ARCHIVE_DAYS = int(os.environ.get('MATCH_ARCHIVE_DAYS') or 90)
+COMMUNICATION_ARCHIVE_DAYS = int(os.environ.get('COMMUNICATION_ARCHIVE_DAYS') or 365)
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE') or 1000)
+
+# Match status write-behind configuration (flush buffered "viewed" updates every N ms or M items)
+MATCH_STATUS_FLUSH_MS = int(os.environ.get('MATCH_STATUS_FLUSH_MS') or 500)
+MATCH_STATUS_FLUSH_ITEMS = int(os.environ.get('MATCH_STATUS_FLUSH_ITEMS') or 100)
+
+# Manual refresh jobs (background threads per worker, seconds without progress before a job counts as dead,
+# hours finished jobs are kept, seconds a progress event stream stays open before the client reconnects)
+REFRESH_JOB_WORKERS = int(os.environ.get('REFRESH_JOB_WORKERS') or 2)
+REFRESH_JOB_STALE_SECONDS = int(os.environ.get('REFRESH_JOB_STALE_SECONDS') or 300)
+REFRESH_JOB_RETENTION_HOURS = int(os.environ.get('REFRESH_JOB_RETENTION_HOURS') or 24)
+REFRESH_EVENTS_TIMEOUT_SECONDS = int(os.environ.get('REFRESH_EVENTS_TIMEOUT_SECONDS') or 15)
+
+# Admission control (per-user request budgets over a sliding window, and calls each worker
+# may have in flight to each provider before shedding requests with 429)
+REFRESH_RATE_LIMIT = int(os.environ.get('REFRESH_RATE_LIMIT') or 5)
+REFRESH_RATE_WINDOW_SECONDS = int(os.environ.get('REFRESH_RATE_WINDOW_SECONDS') or 300)
+DRAFT_RATE_LIMIT = int(os.environ.get('DRAFT_RATE_LIMIT') or 20)
+DRAFT_RATE_WINDOW_SECONDS = int(os.environ.get('DRAFT_RATE_WINDOW_SECONDS') or 3600)
+# Provider calls in flight across all workers, and how long a slot stays
+# leased if its worker dies before giving it back
+RENTCAST_MAX_IN_FLIGHT = int(os.environ.get('RENTCAST_MAX_IN_FLIGHT') or 8)
+OPENAI_MAX_IN_FLIGHT = int(os.environ.get('OPENAI_MAX_IN_FLIGHT') or 64)
+PROVIDER_SLOT_LEASE_SECONDS = int(os.environ.get('PROVIDER_SLOT_LEASE_SECONDS') or 900)
+OVERLOAD_RETRY_AFTER_SECONDS = int(os.environ.get('OVERLOAD_RETRY_AFTER_SECONDS') or 5)
+
+# ASGI serving (asgi.py): threads serving the sync Flask routes it mounts
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS') or 10)
+
+# Follow-up configuration
+FOLLOW_UP_DELAY_HOURS = int(os.environ.get('FOLLOW_UP_DELAY_HOURS') or 72)
+FOLLOW_UP_MAX_ATTEMPTS = int(os.environ.get('FOLLOW_UP_MAX_ATTEMPTS') or 2)
+FOLLOW_UP_BATCH_SIZE = int(os.environ.get('FOLLOW_UP_BATCH_SIZE') or 100)
+FOLLOW_UP_SWEEP_MINUTES = int(os.environ.get('FOLLOW_UP_SWEEP_MINUTES') or 30)
+
+
+# Index advisor configuration (path to record query shapes to, disabled when unset)
+INDEX_ADVISOR_LOG = os.environ.get('INDEX_ADVISOR_LOG')
@@ -0,0 +1,184 @@
+import json
+import logging
+import threading
+from bson import json_util
+from pymongo import monitoring
+from app.indexes import INDEXES, index_name
+
+# Commands that read documents through a query planner
+QUERY_COMMANDS = ("find", "aggregate", "count", "distinct", "update", "delete", "findAndModify")
+
+# Driver/session fields that aren't part of the query itself
+COMMAND_NOISE = ("$db", "lsid", "$clusterTime", "txnNumber", "$readPreference", "writeConcern")
+
+# Keys whose values are part of the shape itself (sort directions, projections)
+LITERAL_KEYS = ("sort", "$sort", "projection", "$project")
+
+def query_shape(value):
+    """
+    Reduce a filter/sort document to its shape by replacing literal values
+    with their type name, so {"user_id": ObjectId(...)} and another user's
+    query map to the same shape
+    """
+    if isinstance(value, dict):
+        return {
+            key: item if key in LITERAL_KEYS else query_shape(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "array"
+    return type(value).__name__
+
+def command_shape(command_name, command):
+    """Get the collection and query shape of a monitored command"""
+    collection = command.get(command_name)
+    
+    if command_name == "find":
+        parts = {"filter": command.get("filter", {}), "sort": command.get("sort")}
+    elif command_name == "aggregate":
+        parts = {"pipeline": command.get("pipeline", [])}
+    elif command_name in ("count", "distinct", "findAndModify"):
+        parts = {"query": command.get("query", {}), "sort": command.get("sort")}
+    elif command_name == "update":
+        parts = {"updates": [{"q": update.get("q", {})} for update in command.get("updates", [])]}
+    else:
+        parts = {"deletes": [{"q": delete.get("q", {})} for delete in command.get("deletes", [])]}
+    
+    return collection, query_shape({key: part for key, part in parts.items() if part is not None})
+
+class QueryShapeRecorder(monitoring.CommandListener):
+    """
+    pymongo command listener that appends each distinct query shape (with
+    one concrete sample command) to an NDJSON file for the index advisor
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.seen = set()
+        self.lock = threading.Lock()
+    
+    def started(self, event):
+        if event.command_name not in QUERY_COMMANDS:
+            return
+        
+        try:
+            command = {key: value for key, value in event.command.items() if key not in COMMAND_NOISE}
+            collection, shape = command_shape(event.command_name, command)
+            key = json.dumps([collection, event.command_name, shape], sort_keys=True)
+            
+            with self.lock:
+                if key in self.seen:
+                    return
+                self.seen.add(key)
+                
+                with open(self.path, "a") as f:
+                    f.write(json_util.dumps({
+                        "collection": collection,
+                        "command_name": event.command_name,
+                        "shape": shape,
+                        "command": command
+                    }, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n")
+        except Exception as e:
+            logging.error(f"Error recording query shape: {str(e)}")
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+def load_shapes(path):
+    """Load recorded query shapes from an NDJSON file"""
+    with open(path) as f:
+        return [json_util.loads(line) for line in f if line.strip()]
+
+def _plan_stages(plan, stages=None):
+    """Collect (stage, indexName) pairs from every winning plan in an explain result"""
+    if stages is None:
+        stages = []
+    
+    if isinstance(plan, dict):
+        for key, value in plan.items():
+            if key == "winningPlan":
+                _walk_winning_plan(value, stages)
+            elif key != "rejectedPlans":
+                _plan_stages(value, stages)
+    elif isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, stages)
+    
+    return stages
+
+def _walk_winning_plan(plan, stages):
+    """Collect (stage, indexName) pairs from a winning plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append((plan["stage"], plan.get("indexName")))
+        for value in plan.values():
+            _walk_winning_plan(value, stages)
+    elif isinstance(plan, list):
+        for item in plan:
+            _walk_winning_plan(item, stages)
+
+def advise(db, shapes):
+    """
+    Explain every recorded query shape and report collection scans and
+    indexes that no recorded query used
+    
+    Args:
+        db: pymongo Database
+        shapes: Recorded shapes from load_shapes
+    
+    Returns:
+        dict: {"collscans": [...], "unused_indexes": [...], "errors": [...]}
+    """
+    report = {
+        "collscans": [],
+        "unused_indexes": [],
+        "errors": []
+    }
+    used = {}
+    
+    for entry in shapes:
+        collection = entry["collection"]
+        try:
+            explain = db.command({"explain": entry["command"], "verbosity": "queryPlanner"})
+        except Exception as e:
+            report["errors"].append({"collection": collection, "shape": entry["shape"], "error": str(e)})
+            continue
+        
+        stages = _plan_stages(explain)
+        for stage, name in stages:
+            if name:
+                used.setdefault(collection, set()).add(name)
+        
+        if any(stage == "COLLSCAN" for stage, _ in stages):
+            report["collscans"].append({
+                "collection": collection,
+                "command_name": entry["command_name"],
+                "shape": entry["shape"]
+            })
+    
+    registered = {
+        collection: {index_name(spec): spec for spec in specs}
+        for collection, specs in INDEXES.items()
+    }
+    
+    for collection in db.list_collection_names():
+        for index in db[collection].list_indexes():
+            name = index["name"]
+            if name == "_id_" or name in used.get(collection, set()):
+                continue
+            
+            spec = registered.get(collection, {}).get(name)
+            report["unused_indexes"].append({
+                "collection": collection,
+                "index": name,
+                "registered": spec is not None,
+                "unique": bool(index.get("unique")),
+                "serves": spec["serves"] if spec else None
+            })
+    
+    return report
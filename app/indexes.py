@@ -0,0 +1,251 @@
+import logging
+from pymongo.errors import CollectionInvalid, OperationFailure
+from app.config import REFRESH_JOB_RETENTION_HOURS
+
+# Collections that need creation options, created before their indexes
+COLLECTIONS = {
+    "listing_history": {
+        "timeseries": {"timeField": "at", "metaField": "listing_id", "granularity": "hours"}
+    },
+    # Archives are rarely read, so trade CPU for a smaller footprint
+    "matches_archive": {
+        "storageEngine": {"wiredTiger": {"configString": "block_compressor=zlib"}}
+    },
+    "communications_archive": {
+        "storageEngine": {"wiredTiger": {"configString": "block_compressor=zlib"}}
+    }
+}
+
+# Declarative index registry, one entry per query shape the app issues.
+# Each index lists the queries it serves so it can be dropped when they go.
+INDEXES = {
+    "users": [
+        {
+            "keys": [("email", 1)],
+            "unique": True,
+            "serves": "User.find_by_email, auth register/login"
+        }
+    ],
+    "listings": [
+        {
+            "keys": [("external_id", 1)],
+            "unique": True,
+            "serves": "Listing.find_by_external_id, ListingService ingestion"
+        },
+        {
+            "keys": [("status", 1), ("date_found", -1)],
+            "serves": "Listing.find_active_listings, ListingIndex initial load"
+        },
+        {
+            "keys": [("status", 1), ("last_seen_at", 1)],
+            "serves": "ListingExpiryService.run_sweep"
+        },
+        {
+            "keys": [("last_updated", 1)],
+            "serves": "ListingIndex.refresh"
+        },
+        {
+            "keys": [("alias_ids", 1)],
+            "sparse": True,
+            "serves": "ListingService ingestion lookup of merged duplicates"
+        },
+        {
+            "keys": [("address_key", 1)],
+            "serves": "ListingService ingestion duplicate detection (exact address)"
+        },
+        {
+            "keys": [("address_block", 1)],
+            "serves": "ListingService ingestion duplicate detection (fuzzy address within block)"
+        },
+        {
+            "keys": [("location", "2dsphere")],
+            "serves": "ListingService ingestion area filter ($geoWithin), Listing.find_active_listings area/near"
+        }
+    ],
+    "matches": [
+        {
+            "keys": [("user_id", 1), ("listing_id", 1)],
+            "unique": True,
+            "serves": "listing details access check, EmailService.send_email, EmailService.clear_follow_up"
+        },
+        {
+            "keys": [("user_id", 1), ("date_matched", 1), ("_id", 1)],
+            "serves": "ListingService.get_matches_for_user and get_matches_version (match feed and cursor pages)"
+        },
+        {
+            "keys": [("user_id", 1), ("status", 1), ("date_matched", 1), ("_id", 1)],
+            "serves": "ListingService.get_matches_for_user with a status filter, UserStats.rebuild"
+        },
+        {
+            "keys": [("user_id", 1), ("score", 1), ("_id", 1)],
+            "serves": "ListingService.get_matches_for_user sorted by score"
+        },
+        {
+            "keys": [("listing_id", 1)],
+            "serves": "ListingService price-drop flagging and match reactivation, ListingExpiryService match cascade"
+        },
+        {
+            "keys": [("status", 1), ("last_updated", 1)],
+            "serves": "ArchiveService retention policy"
+        },
+        {
+            "keys": [("next_follow_up_at", 1)],
+            "sparse": True,
+            "serves": "FollowUpService.run_sweep"
+        }
+    ],
+    "communications": [
+        {
+            "keys": [("user_id", 1), ("listing_id", 1), ("direction", 1), ("status", 1)],
+            "serves": "create_draft existing draft and initial contact lookups, listing details history, FollowUpService outreach summary, UserStats.rebuild drafts"
+        },
+        {
+            "keys": [("user_id", 1), ("created_at", 1), ("_id", 1)],
+            "serves": "communications inbox (and cursor pages)"
+        },
+        {
+            "keys": [("created_at", 1)],
+            "serves": "ArchiveService retention policy"
+        }
+    ],
+    "matches_archive": [
+        {
+            "keys": [("user_id", 1), ("listing_id", 1)],
+            "serves": "match read-through in listing details"
+        }
+    ],
+    "communications_archive": [
+        {
+            "keys": [("user_id", 1), ("listing_id", 1)],
+            "serves": "archived communications in listing details"
+        }
+    ],
+    "listing_history": [
+        {
+            "keys": [("listing_id", 1), ("at", 1)],
+            "serves": "ListingHistory.for_listing"
+        }
+    ],
+    "refresh_jobs": [
+        {
+            "keys": [("user_id", 1)],
+            "unique": True,
+            "partialFilterExpression": {"active": True},
+            "serves": "RefreshJobService.enqueue (one active refresh per user)"
+        },
+        {
+            "keys": [("finished_at", 1)],
+            "expireAfterSeconds": REFRESH_JOB_RETENTION_HOURS * 3600,
+            "serves": "removal of finished refresh jobs (TTL)"
+        }
+    ],
+    "provider_slots": [
+        {
+            "keys": [("provider", 1), ("index", 1)],
+            "serves": "ProviderGate.try_acquire (free slot lookup)"
+        }
+    ],
+    "rate_limits": [
+        {
+            "keys": [("expires_at", 1)],
+            "expireAfterSeconds": 0,
+            "serves": "removal of old rate limit windows (TTL)"
+        }
+    ]
+}
+
+def index_name(spec):
+    """Get the server's default name for a registry entry (e.g. 'user_id_1_listing_id_1')"""
+    return "_".join(f"{field}_{direction}" for field, direction in spec["keys"])
+
+def index_options(spec):
+    """Get the create_index options for a registry entry"""
+    return {key: value for key, value in spec.items() if key not in ("keys", "serves")}
+
+def ensure_collections(db):
+    """
+    Create registry collections that need creation options
+    
+    Time series collections need MongoDB 5.0+; on older servers a regular
+    collection is created instead (the registry index still serves reads).
+    
+    Returns:
+        list: Names of the collections that were created
+    """
+    created = []
+    existing = set(db.list_collection_names())
+    
+    for collection_name, options in COLLECTIONS.items():
+        if collection_name in existing:
+            continue
+        
+        try:
+            db.create_collection(collection_name, **options)
+        except CollectionInvalid:
+            # Created concurrently
+            continue
+        except OperationFailure as e:
+            logging.warning(f"Creating {collection_name} without options ({str(e)})")
+            db.create_collection(collection_name)
+        created.append(collection_name)
+    
+    return created
+
+def ensure_indexes(db):
+    """Create every index in the registry (no-op for indexes that already exist)"""
+    ensure_collections(db)
+    for collection_name, specs in INDEXES.items():
+        for spec in specs:
+            db[collection_name].create_index(spec["keys"], **index_options(spec))
+            logging.debug(f"Ensured index {collection_name}.{index_name(spec)}")
+
+def missing_indexes(db):
+    """
+    Find registry indexes that don't exist yet (builds still in progress
+    aren't listed by the server, so they count as missing)
+    
+    Returns:
+        list: (collection_name, spec) pairs
+    """
+    missing = []
+    for collection_name, specs in INDEXES.items():
+        existing = [
+            [tuple(field) for field in index["key"]]
+            for index in db[collection_name].index_information().values()
+        ]
+        for spec in specs:
+            if [tuple(field) for field in spec["keys"]] not in existing:
+                missing.append((collection_name, spec))
+    
+    return missing
+
+def unregistered_indexes(db):
+    """
+    Find indexes on registry collections that aren't in the registry
+    
+    Returns:
+        list: (collection_name, index_name) pairs
+    """
+    unregistered = []
+    for collection_name, specs in INDEXES.items():
+        registered = {index_name(spec) for spec in specs}
+        for name in db[collection_name].index_information():
+            if name != "_id_" and name not in registered:
+                unregistered.append((collection_name, name))
+    
+    return unregistered
+
+def index_build_progress(db, collection_name):
+    """
+    Get progress messages for index builds running on a collection
+    
+    Returns:
+        list: Progress messages reported by the server (e.g. "... 1200/5000 24%")
+    """
+    namespace = f"{db.name}.{collection_name}"
+    operations = db.client.admin.aggregate([
+        {"$currentOp": {"allUsers": True, "idleConnections": False}},
+        {"$match": {"ns": namespace, "msg": {"$exists": True}}},
+        {"$project": {"msg": 1}}
+    ])
+    return [operation["msg"] for operation in operations]
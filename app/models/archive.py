@@ -0,0 +1,45 @@
+from pymongo.errors import DuplicateKeyError
+from app import db
+from app.models.user_stats import UserStats
+
+# Old records are moved from a hot collection to "<collection>_archive"
+ARCHIVE_SUFFIX = "_archive"
+
+def archive_collection(collection_name):
+    """Get the archive collection for a hot collection"""
+    return db[collection_name + ARCHIVE_SUFFIX]
+
+def restore_one(collection_name, query):
+    """
+    Move an archived document matching query back into its hot collection
+    (read-through for records a user opens again)
+    
+    The document is copied back before it's removed from the archive, so a
+    failure in between leaves it in both places rather than neither.
+    
+    Returns:
+        dict: The restored document, or None if nothing matched
+    """
+    archive = archive_collection(collection_name)
+    document = archive.find_one(query)
+    if not document:
+        return None
+    
+    document.pop("archived_at", None)
+    try:
+        db[collection_name].insert_one(document)
+    except DuplicateKeyError:
+        # Restored concurrently (or never removed from the hot collection)
+        pass
+    archive.delete_one({"_id": document["_id"]})
+    
+    # The restored record counts towards the dashboard again
+    UserStats.rebuild([document["user_id"]])
+    return document
+
+def find_archived(collection_name, query, projection=None, sort=None):
+    """Find archived documents without restoring them (e.g. for history views)"""
+    cursor = archive_collection(collection_name).find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    return list(cursor)
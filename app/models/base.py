@@ -0,0 +1,166 @@
+import copy
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from app import db
+
+# Read documents as undecoded BSON so fields are only decoded when used
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+class Model:
+    """
+    Base class for MongoDB-backed models
+    
+    Subclasses list their persisted fields in FIELDS (also used as their
+    __slots__) and any non-None defaults in DEFAULTS. Instances loaded with
+    the finder helpers wrap the raw BSON document and decode each field on
+    first access. Changed fields are tracked so save() can write only what
+    changed since the document was loaded (or last saved).
+    """
+    
+    __slots__ = ("_id", "_raw", "_fields", "_original")
+    
+    COLLECTION = None
+    FIELDS = ()
+    DEFAULTS = {}
+    
+    def __init__(self, **kwargs):
+        self._raw = None
+        self._fields = None
+        self._id = kwargs.get('_id')
+        for field in self.FIELDS:
+            setattr(self, field, kwargs[field] if field in kwargs else self._default(field))
+        self._mark_clean()
+    
+    @classmethod
+    def from_raw(cls, raw, fields=None):
+        """
+        Wrap a raw BSON document without decoding its fields
+        
+        Args:
+            raw: RawBSONDocument
+            fields: Fields the document was projected to (None if not projected)
+        """
+        instance = cls.__new__(cls)
+        instance._raw = raw
+        instance._fields = frozenset(fields) if fields else None
+        instance._id = raw.get('_id')
+        instance._original = {}
+        return instance
+    
+    def __getattr__(self, name):
+        # Only called for slots that haven't been set yet, i.e. fields of a
+        # raw document that haven't been decoded
+        if name not in self.FIELDS or self._raw is None:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+        
+        if self._fields is not None and name not in self._fields:
+            raise AttributeError(f"{type(self).__name__}.{name} was not loaded (excluded by projection)")
+        
+        value = self._raw_value(name)
+        setattr(self, name, value)
+        self._original[name] = _snapshot(value)
+        return value
+    
+    def _raw_value(self, field):
+        """Decode a field from the raw document (or its default if absent)"""
+        if self._raw is not None and field in self._raw:
+            return _decode(self._raw[field])
+        return self._default(field)
+    
+    @classmethod
+    def _default(cls, field):
+        default = cls.DEFAULTS.get(field)
+        return default() if callable(default) else default
+    
+    @classmethod
+    def projection(cls, fields):
+        """Build a query projection for a list of fields (None loads everything)"""
+        if not fields:
+            return None
+        return {field: 1 for field in fields}
+    
+    @classmethod
+    def _collection(cls):
+        return db[cls.COLLECTION].with_options(codec_options=RAW_CODEC_OPTIONS)
+    
+    @classmethod
+    def _find_one(cls, query, fields=None):
+        """Find one document and wrap it without decoding"""
+        raw = cls._collection().find_one(query, cls.projection(fields))
+        if raw:
+            return cls.from_raw(raw, fields)
+        return None
+    
+    @classmethod
+    def _find(cls, query, fields=None, sort=None, skip=0, limit=0):
+        """Find documents and wrap them without decoding"""
+        cursor = cls._collection().find(query, cls.projection(fields))
+        if sort:
+            cursor = cursor.sort(sort)
+        cursor = cursor.skip(skip).limit(limit)
+        return [cls.from_raw(raw, fields) for raw in cursor]
+    
+    def _loaded_fields(self):
+        """Get the fields that have been set or decoded on this instance"""
+        return [field for field in self.FIELDS if _is_set(self, field)]
+    
+    def _mark_clean(self):
+        """Snapshot the current field values as the saved state"""
+        # Mutable values (dicts, lists) are copied so in-place edits show up as changes
+        self._original = {
+            field: _snapshot(getattr(self, field))
+            for field in self._loaded_fields()
+        }
+    
+    def _changes(self):
+        """Get the fields whose values differ from the saved state"""
+        changes = {}
+        for field in self._loaded_fields():
+            # Fields assigned before ever being read have no snapshot yet
+            saved = self._original[field] if field in self._original else self._raw_value(field)
+            if getattr(self, field) != saved:
+                changes[field] = getattr(self, field)
+        
+        return changes
+    
+    def _document(self):
+        """Get all persisted fields as a document for insertion"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+    
+    @staticmethod
+    def _update_spec(changes):
+        """Build a minimal update, unsetting fields that were cleared"""
+        update = {}
+        
+        set_fields = {field: value for field, value in changes.items() if value is not None}
+        if set_fields:
+            update["$set"] = set_fields
+        
+        unset_fields = {field: "" for field, value in changes.items() if value is None}
+        if unset_fields:
+            update["$unset"] = unset_fields
+        
+        return update
+
+def _is_set(instance, field):
+    """Check whether a field's slot has a value without triggering decoding"""
+    try:
+        object.__getattribute__(instance, field)
+        return True
+    except AttributeError:
+        return False
+
+def _decode(value):
+    """Decode an embedded raw BSON value into plain dicts and lists"""
+    if isinstance(value, RawBSONDocument):
+        return bson.decode(value.raw)
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+def _snapshot(value):
+    """Copy mutable values so later in-place changes can be detected"""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
@@ -1,46 +1,65 @@
 from datetime import datetime
 from app import db
+from app.models import identity_map
+from app.models.archive import restore_one
+from app.models.base import Model
+from app.models.user_stats import UserStats
 from bson.objectid import ObjectId
 
-class Communication:
+class Communication(Model):
     """Communication model for emails and messages with landlords/agents"""
     
-    def __init__(self, **kwargs):
-        self._id = kwargs.get('_id')
-        self.user_id = kwargs.get('user_id')
-        self.listing_id = kwargs.get('listing_id')
-        self.direction = kwargs.get('direction')  # 'outgoing' or 'incoming'
-        self.type = kwargs.get('type', 'email')  # 'email', 'sms', etc.
-        self.subject = kwargs.get('subject')
-        self.content = kwargs.get('content')
-        self.recipient = kwargs.get('recipient')
-        self.sender = kwargs.get('sender')
-        self.status = kwargs.get('status', 'draft')  # 'draft', 'sent', 'delivered', 'failed'
-        self.created_at = kwargs.get('created_at', datetime.utcnow())
-        self.sent_at = kwargs.get('sent_at')
-        self.metadata = kwargs.get('metadata', {})
-        self.analysis = kwargs.get('analysis', {})  # For AI analysis of messages
+    COLLECTION = "communications"
+    
+    FIELDS = (
+        "user_id", "listing_id",
+        "listing_address",  # Denormalized for inbox views
+        "direction",  # 'outgoing' or 'incoming'
+        "type",  # 'email', 'sms', etc.
+        "subject", "content", "recipient", "sender",
+        "status",  # 'draft', 'sent', 'delivered', 'failed'
+        "created_at", "sent_at", "metadata",
+        "analysis"  # For AI analysis of messages
+    )
+    __slots__ = FIELDS
+    
+    DEFAULTS = {
+        "type": "email",
+        "status": "draft",
+        "created_at": datetime.utcnow,
+        "metadata": dict,
+        "analysis": dict
+    }
     
     @classmethod
-    def find_by_id(cls, communication_id):
-        """Find communication by ID"""
-        comm_data = db.communications.find_one({"_id": ObjectId(communication_id)})
-        if comm_data:
-            return cls(**comm_data)
+    def find_by_id(cls, communication_id, fields=None):
+        """
+        Find communication by ID (reusing the instance if already loaded this
+        request, and restoring it if it was archived)
+        """
+        communication = identity_map.get(cls, communication_id)
+        if communication:
+            return communication
+        
+        query = {"_id": ObjectId(communication_id)}
+        communication = cls._find_one(query, fields)
+        if not communication and restore_one(cls.COLLECTION, query):
+            communication = cls._find_one(query, fields)
+        if communication:
+            return identity_map.add(communication)
         return None
     
     @classmethod
-    def find_for_listing(cls, listing_id, user_id=None):
+    def find_for_listing(cls, listing_id, user_id=None, fields=None):
         """Find all communications for a listing, optionally filtered by user"""
         query = {"listing_id": ObjectId(listing_id)}
         if user_id:
             query["user_id"] = ObjectId(user_id)
         
-        cursor = db.communications.find(query).sort("created_at", -1)
-        return [cls(**comm) for comm in cursor]
+        return cls._find(query, fields, sort=[("created_at", -1)])
     
     def save(self):
-        """Save communication to database"""
+        """Save communication to database (updates write only the changed fields)"""
         if not self._id:
             # Convert ObjectIds
             if self.user_id and not isinstance(self.user_id, ObjectId):
@@ -50,48 +69,35 @@ class Communication:
                 self.listing_id = ObjectId(self.listing_id)
                 
             # New communication
-            document = {
-                "user_id": self.user_id,
-                "listing_id": self.listing_id,
-                "direction": self.direction,
-                "type": self.type,
-                "subject": self.subject,
-                "content": self.content,
-                "recipient": self.recipient,
-                "sender": self.sender,
-                "status": self.status,
-                "created_at": self.created_at,
-                "sent_at": self.sent_at,
-                "metadata": self.metadata,
-                "analysis": self.analysis
-            }
-            result = db.communications.insert_one(document)
+            result = db.communications.insert_one(self._document())
             self._id = result.inserted_id
+            
+            if self.direction == "outgoing" and self.status == "draft":
+                UserStats.increment(self.user_id, {"drafts": 1})
         else:
-            # Update existing communication
+            # Update existing communication, skipping the write if nothing changed
+            changes = self._changes()
+            if not changes:
+                return self
+            
             db.communications.update_one(
                 {"_id": ObjectId(self._id)},
-                {"$set": {
-                    "direction": self.direction,
-                    "type": self.type,
-                    "subject": self.subject,
-                    "content": self.content,
-                    "recipient": self.recipient,
-                    "sender": self.sender,
-                    "status": self.status,
-                    "sent_at": self.sent_at,
-                    "metadata": self.metadata,
-                    "analysis": self.analysis
-                }}
+                self._update_spec(changes)
             )
         
+        self._mark_clean()
         return self
     
     def mark_as_sent(self):
         """Mark communication as sent"""
+        was_draft = self.status == "draft"
         self.status = "sent"
         self.sent_at = datetime.utcnow()
-        return self.save()
+        self.save()
+        
+        if was_draft and self.direction == "outgoing":
+            UserStats.increment(self.user_id, {"drafts": -1})
+        return self
     
     def to_dict(self):
         """Convert communication to dictionary"""
@@ -0,0 +1,42 @@
+from flask import g, has_app_context
+
+def _current_map():
+    """Get the identity map for the current request (None outside one)"""
+    if not has_app_context():
+        return None
+    
+    if "identity_map" not in g:
+        g.identity_map = {}
+    
+    return g.identity_map
+
+def get(model, object_id):
+    """
+    Get an instance already loaded in this request
+    
+    Args:
+        model: Model class (e.g. Listing)
+        object_id: Document ID (ObjectId or string)
+    
+    Returns:
+        The loaded instance, or None if it hasn't been loaded yet
+    """
+    identity_map = _current_map()
+    if identity_map is None or not object_id:
+        return None
+    
+    return identity_map.get((model.__name__, str(object_id)))
+
+def add(instance):
+    """
+    Remember a loaded instance for the rest of the request and return it
+    
+    Instances loaded with a projection are returned without being
+    remembered, since a later lookup may need the fields they lack (a full
+    instance already remembered still serves projected lookups).
+    """
+    identity_map = _current_map()
+    if identity_map is not None and instance._id and instance._fields is None:
+        identity_map[(type(instance).__name__, str(instance._id))] = instance
+    
+    return instance
@@ -1,108 +1,134 @@
 from datetime import datetime
 from app import db
+from app.models import identity_map
+from app.models.base import Model
+from app.models.listing_raw import ListingRaw
+from app.utils.geo import coordinates, point
 from bson.objectid import ObjectId
 
-class Listing:
+class Listing(Model):
     """Listing model for rental properties"""
     
-    def __init__(self, **kwargs):
-        self._id = kwargs.get('_id')
-        self.external_id = kwargs.get('external_id')
-        self.source = kwargs.get('source')
-        self.title = kwargs.get('title')
-        self.description = kwargs.get('description')
-        self.price = kwargs.get('price')
-        self.bedrooms = kwargs.get('bedrooms')
-        self.bathrooms = kwargs.get('bathrooms')
-        self.address = kwargs.get('address')
-        self.url = kwargs.get('url')
-        self.image_url = kwargs.get('image_url')
-        self.available_from = kwargs.get('available_from')
-        self.property_type = kwargs.get('property_type')
-        self.contact_info = kwargs.get('contact_info', {})
-        self.metadata = kwargs.get('metadata', {})
-        self.date_found = kwargs.get('date_found', datetime.utcnow())
-        self.last_updated = kwargs.get('last_updated', datetime.utcnow())
-        self.status = kwargs.get('status', 'active')
+    COLLECTION = "listings"
+    
+    FIELDS = (
+        "external_id", "source", "title", "description", "price",
+        "bedrooms", "bathrooms", "address", "url", "image_url",
+        "available_from", "property_type",
+        "address_key", "address_block",  # Canonical address and its fuzzy-match block
+        "alias_ids",  # External IDs of duplicates merged into this listing
+        "location",  # GeoJSON point (2dsphere indexed)
+        "contact_info",
+        "raw_id",  # Content hash of the raw API payload in listing_raw
+        "fingerprint",  # Content hash of the normalized fields, to skip unchanged re-ingests
+        "date_found", "last_updated",
+        "last_seen_at",  # Last time ingestion saw the listing on the market
+        "status"
+    )
+    __slots__ = FIELDS
+    
+    DEFAULTS = {
+        "contact_info": dict,
+        "date_found": datetime.utcnow,
+        "last_updated": datetime.utcnow,
+        "status": "active"
+    }
+    
+    # Stored fields returned by to_dict (used to project listing queries)
+    DICT_FIELDS = (
+        "external_id", "source", "title", "description", "price",
+        "bedrooms", "bathrooms", "address", "url", "image_url",
+        "available_from", "property_type", "location",
+        "date_found", "status"
+    )
     
     @classmethod
-    def find_by_id(cls, listing_id):
-        """Find listing by ID"""
-        listing_data = db.listings.find_one({"_id": ObjectId(listing_id)})
-        if listing_data:
-            return cls(**listing_data)
+    def find_by_id(cls, listing_id, fields=None):
+        """Find listing by ID (reusing the instance if already loaded this request)"""
+        listing = identity_map.get(cls, listing_id)
+        if listing:
+            return listing
+        
+        listing = cls._find_one({"_id": ObjectId(listing_id)}, fields)
+        if listing:
+            return identity_map.add(listing)
         return None
     
     @classmethod
-    def find_by_external_id(cls, external_id):
+    def find_by_external_id(cls, external_id, fields=None):
         """Find listing by external ID"""
-        listing_data = db.listings.find_one({"external_id": external_id})
-        if listing_data:
-            return cls(**listing_data)
+        listing = cls._find_one({"external_id": external_id}, fields)
+        if listing:
+            return identity_map.add(listing)
         return None
     
     @classmethod
-    def find_active_listings(cls, filters=None, limit=20, skip=0):
-        """Find active listings with optional filters"""
+    def find_by_ids(cls, listing_ids, fields=None):
+        """Find several listings by ID in one query"""
+        return cls._find({"_id": {"$in": [ObjectId(listing_id) for listing_id in listing_ids]}}, fields)
+    
+    @classmethod
+    def find_active_listings(cls, filters=None, limit=20, skip=0, fields=DICT_FIELDS, area=None, near=None):
+        """
+        Find active listings with optional filters
+        
+        Only the fields needed by to_dict are fetched by default; pass
+        fields=None to load whole documents.
+        
+        Args:
+            area: $geoWithin operand (see app.utils.geo.preference_area)
+            near: (latitude, longitude, max_distance_km) to return listings
+                nearest first instead of newest first
+        """
         query = {"status": "active"}
         if filters:
             query.update(filters)
         
-        cursor = db.listings.find(query).sort("date_found", -1).skip(skip).limit(limit)
-        return [cls(**listing) for listing in cursor]
+        if area:
+            query["location"] = {"$geoWithin": area}
+        
+        if near:
+            latitude, longitude, max_distance_km = near
+            # $near sorts by distance itself
+            query["location"] = {"$near": {
+                "$geometry": point(latitude, longitude),
+                "$maxDistance": max_distance_km * 1000
+            }}
+            return cls._find(query, fields, skip=skip, limit=limit)
+        
+        return cls._find(query, fields, sort=[("date_found", -1)], skip=skip, limit=limit)
     
     def save(self):
-        """Save listing to database"""
-        self.last_updated = datetime.utcnow()
+        """Save listing to database (updates write only the changed fields)"""
         if not self._id:
             # New listing
-            document = {
-                "external_id": self.external_id,
-                "source": self.source,
-                "title": self.title,
-                "description": self.description,
-                "price": self.price,
-                "bedrooms": self.bedrooms,
-                "bathrooms": self.bathrooms,
-                "address": self.address,
-                "url": self.url,
-                "image_url": self.image_url,
-                "available_from": self.available_from,
-                "property_type": self.property_type,
-                "contact_info": self.contact_info,
-                "metadata": self.metadata,
-                "date_found": self.date_found,
-                "last_updated": self.last_updated,
-                "status": self.status
-            }
-            result = db.listings.insert_one(document)
+            self.last_updated = datetime.utcnow()
+            result = db.listings.insert_one(self._document())
             self._id = result.inserted_id
         else:
-            # Update existing listing
+            # Update existing listing, skipping the write if nothing changed
+            changes = self._changes()
+            if not changes:
+                return self
+            
+            self.last_updated = changes["last_updated"] = datetime.utcnow()
             db.listings.update_one(
                 {"_id": ObjectId(self._id)},
-                {"$set": {
-                    "title": self.title,
-                    "description": self.description,
-                    "price": self.price,
-                    "bedrooms": self.bedrooms,
-                    "bathrooms": self.bathrooms,
-                    "address": self.address,
-                    "url": self.url,
-                    "image_url": self.image_url,
-                    "available_from": self.available_from, 
-                    "property_type": self.property_type,
-                    "contact_info": self.contact_info,
-                    "metadata": self.metadata,
-                    "last_updated": self.last_updated,
-                    "status": self.status
-                }}
+                self._update_spec(changes)
             )
         
+        self._mark_clean()
         return self
     
+    def raw_payload(self):
+        """Load the raw API payload this listing was built from"""
+        if not self.raw_id:
+            return None
+        return ListingRaw.load(self.raw_id)
+    
     def to_dict(self):
         """Convert listing to dictionary"""
+        latitude, longitude = coordinates(self.location)
         return {
             "id": str(self._id),
             "external_id": self.external_id,
@@ -117,6 +143,8 @@ class Listing:
             "image_url": self.image_url,
             "available_from": self.available_from,
             "property_type": self.property_type,
+            "latitude": latitude,
+            "longitude": longitude,
             "date_found": self.date_found,
             "status": self.status
         }
\ No newline at end of file
@@ -0,0 +1,56 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from app import db
+
+class ListingHistory:
+    """
+    Price/status time series for listings
+    
+    One compact point (listing_id, at, price, status) is appended when a
+    listing is first seen and whenever its price or status changes, so price
+    drops can be found without keeping whole listing versions.
+    """
+    
+    @staticmethod
+    def record(listing_id, price, status, at=None):
+        """Append a price/status point for a listing"""
+        db.listing_history.insert_one({
+            "listing_id": ObjectId(listing_id),
+            "at": at or datetime.utcnow(),
+            "price": price,
+            "status": status
+        })
+    
+    @staticmethod
+    def record_many(points, at=None):
+        """Append (listing_id, price, status) points for several listings at once"""
+        if not points:
+            return
+        
+        at = at or datetime.utcnow()
+        db.listing_history.insert_many([
+            {"listing_id": ObjectId(listing_id), "at": at, "price": price, "status": status}
+            for listing_id, price, status in points
+        ])
+    
+    @staticmethod
+    def for_listing(listing_id, since=None, limit=0):
+        """
+        Get a listing's price/status history, oldest first
+        
+        Args:
+            listing_id: Listing ID
+            since: Only return points recorded at or after this time
+            limit: Maximum number of points (0 for all)
+        
+        Returns:
+            list: {"at", "price", "status"} points
+        """
+        query = {"listing_id": ObjectId(listing_id)}
+        if since:
+            query["at"] = {"$gte": since}
+        
+        return list(db.listing_history.find(
+            query,
+            {"_id": 0, "at": 1, "price": 1, "status": 1}
+        ).sort("at", 1).limit(limit))
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from bson.binary import Binary
+from pymongo import ReturnDocument
+from app import db
+from app.config import LISTING_RAW_COMPRESSION
+
+class ListingRaw:
+    """
+    Raw listing payloads from external APIs, kept out of the listings collection
+    
+    Payloads are stored once per content hash (the document _id) with a
+    reference count, optionally zlib-compressed.
+    """
+    
+    @staticmethod
+    def content_hash(payload):
+        """Get a stable SHA-256 hash of a payload"""
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    @classmethod
+    def store(cls, payload, compress=LISTING_RAW_COMPRESSION):
+        """
+        Store a payload (or add a reference to an identical stored one)
+        
+        Args:
+            payload: Raw API response for a listing
+            compress: Whether to zlib-compress new payloads
+            
+        Returns:
+            str: Content hash to keep on the listing as raw_id
+        """
+        content_hash = cls.content_hash(payload)
+        
+        document = {"created_at": datetime.utcnow(), "compressed": compress}
+        if compress:
+            document["data"] = Binary(zlib.compress(json.dumps(payload, default=str).encode()))
+        else:
+            document["data"] = payload
+        
+        db.listing_raw.update_one(
+            {"_id": content_hash},
+            {"$setOnInsert": document, "$inc": {"refs": 1}},
+            upsert=True
+        )
+        return content_hash
+    
+    @classmethod
+    def release(cls, content_hash):
+        """Drop a reference to a stored payload, deleting it once unreferenced"""
+        if not content_hash:
+            return
+        
+        raw = db.listing_raw.find_one_and_update(
+            {"_id": content_hash},
+            {"$inc": {"refs": -1}},
+            projection={"refs": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if raw and raw["refs"] <= 0:
+            db.listing_raw.delete_one({"_id": content_hash, "refs": {"$lte": 0}})
+    
+    @classmethod
+    def load(cls, content_hash):
+        """
+        Load a stored payload
+        
+        Returns:
+            dict: The payload, or None if not found
+        """
+        raw = db.listing_raw.find_one({"_id": content_hash}, {"data": 1, "compressed": 1})
+        if not raw:
+            return None
+        
+        if raw.get("compressed"):
+            return json.loads(zlib.decompress(raw["data"]))
+        return raw["data"]
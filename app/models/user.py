@@ -1,23 +1,38 @@
+import threading
+import time
 from datetime import datetime
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.models import identity_map
+from app.models.base import Model
+from app.config import SESSION_USER_CACHE_SECONDS
 
-class User(UserMixin):
+# Short-lived per-process cache of user documents for session lookups
+# (user ID -> (expiry, document)); entries are dropped when the user saves
+# in this process, and expired ones whenever another is added
+_session_cache = {}
+_session_cache_lock = threading.Lock()
+
+class User(Model, UserMixin):
     """User model for authentication and profile management"""
     
-    def __init__(self, **kwargs):
-        self._id = kwargs.get('_id')
-        self.email = kwargs.get('email')
-        self.password_hash = kwargs.get('password_hash')
-        self.first_name = kwargs.get('first_name')
-        self.last_name = kwargs.get('last_name')
-        self.phone = kwargs.get('phone')
-        self.created_at = kwargs.get('created_at', datetime.utcnow())
-        self.updated_at = kwargs.get('updated_at', datetime.utcnow())
-        self.rental_preferences = kwargs.get('rental_preferences', {})
-        self.email_automated = kwargs.get('email_automated', False)
-        self.email_review_required = kwargs.get('email_review_required', True)
+    COLLECTION = "users"
+    
+    FIELDS = (
+        "email", "password_hash", "first_name", "last_name", "phone",
+        "created_at", "updated_at", "rental_preferences",
+        "email_automated", "email_review_required"
+    )
+    __slots__ = FIELDS
+    
+    DEFAULTS = {
+        "created_at": datetime.utcnow,
+        "updated_at": datetime.utcnow,
+        "rental_preferences": dict,
+        "email_automated": False,
+        "email_review_required": True
+    }
     
     def set_password(self, password):
         """Set password hash"""
@@ -34,51 +49,94 @@ class User(UserMixin):
     @classmethod
     def find_by_email(cls, email):
         """Find user by email"""
-        user_data = db.users.find_one({"email": email})
-        if user_data:
-            return cls(**user_data)
+        user = cls._find_one({"email": email})
+        if user:
+            return identity_map.add(user)
         return None
     
     @classmethod
     def find_by_id(cls, user_id):
-        """Find user by ID"""
+        """Find user by ID (reusing the instance if already loaded this request)"""
         from bson.objectid import ObjectId
-        user_data = db.users.find_one({"_id": ObjectId(user_id)})
-        if user_data:
-            return cls(**user_data)
+        user = identity_map.get(cls, user_id)
+        if user:
+            return user
+        
+        user = cls._find_one({"_id": ObjectId(user_id)})
+        if user:
+            return identity_map.add(user)
         return None
     
+    @classmethod
+    def find_by_ids(cls, user_ids, fields=None):
+        """Find several users by ID in one query"""
+        from bson.objectid import ObjectId
+        return cls._find({"_id": {"$in": [ObjectId(user_id) for user_id in user_ids]}}, fields)
+    
+    @classmethod
+    def find_for_session(cls, user_id):
+        """
+        Find the logged-in user, served from a short-TTL process cache
+        
+        Args:
+            user_id: User ID from the session
+            
+        Returns:
+            User: The user, or None if not found
+        """
+        from bson.objectid import ObjectId
+        user = identity_map.get(cls, user_id)
+        if user:
+            return user
+        
+        # Raw BSON documents are immutable, so they can be shared safely
+        cached = _session_cache.get(str(user_id))
+        if cached and cached[0] > time.monotonic():
+            user_data = cached[1]
+        else:
+            user_data = cls._collection().find_one({"_id": ObjectId(user_id)})
+            if not user_data:
+                with _session_cache_lock:
+                    _session_cache.pop(str(user_id), None)
+                return None
+            _cache_session_user(str(user_id), user_data)
+        
+        return identity_map.add(cls.from_raw(user_data))
+    
     def save(self):
-        """Save user to database"""
-        self.updated_at = datetime.utcnow()
+        """Save user to database (updates write only the changed fields)"""
         if not self._id:
-            result = db.users.insert_one({
-                "email": self.email,
-                "password_hash": self.password_hash,
-                "first_name": self.first_name,
-                "last_name": self.last_name,
-                "phone": self.phone,
-                "created_at": self.created_at,
-                "updated_at": self.updated_at,
-                "rental_preferences": self.rental_preferences,
-                "email_automated": self.email_automated,
-                "email_review_required": self.email_review_required
-            })
+            self.updated_at = datetime.utcnow()
+            result = db.users.insert_one(self._document())
             self._id = result.inserted_id
         else:
+            # Update existing user, skipping the write if nothing changed
+            changes = self._changes()
+            if not changes:
+                return self
+            
             from bson.objectid import ObjectId
+            self.updated_at = changes["updated_at"] = datetime.utcnow()
             db.users.update_one(
                 {"_id": ObjectId(self._id)},
-                {"$set": {
-                    "email": self.email,
-                    "password_hash": self.password_hash,
-                    "first_name": self.first_name,
-                    "last_name": self.last_name,
-                    "phone": self.phone,
-                    "updated_at": self.updated_at,
-                    "rental_preferences": self.rental_preferences,
-                    "email_automated": self.email_automated,
-                    "email_review_required": self.email_review_required
-                }}
+                self._update_spec(changes)
             )
-        return self
\ No newline at end of file
+            with _session_cache_lock:
+                _session_cache.pop(str(self._id), None)
+        
+        self._mark_clean()
+        return self
+
+def _cache_session_user(key, user_data):
+    """Cache a user document for session lookups, dropping expired entries"""
+    now = time.monotonic()
+    with _session_cache_lock:
+        # Entries share one lifetime and are moved to the end when replaced,
+        # so they're in expiry order and the expired ones come first
+        _session_cache.pop(key, None)
+        while _session_cache:
+            oldest = next(iter(_session_cache))
+            if _session_cache[oldest][0] > now:
+                break
+            del _session_cache[oldest]
+        _session_cache[key] = (now + SESSION_USER_CACHE_SECONDS, user_data)
@@ -0,0 +1,154 @@
+from datetime import datetime
+from pymongo import ReplaceOne
+from bson.objectid import ObjectId
+from app import db
+
+# Match statuses counted on the dashboard (status -> counter under "matches")
+MATCH_COUNTERS = {
+    "new": "new",
+    "viewed": "viewed",
+    "contacted": "contacted",
+    "viewing_scheduled": "scheduled"
+}
+
+class UserStats:
+    """
+    Precomputed dashboard counters, one user_stats document per user keyed
+    by user ID
+    
+    Counters are adjusted with $inc wherever a match or communication
+    changes state, so the dashboard is a single point lookup. Bulk changes
+    made by background jobs (expiry, archival) rebuild the affected users
+    instead, and rebuild_all reconciles any drift.
+    """
+    
+    @staticmethod
+    def empty(user_id):
+        """Get a stats document with every counter at zero"""
+        return {
+            "_id": ObjectId(user_id),
+            "matches": {"new": 0, "viewed": 0, "contacted": 0, "scheduled": 0},
+            "unread_replies": 0,
+            "drafts": 0
+        }
+    
+    @staticmethod
+    def get(user_id):
+        """Get a user's counters, building them on first use"""
+        stats = db.user_stats.find_one({"_id": ObjectId(user_id)})
+        if stats:
+            return stats
+        
+        UserStats.rebuild([user_id])
+        return db.user_stats.find_one({"_id": ObjectId(user_id)})
+    
+    @staticmethod
+    def increment(user_id, counters):
+        """
+        Adjust a user's counters atomically (call after the change is written)
+        
+        A user without counters yet gets them built from scratch instead, as
+        they may already have matches and communications to count.
+        
+        Args:
+            user_id: User ID
+            counters: dict of counter path -> amount (e.g. {"drafts": 1})
+        """
+        update = UserStats.increment_update(counters)
+        if not update:
+            return
+        
+        result = db.user_stats.update_one({"_id": ObjectId(user_id)}, update)
+        if not result.matched_count:
+            UserStats.rebuild([user_id])
+    
+    @staticmethod
+    def increment_update(counters):
+        """Build the update for increment (None if every amount is zero)"""
+        counters = {path: amount for path, amount in counters.items() if amount}
+        if not counters:
+            return None
+        return {"$inc": counters, "$set": {"updated_at": datetime.utcnow()}}
+    
+    @staticmethod
+    def match_status_changed(user_id, old_status, new_status):
+        """Move a match between status counters (untracked statuses are ignored)"""
+        if old_status == new_status:
+            return
+        
+        counters = {}
+        if old_status in MATCH_COUNTERS:
+            counters[f"matches.{MATCH_COUNTERS[old_status]}"] = -1
+        if new_status in MATCH_COUNTERS:
+            counters[f"matches.{MATCH_COUNTERS[new_status]}"] = 1
+        UserStats.increment(user_id, counters)
+    
+    @staticmethod
+    def rebuild(user_ids):
+        """
+        Recompute the counters for some users from matches and communications
+        
+        Args:
+            user_ids: User IDs
+        
+        Returns:
+            int: Number of users rebuilt
+        """
+        user_ids = [ObjectId(user_id) for user_id in user_ids]
+        if not user_ids:
+            return 0
+        
+        stats = {user_id: UserStats.empty(user_id) for user_id in user_ids}
+        
+        for row in db.matches.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "status": "$status"},
+                "count": {"$sum": 1},
+                "unread_replies": {"$sum": {"$cond": [{"$eq": ["$reply_unread", True]}, 1, 0]}}
+            }}
+        ]):
+            user_stats = stats[row["_id"]["user_id"]]
+            counter = MATCH_COUNTERS.get(row["_id"]["status"])
+            if counter:
+                user_stats["matches"][counter] += row["count"]
+            user_stats["unread_replies"] += row["unread_replies"]
+        
+        for row in db.communications.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}, "direction": "outgoing", "status": "draft"}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+        ]):
+            stats[row["_id"]]["drafts"] = row["count"]
+        
+        now = datetime.utcnow()
+        db.user_stats.bulk_write([
+            ReplaceOne({"_id": user_id}, {**user_stats, "updated_at": now}, upsert=True)
+            for user_id, user_stats in stats.items()
+        ], ordered=False)
+        return len(stats)
+    
+    @staticmethod
+    def rebuild_all(batch_size=500):
+        """
+        Reconcile every user's counters, in batches of users
+        
+        Returns:
+            int: Number of users reconciled
+        """
+        reconciled = 0
+        last_id = None
+        
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            user_ids = [user["_id"] for user in db.users.find(query, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not user_ids:
+                break
+            
+            UserStats.rebuild(user_ids)
+            reconciled += len(user_ids)
+            last_id = user_ids[-1]
+            
+            if len(user_ids) < batch_size:
+                break
+        
+        return reconciled
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify, session
+from app.utils.auth import current_user
 from app.models.user import User
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
-from bson.objectid import ObjectId
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -41,12 +41,10 @@ def login():
     data = request.get_json()
     
     # Find user by email
-    user_data = db.users.find_one({"email": data.get('email')})
-    if not user_data:
+    user = User.find_by_email(data.get('email'))
+    if not user:
         return jsonify({"error": "Invalid email or password"}), 401
     
-    user = User(**user_data)
-    
     # Check password
     if not user.check_password(data.get('password')):
         return jsonify({"error": "Invalid email or password"}), 401
@@ -76,13 +74,11 @@ def get_user():
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
-    user = User(**user_data)
-    
     return jsonify({
         "id": str(user._id),
         "email": user.email,
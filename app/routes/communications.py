@@ -1,37 +1,48 @@
 from flask import Blueprint, request, jsonify, session
-from app.services.email_service import EmailService
+from app.utils.auth import current_user
+from app.services import get_email_service
 from app.models.listing import Listing
-from app.models.user import User
 from app.models.communication import Communication
+from app.models.archive import restore_one
 from app import db
+from app.utils.pagination import keyset_filter, next_cursor
+from app.utils.serialization import stream_list
+from app.utils.admission import Overloaded, provider_gate, rate_limited, too_many_requests
 from bson.objectid import ObjectId
 from datetime import datetime
 
 communications_bp = Blueprint('communications', __name__, url_prefix='/api/communications')
 
-email_service = EmailService()
+# Fields needed to render the inbox list
+INBOX_PROJECTION = {
+    "listing_id": 1,
+    "listing_address": 1,
+    "direction": 1,
+    "type": 1,
+    "subject": 1,
+    "status": 1,
+    "created_at": 1,
+    "sent_at": 1
+}
 
 @communications_bp.route('/draft/<listing_id>', methods=['POST'])
+@rate_limited("draft")
 def create_draft(listing_id):
     """Create a draft email for a listing"""
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
     # Get user
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
-    user = User(**user_data)
-    
     # Get listing
-    listing_data = db.listings.find_one({"_id": ObjectId(listing_id)})
-    if not listing_data:
+    listing = Listing.find_by_id(listing_id)
+    if not listing:
         return jsonify({"error": "Listing not found"}), 404
     
-    listing = Listing(**listing_data)
-    
     # Check if there's already a draft
     existing_draft = db.communications.find_one({
         "user_id": ObjectId(session['user_id']),
@@ -56,24 +67,30 @@ def create_draft(listing_id):
     data = request.get_json()
     email_type = data.get('type', 'initial_outreach')
     
-    # Create appropriate draft based on type
-    if email_type == 'initial_outreach':
-        communication = email_service.create_initial_contact_email(user, listing)
-    elif email_type == 'follow_up':
-        # Find the initial contact date
-        initial_comm = db.communications.find_one({
-            "user_id": ObjectId(session['user_id']),
-            "listing_id": ObjectId(listing_id),
-            "direction": "outgoing",
-            "status": "sent"
-        }, sort=[("created_at", 1)])
-        
-        initial_date = initial_comm.get("sent_at") if initial_comm else datetime.utcnow()
-        
-        communication = email_service.create_follow_up_email(user, listing, initial_date)
-    else:
+    if email_type not in ('initial_outreach', 'follow_up'):
         return jsonify({"error": "Invalid email type"}), 400
     
+    # Create appropriate draft based on type (shedding the request if too
+    # many drafts are already being generated)
+    try:
+        with provider_gate.slot("openai"):
+            if email_type == 'initial_outreach':
+                communication = get_email_service().create_initial_contact_email(user, listing)
+            else:
+                # Find the initial contact date
+                initial_comm = db.communications.find_one({
+                    "user_id": ObjectId(session['user_id']),
+                    "listing_id": ObjectId(listing_id),
+                    "direction": "outgoing",
+                    "status": "sent"
+                }, sort=[("created_at", 1)])
+                
+                initial_date = initial_comm.get("sent_at") if initial_comm else datetime.utcnow()
+                
+                communication = get_email_service().create_follow_up_email(user, listing, initial_date)
+    except Overloaded as e:
+        return too_many_requests(str(e), e.retry_after)
+    
     if not communication:
         return jsonify({"error": "Failed to create email draft"}), 500
     
@@ -94,11 +111,12 @@ def update_communication(communication_id):
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    # Get communication
-    comm_data = db.communications.find_one({
+    # Get communication (restoring it if it was archived)
+    query = {
         "_id": ObjectId(communication_id),
         "user_id": ObjectId(session['user_id'])
-    })
+    }
+    comm_data = db.communications.find_one(query) or restore_one("communications", query)
     
     if not comm_data:
         return jsonify({"error": "Communication not found"}), 404
@@ -119,6 +137,7 @@ def update_communication(communication_id):
         update_data["recipient"] = data['recipient']
     
     if update_data:
+        update_data["last_updated"] = datetime.utcnow()
         db.communications.update_one(
             {"_id": ObjectId(communication_id)},
             {"$set": update_data}
@@ -144,21 +163,18 @@ def send_communication(communication_id):
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    # Get communication
-    comm_data = db.communications.find_one({
-        "_id": ObjectId(communication_id),
-        "user_id": ObjectId(session['user_id'])
-    })
+    # Get communication (kept in the request's identity map for send_email)
+    communication = Communication.find_by_id(communication_id)
     
-    if not comm_data:
+    if not communication or communication.user_id != ObjectId(session['user_id']):
         return jsonify({"error": "Communication not found"}), 404
     
     # Make sure it's a draft
-    if comm_data.get("status") != "draft":
+    if communication.status != "draft":
         return jsonify({"error": "Only drafts can be sent"}), 400
     
     # Send the email
-    success = email_service.send_email(ObjectId(communication_id))
+    success = get_email_service().send_email(ObjectId(communication_id))
     
     if not success:
         return jsonify({"error": "Failed to send email"}), 500
@@ -179,6 +195,7 @@ def get_communications():
     status = request.args.get('status')
     limit = int(request.args.get('limit', 20))
     skip = int(request.args.get('skip', 0))
+    cursor = request.args.get('cursor')
     
     # Build query
     query = {"user_id": ObjectId(session['user_id'])}
@@ -189,33 +206,47 @@ def get_communications():
     if status:
         query["status"] = status
     
-    # Get communications
-    communications = list(db.communications.find(query)
-                         .sort("created_at", -1)
+    # Seek past the previous page using the (created_at, _id) index
+    if cursor:
+        try:
+            query.update(keyset_filter("created_at", cursor))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+    
+    # Get communications, leaving out the email bodies and analysis
+    communications = list(db.communications.find(query, INBOX_PROJECTION)
+                         .sort([("created_at", -1), ("_id", -1)])
                          .skip(skip)
                          .limit(limit))
     
-    # Format for response
-    result = []
-    for comm in communications:
-        listing = db.listings.find_one({"_id": comm["listing_id"]})
-        
-        result.append({
-            "id": str(comm["_id"]),
-            "listing_id": str(comm["listing_id"]),
-            "listing_address": listing["address"] if listing else "Unknown",
-            "direction": comm["direction"],
-            "type": comm["type"],
-            "subject": comm["subject"],
-            "status": comm["status"],
-            "created_at": comm["created_at"],
-            "sent_at": comm.get("sent_at")
-        })
-    
-    return jsonify({
-        "communications": result,
-        "count": len(result)
-    })
+    # Resolve addresses for older communications that predate the
+    # denormalized listing_address field in a single query
+    missing_ids = list({comm["listing_id"] for comm in communications if not comm.get("listing_address")})
+    addresses = {}
+    if missing_ids:
+        for listing in db.listings.find({"_id": {"$in": missing_ids}}, {"address": 1}):
+            addresses[listing["_id"]] = listing.get("address")
+    
+    # Format each communication as the response is streamed (IDs and dates
+    # are serialized by the JSON provider)
+    result = ({
+        "id": comm["_id"],
+        "listing_id": comm["listing_id"],
+        "listing_address": comm.get("listing_address") or addresses.get(comm["listing_id"]) or "Unknown",
+        "direction": comm["direction"],
+        "type": comm["type"],
+        "subject": comm["subject"],
+        "status": comm["status"],
+        "created_at": comm["created_at"],
+        "sent_at": comm.get("sent_at")
+    } for comm in communications)
+    
+    return stream_list(
+        "communications",
+        result,
+        count=len(communications),
+        next_cursor=next_cursor(communications, limit, "created_at", "_id")
+    )
 
 @communications_bp.route('/<communication_id>', methods=['GET'])
 def get_communication(communication_id):
@@ -224,16 +255,11 @@ def get_communication(communication_id):
         return jsonify({"error": "Not logged in"}), 401
     
     # Get communication
-    comm_data = db.communications.find_one({
-        "_id": ObjectId(communication_id),
-        "user_id": ObjectId(session['user_id'])
-    })
+    communication = Communication.find_by_id(communication_id)
     
-    if not comm_data:
+    if not communication or communication.user_id != ObjectId(session['user_id']):
         return jsonify({"error": "Communication not found"}), 404
     
-    communication = Communication(**comm_data)
-    
     return jsonify({
         "id": str(communication._id),
         "listing_id": str(communication.listing_id),
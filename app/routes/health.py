@@ -0,0 +1,48 @@
+import time
+from flask import Blueprint, jsonify
+from app.indexes import missing_indexes, index_name
+from app.utils.admission import admission_metrics
+from app import db
+
+health_bp = Blueprint('health', __name__, url_prefix='/api/health')
+
+# Seconds to wait before re-checking indexes while not ready
+READINESS_CHECK_INTERVAL = 10
+
+# Readiness only ever flips once per process, so cache it
+readiness = {
+    "ready": False,
+    "checked_at": 0,
+    "missing": []
+}
+
+@health_bp.route('/', methods=['GET'])
+def liveness():
+    """Report that the process is up"""
+    return jsonify({"status": "ok"})
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """Report whether the required indexes exist so traffic can be routed here"""
+    now = time.monotonic()
+    
+    if not readiness["ready"] and now - readiness["checked_at"] >= READINESS_CHECK_INTERVAL:
+        readiness["missing"] = [
+            f"{collection_name}.{index_name(spec)}"
+            for collection_name, spec in missing_indexes(db)
+        ]
+        readiness["ready"] = not readiness["missing"]
+        readiness["checked_at"] = now
+    
+    if not readiness["ready"]:
+        return jsonify({
+            "status": "not_ready",
+            "missing_indexes": readiness["missing"]
+        }), 503
+    
+    return jsonify({"status": "ready"})
+
+@health_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Report admission control counters (this process's rejections, all workers' in-flight provider calls)"""
+    return jsonify(admission_metrics())
@@ -1,12 +1,35 @@
-from flask import Blueprint, request, jsonify, session
-from app.services.matching_service import MatchingService
-from app.models.user import User
+import time
+from flask import Blueprint, Response, current_app, request, jsonify, session, url_for
+from app.utils.auth import current_user
+from app.services import get_matching_service, get_listing_index, get_match_status_buffer, get_refresh_job_service
+from app.services.refresh_job_service import FINISHED_STATUSES
 from app import db
+from app.models.listing import Listing
+from app.models.listing_history import ListingHistory
+from app.models.archive import find_archived, restore_one
+from app.models.user_stats import UserStats
+from app.utils.pagination import next_cursor
+from app.utils.serialization import list_mimetype, stream_list
+from app.utils.caching import cache_headers, not_modified, version_tag
+from app.utils.admission import Overloaded, rate_limited, too_many_requests
+from app.config import REFRESH_EVENTS_TIMEOUT_SECONDS
 from bson.objectid import ObjectId
 
 listings_bp = Blueprint('listings', __name__, url_prefix='/api/listings')
 
-matching_service = MatchingService()
+# Match fields shown in listing details (the response is versioned by them)
+DETAILS_MATCH_FIELDS = ("_id", "status", "contacted", "date_matched", "price_drop")
+
+# Communication fields listing details are versioned by
+COMMUNICATION_VERSION_PROJECTION = {"status": 1, "created_at": 1, "sent_at": 1, "last_updated": 1}
+
+# Seconds between checks for progress on a refresh job's event stream
+REFRESH_EVENTS_POLL_SECONDS = 1
+
+# Seconds a search waits for the listing index's first load before giving up
+# with 503 (and the Retry-After sent then)
+SEARCH_INDEX_WAIT_SECONDS = 5
+SEARCH_INDEX_RETRY_AFTER_SECONDS = 10
 
 @listings_bp.route('/matches', methods=['GET'])
 def get_matches():
@@ -18,19 +41,37 @@ def get_matches():
     status = request.args.get('status')
     limit = int(request.args.get('limit', 20))
     skip = int(request.args.get('skip', 0))
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort', 'date_matched')
     
-    # Get matches for user
-    matches = matching_service.get_user_matches(
-        session['user_id'], 
-        status=status, 
-        limit=limit, 
-        skip=skip
-    )
+    page = {
+        "status": status,
+        "limit": limit,
+        "skip": skip,
+        "cursor": cursor,
+        "sort": sort
+    }
     
-    return jsonify({
-        "matches": matches,
-        "count": len(matches)
-    })
+    # Get matches for user, unless the client's copy of the page is current
+    # (in the same representation, since JSON and NDJSON bodies differ)
+    try:
+        etag = version_tag(get_matching_service().get_user_matches_version(session['user_id'], **page), list_mimetype())
+        unchanged = not_modified(etag, vary="Accept")
+        if unchanged:
+            return unchanged
+        
+        matches = get_matching_service().get_user_matches(session['user_id'], **page)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    response = stream_list(
+        "matches",
+        matches,
+        count=len(matches),
+        next_cursor=next_cursor(matches, limit, sort, "match_id")
+    )
+    response.headers.update(cache_headers(etag, vary="Accept"))
+    return response
 
 @listings_bp.route('/matches/<match_id>/status', methods=['PUT'])
 def update_match_status(match_id):
@@ -44,17 +85,18 @@ def update_match_status(match_id):
     if not new_status:
         return jsonify({"error": "Status is required"}), 400
     
-    # Make sure the match belongs to the current user
-    match = db.matches.find_one({
+    # Make sure the match belongs to the current user (restoring it if it was archived)
+    query = {
         "_id": ObjectId(match_id),
         "user_id": ObjectId(session['user_id'])
-    })
+    }
+    match = db.matches.find_one(query) or restore_one("matches", query)
     
     if not match:
         return jsonify({"error": "Match not found"}), 404
     
     # Update the match status
-    success = matching_service.update_match_status(match_id, new_status)
+    success = get_matching_service().update_match_status(match_id, new_status)
     
     if success:
         return jsonify({
@@ -66,25 +108,158 @@ def update_match_status(match_id):
         return jsonify({"error": "Failed to update match status"}), 500
 
 @listings_bp.route('/refresh', methods=['POST'])
+@rate_limited("refresh")
 def refresh_listings():
     """Manually refresh listings for the current user"""
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
-    user = User(**user_data)
+    # Run the refresh in the background (or report the one already running)
+    refresh_jobs = get_refresh_job_service()
+    try:
+        job, queued = refresh_jobs.enqueue(user._id)
+    except Overloaded as e:
+        return too_many_requests(str(e), e.retry_after)
+    status_url = url_for('listings.get_refresh_job', job_id=str(job["_id"]))
+    
+    return jsonify({
+        "message": "Refresh started" if queued else "Refresh already in progress",
+        "job": refresh_jobs.format_job(job),
+        "status_url": status_url,
+        "events_url": url_for('listings.stream_refresh_job', job_id=str(job["_id"]))
+    }), 202, {"Location": status_url}
+
+@listings_bp.route('/refresh/<job_id>', methods=['GET'])
+def get_refresh_job(job_id):
+    """Get the status and progress of a refresh job"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    refresh_jobs = get_refresh_job_service()
+    job = refresh_jobs.get_job(job_id, session['user_id'])
+    if not job:
+        return jsonify({"error": "Refresh job not found"}), 404
+    
+    return jsonify(refresh_jobs.format_job(job))
+
+@listings_bp.route('/refresh/<job_id>/events', methods=['GET'])
+def stream_refresh_job(job_id):
+    """
+    Stream a refresh job's progress as server-sent events ("progress" on
+    each change, then "done")
+    
+    The stream closes after REFRESH_EVENTS_TIMEOUT_SECONDS and EventSource
+    clients reconnect, so a slow job doesn't hold a worker indefinitely.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    user_id = session['user_id']
+    refresh_jobs = get_refresh_job_service()
+    if not refresh_jobs.get_job(job_id, user_id):
+        return jsonify({"error": "Refresh job not found"}), 404
     
-    # Find new matches for user
-    result = matching_service.find_matches_for_user(user)
+    encode = current_app.json.dumps
+    
+    def events():
+        yield "retry: 2000\n\n"
+        deadline = time.monotonic() + REFRESH_EVENTS_TIMEOUT_SECONDS
+        last_sent = None
+        
+        while True:
+            job = refresh_jobs.get_job(job_id, user_id)
+            if not job:
+                return
+            
+            formatted = refresh_jobs.format_job(job)
+            if job["status"] in FINISHED_STATUSES:
+                yield f"event: done\ndata: {encode(formatted)}\n\n"
+                return
+            
+            if formatted != last_sent:
+                yield f"event: progress\ndata: {encode(formatted)}\n\n"
+                last_sent = formatted
+            
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(REFRESH_EVENTS_POLL_SECONDS)
+    
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Don't let a proxy hold events back
+    })
+
+def _float_arg(name):
+    """Get an optional numeric query parameter (raises ValueError if malformed)"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}")
+
+@listings_bp.route('/search', methods=['GET'])
+def search_listings():
+    """Search active listings (served from the in-memory listing index)"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    args = request.args
+    try:
+        near = None
+        if args.get('near'):
+            latitude, longitude = args['near'].split(',')
+            near = (float(latitude), float(longitude))
+        
+        filters = {
+            "min_price": _float_arg('min_price'),
+            "max_price": _float_arg('max_price'),
+            "min_bedrooms": _float_arg('min_bedrooms'),
+            "min_bathrooms": _float_arg('min_bathrooms'),
+            "property_types": args['property_types'].split(',') if args.get('property_types') else None,
+            "near": near,
+            "radius_km": _float_arg('radius_km')
+        }
+        limit = min(int(args.get('limit', 20)), 100)
+        skip = int(args.get('skip', 0))
+        
+        # Workers warm the index at start (see gunicorn.conf.py); this only waits
+        # elsewhere, or while the first load is still failing
+        index = get_listing_index()
+        index.start()
+        if not index.wait_loaded(SEARCH_INDEX_WAIT_SECONDS):
+            return jsonify({
+                "error": "Listing search is starting up, try again later",
+                "retry_after": SEARCH_INDEX_RETRY_AFTER_SECONDS
+            }), 503, {"Retry-After": str(SEARCH_INDEX_RETRY_AFTER_SECONDS)}
+        
+        results, total = index.search(**filters, sort=args.get('sort', '-date_found'), limit=limit, skip=skip)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Only the page of results is read from the database
+    listings = {
+        listing._id: listing
+        for listing in Listing.find_by_ids([listing_id for listing_id, _ in results], fields=Listing.DICT_FIELDS)
+    }
+    
+    formatted = []
+    for listing_id, distance_km in results:
+        if listing_id in listings:
+            listing = listings[listing_id].to_dict()
+            listing["distance_km"] = distance_km
+            formatted.append(listing)
     
     return jsonify({
-        "message": "Listings refreshed successfully",
-        "new_matches": result.get("new_listings", 0),
-        "errors": result.get("errors", [])
+        "listings": formatted,
+        "count": len(formatted),
+        "total": total
     })
 
 @listings_bp.route('/details/<listing_id>', methods=['GET'])
@@ -93,36 +268,53 @@ def get_listing_details(listing_id):
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    # Get the listing from the database
-    listing = db.listings.find_one({"_id": ObjectId(listing_id)})
+    # Check the listing exists (only reading what the response is versioned by)
+    listing_version = db.listings.find_one({"_id": ObjectId(listing_id)}, {"last_updated": 1})
     
-    if not listing:
+    if not listing_version:
         return jsonify({"error": "Listing not found"}), 404
     
-    # Check if the user has a match for this listing
-    match = db.matches.find_one({
+    # Check if the user has a match for this listing (restoring it if it was archived)
+    query = {
         "user_id": ObjectId(session['user_id']),
         "listing_id": ObjectId(listing_id)
-    })
+    }
+    match = db.matches.find_one(query) or restore_one("matches", query)
     
     if not match:
         return jsonify({"error": "You do not have access to this listing"}), 403
     
-    # Update match status to viewed if it's new
+    # Update match status to viewed if it's new (written behind, in batches)
     if match.get("status") == "new":
-        db.matches.update_one(
-            {"_id": match["_id"]},
-            {"$set": {
-                "status": "viewed",
-                "last_updated": db.datetime.utcnow()
-            }}
+        get_match_status_buffer().mark_viewed(match["_id"])
+    
+    # Opening the listing shows the landlord's reply
+    if match.get("reply_unread"):
+        read = db.matches.update_one(
+            {"_id": match["_id"], "reply_unread": True},
+            {"$set": {"reply_unread": False}}
         )
+        if read.modified_count:
+            UserStats.increment(match["user_id"], {"unread_replies": -1})
     
-    # Get communication history for this listing
-    communications = list(db.communications.find({
-        "user_id": ObjectId(session['user_id']),
-        "listing_id": ObjectId(listing_id)
-    }).sort("created_at", -1))
+    # Skip building the response if the client's copy is current (price
+    # history only changes along with the listing's last_updated)
+    communication_versions = list(db.communications.find(query, COMMUNICATION_VERSION_PROJECTION))
+    communication_versions += find_archived("communications", query, COMMUNICATION_VERSION_PROJECTION)
+    etag = version_tag(
+        listing_version,
+        {field: match.get(field) for field in DETAILS_MATCH_FIELDS},
+        sorted(communication_versions, key=lambda comm: comm["_id"])
+    )
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    listing = db.listings.find_one({"_id": ObjectId(listing_id)})
+    
+    # Get communication history for this listing, including archived messages
+    communications = list(db.communications.find(query).sort("created_at", -1))
+    communications += find_archived("communications", query, sort=[("created_at", -1)])
     
     # Format communications for response
     comms_formatted = []
@@ -139,7 +331,7 @@ def get_listing_details(listing_id):
         })
     
     # Return listing details and communication history
-    return jsonify({
+    response = jsonify({
         "listing": {
             "id": str(listing["_id"]),
             "external_id": listing["external_id"],
@@ -155,13 +347,17 @@ def get_listing_details(listing_id):
             "available_from": listing.get("available_from"),
             "property_type": listing.get("property_type"),
             "date_found": listing["date_found"],
-            "contact_info": listing.get("contact_info", {})
+            "contact_info": listing.get("contact_info", {}),
+            "price_history": ListingHistory.for_listing(listing["_id"])
         },
         "match": {
             "id": str(match["_id"]),
             "status": match["status"],
             "contacted": match["contacted"],
-            "date_matched": match["date_matched"]
+            "date_matched": match["date_matched"],
+            "price_drop": match.get("price_drop")
         },
         "communications": comms_formatted
-    })
\ No newline at end of file
+    })
+    response.headers.update(cache_headers(etag))
+    return response
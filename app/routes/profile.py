@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, session
-from app.models.user import User
-from app import db
-from bson.objectid import ObjectId
+from app.utils.auth import current_user
+from app.services import get_refresh_job_service
+from app.utils.geo import preference_area
+from app.models.user_stats import UserStats
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/api/profile')
 
@@ -11,13 +12,11 @@ def get_profile():
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
-    user = User(**user_data)
-    
     return jsonify({
         "id": str(user._id),
         "email": user.email,
@@ -35,13 +34,12 @@ def update_profile():
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
     data = request.get_json()
-    user = User(**user_data)
     
     # Update basic information
     if 'first_name' in data:
@@ -77,21 +75,28 @@ def update_preferences():
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
     data = request.get_json()
-    user = User(**user_data)
     
     # Update rental preferences
     if 'rental_preferences' in data:
+        try:
+            preference_area(data['rental_preferences'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         user.rental_preferences = data['rental_preferences']
     
     # Save changes
     user.save()
     
+    # Re-rank the user's matches against the new preferences, in the background
+    if 'rental_preferences' in data:
+        get_refresh_job_service().rescore(user._id)
+    
     return jsonify({
         "message": "Rental preferences updated successfully",
         "rental_preferences": user.rental_preferences
@@ -103,13 +108,12 @@ def update_password():
     if 'user_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    user_data = db.users.find_one({"_id": ObjectId(session['user_id'])})
-    if not user_data:
+    user = current_user()
+    if not user:
         session.pop('user_id', None)
         return jsonify({"error": "User not found"}), 404
     
     data = request.get_json()
-    user = User(**user_data)
     
     # Check current password
     if not user.check_password(data.get('current_password')):
@@ -123,4 +127,19 @@ def update_password():
     
     return jsonify({
         "message": "Password updated successfully"
-    })
\ No newline at end of file
+    })
+
+@profile_bp.route('/dashboard', methods=['GET'])
+def get_dashboard():
+    """Get the current user's dashboard counters (one precomputed document)"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    stats = UserStats.get(session['user_id'])
+    
+    return jsonify({
+        "matches": stats["matches"],
+        "unread_replies": stats["unread_replies"],
+        "drafts": stats["drafts"],
+        "updated_at": stats.get("updated_at")
+    })
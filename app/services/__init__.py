@@ -1 +1,68 @@
-# Services initialization
\ No newline at end of file
+# Services initialization
+import os
+import threading
+
+# Services are built on first use and cached per process, so forked workers
+# never share instances (or the connections inside them) with their parent
+_services = {}
+_services_pid = None
+_services_lock = threading.RLock()
+
+def _get_service(name, factory):
+    """Get a cached service for this process, building it with factory on first use"""
+    global _services_pid
+    
+    with _services_lock:
+        if _services_pid != os.getpid():
+            _services.clear()
+            _services_pid = os.getpid()
+        
+        if name not in _services:
+            _services[name] = factory()
+        
+        return _services[name]
+
+def get_email_service():
+    """Get the EmailService for this process"""
+    from app.services.email_service import EmailService
+    return _get_service('email_service', EmailService)
+
+def get_matching_service():
+    """Get the MatchingService for this process"""
+    from app.services.matching_service import MatchingService
+    return _get_service('matching_service', lambda: MatchingService(listing_index=get_listing_index()))
+
+def get_follow_up_service():
+    """Get the FollowUpService for this process"""
+    from app.services.follow_up_service import FollowUpService
+    return _get_service('follow_up_service', FollowUpService)
+
+def get_archive_service():
+    """Get the ArchiveService for this process"""
+    from app.services.archive_service import ArchiveService
+    return _get_service('archive_service', ArchiveService)
+
+def get_refresh_job_service():
+    """Get the RefreshJobService for this process"""
+    from app.services.refresh_job_service import RefreshJobService
+    return _get_service('refresh_job_service', lambda: RefreshJobService(get_matching_service()))
+
+def get_listing_expiry_service():
+    """Get the ListingExpiryService for this process"""
+    from app.services.listing_expiry_service import ListingExpiryService
+    return _get_service('listing_expiry_service', ListingExpiryService)
+
+def get_match_status_buffer():
+    """Get the MatchStatusBuffer for this process"""
+    from app.services.match_status_buffer import MatchStatusBuffer
+    return _get_service('match_status_buffer', MatchStatusBuffer)
+
+def get_listing_index():
+    """Get the ListingIndex for this process"""
+    from app.services.listing_index import ListingIndex
+    return _get_service('listing_index', ListingIndex)
+
+def get_scheduler():
+    """Get the SchedulerService for this process"""
+    from app.services.scheduler import SchedulerService
+    return _get_service('scheduler', SchedulerService)
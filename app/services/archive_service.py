@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime, timedelta
+from pymongo.errors import BulkWriteError
+from app import db
+from app.models.archive import archive_collection
+from app.models.user_stats import UserStats
+from app.config import MATCH_ARCHIVE_DAYS, COMMUNICATION_ARCHIVE_DAYS, ARCHIVE_BATCH_SIZE
+
+# Match statuses that are done with and can be archived once old enough
+ARCHIVABLE_MATCH_STATUSES = ("rejected", "expired")
+
+# Server error code for duplicate keys
+DUPLICATE_KEY_ERROR = 11000
+
+class ArchiveService:
+    """Service for moving old records out of the hot collections"""
+    
+    def __init__(self, match_days=MATCH_ARCHIVE_DAYS, communication_days=COMMUNICATION_ARCHIVE_DAYS,
+                 batch_size=ARCHIVE_BATCH_SIZE):
+        self.match_retention = timedelta(days=match_days)
+        self.communication_retention = timedelta(days=communication_days)
+        self.batch_size = batch_size
+    
+    def retention_policies(self, now):
+        """
+        Get the query selecting archivable records in each hot collection
+        
+        - matches: rejected or expired matches untouched for MATCH_ARCHIVE_DAYS
+        - communications: communications older than COMMUNICATION_ARCHIVE_DAYS
+        """
+        return {
+            "matches": {
+                "status": {"$in": list(ARCHIVABLE_MATCH_STATUSES)},
+                "last_updated": {"$lt": now - self.match_retention}
+            },
+            "communications": {
+                "created_at": {"$lt": now - self.communication_retention}
+            }
+        }
+    
+    def run(self, now=None):
+        """
+        Archive every record past its retention policy
+        
+        Args:
+            now: Time retention is measured back from
+        
+        Returns:
+            dict: Number of archived records per collection
+        """
+        now = now or datetime.utcnow()
+        result = {}
+        
+        for collection_name, query in self.retention_policies(now).items():
+            result[collection_name] = self._archive(collection_name, query, now)
+        
+        logging.info(f"Archive job completed: {result}")
+        return result
+    
+    def _archive(self, collection_name, query, now):
+        """
+        Move records matching query to the archive in batches
+        
+        Each batch is copied to the archive before being deleted from the
+        hot collection, so an interrupted run is finished by the next one
+        (copies that already exist are skipped as duplicates). Records that
+        stopped matching the policy between the copy and the delete are
+        kept hot and their archive copies removed. Dashboard counters only
+        count hot records, so they're rebuilt for the users in each batch.
+        """
+        hot = db[collection_name]
+        archive = archive_collection(collection_name)
+        archived = 0
+        
+        while True:
+            batch = list(hot.find(query).limit(self.batch_size))
+            if not batch:
+                break
+            
+            for document in batch:
+                document["archived_at"] = now
+            
+            try:
+                archive.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]):
+                    raise
+            
+            ids = [document["_id"] for document in batch]
+            deleted = hot.delete_many({"_id": {"$in": ids}, **query})
+            
+            if deleted.deleted_count < len(ids):
+                still_hot = [document["_id"] for document in hot.find({"_id": {"$in": ids}}, {"_id": 1})]
+                archive.delete_many({"_id": {"$in": still_hot}})
+            
+            archived += deleted.deleted_count
+            UserStats.rebuild({document["user_id"] for document in batch})
+            
+            if len(batch) < self.batch_size:
+                break
+        
+        return archived
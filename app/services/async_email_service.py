@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from app.api.openai_client import AsyncOpenAIClient
+from app.models.user_stats import UserStats
+from app.services.email_service import EmailService
+
+class AsyncEmailService:
+    """
+    Draft generation for the ASGI app (see app.asgi)
+    
+    Prompts and drafts are EmailService's; the OpenAI call and the writes
+    are awaited on the event loop (with Motor), so a worker holds no thread
+    while a completion is generated.
+    """
+    
+    def __init__(self, adb, openai_client=None):
+        """
+        Args:
+            adb: Motor database
+            openai_client: AsyncOpenAIClient (one is created if not given)
+        """
+        self.db = adb
+        self.openai_client = openai_client or AsyncOpenAIClient()
+    
+    async def create_initial_contact_email(self, user, listing):
+        """
+        Generate an initial contact email for a rental listing
+        
+        Returns:
+            Communication: The created communication object (unsent)
+        """
+        email_content = await self.openai_client.generate_email(
+            'initial_outreach', EmailService.initial_contact_context(user, listing)
+        )
+        
+        if not email_content:
+            logging.error("Failed to generate initial contact email")
+            return None
+        
+        return await self._save_draft(
+            EmailService.new_draft(user, listing, f"Inquiry about rental property at {listing.address}", email_content)
+        )
+    
+    async def create_follow_up_email(self, user, listing, initial_contact_date):
+        """
+        Generate a follow-up email for a rental listing
+        
+        Returns:
+            Communication: The created communication object (unsent)
+        """
+        email_content = await self.openai_client.generate_email(
+            'follow_up', EmailService.follow_up_context(user, listing, initial_contact_date)
+        )
+        
+        if not email_content:
+            logging.error("Failed to generate follow-up email")
+            return None
+        
+        return await self._save_draft(
+            EmailService.new_draft(user, listing, f"Follow-up: Inquiry about rental property at {listing.address}", email_content)
+        )
+    
+    async def close(self):
+        """Release the OpenAI client's connections"""
+        await self.openai_client.close()
+    
+    async def _save_draft(self, communication):
+        """Insert a new draft and count it on the user's dashboard (as Communication.save does)"""
+        result = await self.db.communications.insert_one(communication._document())
+        communication._id = result.inserted_id
+        communication._mark_clean()
+        
+        result = await self.db.user_stats.update_one(
+            {"_id": communication.user_id}, UserStats.increment_update({"drafts": 1})
+        )
+        if not result.matched_count:
+            # First counters for this user are built from scratch, off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, UserStats.rebuild, [communication.user_id])
+        
+        return communication
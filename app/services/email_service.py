@@ -2,11 +2,14 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
 from app.api.openai_client import OpenAIClient
 from app.models.communication import Communication
+from app.models.user_stats import UserStats
 from app import db
 from app.config import EMAIL_SERVER, EMAIL_PORT, EMAIL_USERNAME, EMAIL_PASSWORD, EMAIL_USE_TLS
+from app.config import FOLLOW_UP_DELAY_HOURS, FOLLOW_UP_MAX_ATTEMPTS
 
 class EmailService:
     """Service for handling email communications with landlords/property managers"""
@@ -32,43 +35,15 @@ class EmailService:
         Returns:
             Communication: The created communication object (unsent)
         """
-        # Prepare context for email generation
-        context = {
-            'address': listing.address,
-            'price': listing.price,
-            'bedrooms': listing.bedrooms,
-            'bathrooms': listing.bathrooms,
-            'user_name': f"{user.first_name} {user.last_name}",
-            'move_in_date': user.rental_preferences.get('move_in_date', 'flexible'),
-            'occupants': user.rental_preferences.get('occupants', 1),
-            'preferred_viewing_date': 'next week'  # Default, could be customized
-        }
-        
         # Generate email content using OpenAI
-        email_content = self.openai_client.generate_email('initial_outreach', context)
+        email_content = self.openai_client.generate_email('initial_outreach', self.initial_contact_context(user, listing))
         
         if not email_content:
             logging.error("Failed to generate initial contact email")
             return None
         
-        # Create a subject line
-        subject = f"Inquiry about rental property at {listing.address}"
-        
-        # Create a new communication record
-        communication = Communication(
-            user_id=user._id,
-            listing_id=listing._id,
-            direction='outgoing',
-            type='email',
-            subject=subject,
-            content=email_content,
-            recipient=listing.contact_info.get('email'),
-            sender=EMAIL_USERNAME,
-            status='draft',
-            created_at=datetime.utcnow()
-        )
-        
         # Save to database
+        communication = self.new_draft(user, listing, f"Inquiry about rental property at {listing.address}", email_content)
         communication.save()
         
         return communication
@@ -85,41 +60,64 @@ class EmailService:
         Returns:
             Communication: The created communication object (unsent)
         """
-        # Prepare context for email generation
-        context = {
-            'address': listing.address,
-            'initial_contact_date': initial_contact_date,
-            'user_name': f"{user.first_name} {user.last_name}"
-        }
-        
         # Generate email content using OpenAI
+        context = self.follow_up_context(user, listing, initial_contact_date)
         email_content = self.openai_client.generate_email('follow_up', context)
         
         if not email_content:
             logging.error("Failed to generate follow-up email")
             return None
         
-        # Create a subject line
-        subject = f"Follow-up: Inquiry about rental property at {listing.address}"
+        # Save to database
+        communication = self.new_draft(user, listing, f"Follow-up: Inquiry about rental property at {listing.address}", email_content)
+        communication.save()
+        
+        return communication
+    
+    @staticmethod
+    def initial_contact_context(user, listing):
+        """Get the prompt context for an initial contact email"""
+        return {
+            'address': listing.address,
+            'price': listing.price,
+            'bedrooms': listing.bedrooms,
+            'bathrooms': listing.bathrooms,
+            'user_name': f"{user.first_name} {user.last_name}",
+            'move_in_date': user.rental_preferences.get('move_in_date', 'flexible'),
+            'occupants': user.rental_preferences.get('occupants', 1),
+            'preferred_viewing_date': 'next week'  # Default, could be customized
+        }
+    
+    @staticmethod
+    def follow_up_context(user, listing, initial_contact_date):
+        """Get the prompt context for a follow-up email"""
+        return {
+            'address': listing.address,
+            'initial_contact_date': initial_contact_date,
+            'user_name': f"{user.first_name} {user.last_name}"
+        }
+    
+    @staticmethod
+    def new_draft(user, listing, subject, content):
+        """
+        Build an unsaved draft to a listing's contact
         
-        # Create a new communication record
-        communication = Communication(
+        Returns:
+            Communication: The draft (save it to store it)
+        """
+        return Communication(
             user_id=user._id,
             listing_id=listing._id,
+            listing_address=listing.address,
             direction='outgoing',
             type='email',
             subject=subject,
-            content=email_content,
+            content=content,
             recipient=listing.contact_info.get('email'),
             sender=EMAIL_USERNAME,
             status='draft',
             created_at=datetime.utcnow()
         )
-        
-        # Save to database
-        communication.save()
-        
-        return communication
     
     def send_email(self, communication_id):
         """
@@ -133,13 +131,11 @@ class EmailService:
         """
         try:
             # Get the communication from the database
-            comm_data = db.communications.find_one({"_id": communication_id})
-            if not comm_data:
+            communication = Communication.find_by_id(communication_id)
+            if not communication:
                 logging.error(f"Communication {communication_id} not found")
                 return False
             
-            communication = Communication(**comm_data)
-            
             # Prepare the email
             msg = MIMEMultipart()
             msg['From'] = communication.sender
@@ -162,27 +158,60 @@ class EmailService:
             # Update the communication status
             communication.mark_as_sent()
             
-            # Update the match status if applicable
-            match = db.matches.find_one({
-                "user_id": communication.user_id,
-                "listing_id": communication.listing_id
-            })
+            # Update the match status if applicable, moving the dashboard
+            # counters from the status it had at the moment of this write
+            match = db.matches.find_one_and_update(
+                {"user_id": communication.user_id, "listing_id": communication.listing_id},
+                {"$set": {
+                    "contacted": True,
+                    "status": "contacted",
+                    "last_updated": datetime.utcnow()
+                }},
+                projection={"user_id": 1, "status": 1, "follow_up_count": 1},
+                return_document=ReturnDocument.BEFORE
+            )
             
             if match:
-                db.matches.update_one(
-                    {"_id": match["_id"]},
-                    {"$set": {
-                        "contacted": True,
-                        "status": "contacted",
-                        "last_updated": datetime.utcnow()
-                    }}
-                )
+                UserStats.match_status_changed(match["user_id"], match.get("status"), "contacted")
+                
+                # Schedule the next follow-up unless we've run out of attempts
+                if match.get("follow_up_count", 0) < FOLLOW_UP_MAX_ATTEMPTS:
+                    follow_up = {"$set": {"next_follow_up_at": communication.sent_at + timedelta(hours=FOLLOW_UP_DELAY_HOURS)}}
+                else:
+                    follow_up = {"$unset": {"next_follow_up_at": ""}}
+                db.matches.update_one({"_id": match["_id"]}, follow_up)
             
             return True
         except Exception as e:
             logging.error(f"Error sending email: {str(e)}")
             return False
     
+    def clear_follow_up(self, user_id, listing_id):
+        """
+        Cancel any pending follow-up for a user/listing match, and flag the
+        reply as unread until the user opens the listing
+        
+        Args:
+            user_id: User ID
+            listing_id: Listing ID
+        """
+        previous = db.matches.find_one_and_update(
+            {"user_id": user_id, "listing_id": listing_id},
+            {
+                "$unset": {"next_follow_up_at": ""},
+                "$set": {
+                    "reply_unread": True,
+                    "last_reply_at": datetime.utcnow(),
+                    "last_updated": datetime.utcnow()
+                }
+            },
+            projection={"reply_unread": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        
+        if previous and not previous.get("reply_unread"):
+            UserStats.increment(user_id, {"unread_replies": 1})
+    
     def analyze_incoming_email(self, email_content, original_communication_id=None):
         """
         Analyze an incoming email response
@@ -200,13 +229,19 @@ class EmailService:
             
             if original_communication_id:
                 # Update the original communication with the analysis
-                db.communications.update_one(
+                original = db.communications.find_one_and_update(
                     {"_id": original_communication_id},
                     {"$set": {
                         "analysis": analysis,
                         "last_updated": datetime.utcnow()
-                    }}
+                    }},
+                    projection={"user_id": 1, "listing_id": 1},
+                    return_document=ReturnDocument.AFTER
                 )
+                
+                # The landlord replied, so stop chasing them
+                if original:
+                    self.clear_follow_up(original["user_id"], original["listing_id"])
             
             return analysis
         except Exception as e:
@@ -0,0 +1,149 @@
+import logging
+from datetime import datetime, timedelta
+from app.services.email_service import EmailService
+from app.models.user import User
+from app.models.listing import Listing
+from app import db
+from app.config import FOLLOW_UP_BATCH_SIZE
+
+# How long to wait before retrying a follow-up that failed to generate
+RETRY_DELAY = timedelta(hours=1)
+
+# Listing fields used to write and address a follow-up
+FOLLOW_UP_LISTING_FIELDS = ("address", "contact_info", "status")
+
+class FollowUpService:
+    """Service for following up on outreach that landlords haven't answered"""
+    
+    def __init__(self, openai_api_key=None, batch_size=FOLLOW_UP_BATCH_SIZE):
+        self.email_service = EmailService(openai_api_key)
+        self.batch_size = batch_size
+    
+    def run_sweep(self, now=None):
+        """
+        Generate follow-ups for every match whose follow-up is due
+        
+        Only matches with a `next_follow_up_at` in the past are read (via the
+        index on that field), so the cost is proportional to the number of
+        due follow-ups rather than the size of the matches collection.
+        
+        Args:
+            now: Cut-off time (defaults to the current time)
+        
+        Returns:
+            dict: Counts of processed, drafted and sent follow-ups
+        """
+        now = now or datetime.utcnow()
+        logging.info(f"Running follow-up sweep at {now}")
+        
+        result = {
+            "processed": 0,
+            "drafted": 0,
+            "sent": 0,
+            "errors": []
+        }
+        
+        while True:
+            due_matches = list(db.matches.find(
+                {"next_follow_up_at": {"$lte": now}},
+                {"user_id": 1, "listing_id": 1, "next_follow_up_at": 1}
+            ).sort("next_follow_up_at", 1).limit(self.batch_size))
+            
+            if not due_matches:
+                break
+            
+            self._process_batch(due_matches, now, result)
+            
+            if len(due_matches) < self.batch_size:
+                break
+        
+        logging.info(f"Follow-up sweep completed: {result['drafted']} drafted, {result['sent']} sent")
+        return result
+    
+    def _process_batch(self, due_matches, now, result):
+        """Process a batch of due matches with one lookup per collection"""
+        user_ids = list({match["user_id"] for match in due_matches})
+        listing_ids = list({match["listing_id"] for match in due_matches})
+        
+        users = {user._id: user for user in User.find_by_ids(user_ids)}
+        listings = {
+            listing._id: listing
+            for listing in Listing.find_by_ids(listing_ids, fields=FOLLOW_UP_LISTING_FIELDS)
+        }
+        outreach = self._load_outreach_summary(user_ids, listing_ids)
+        
+        for match in due_matches:
+            # Claim the match so a concurrent sweep doesn't pick it up too
+            claimed = db.matches.update_one(
+                {"_id": match["_id"], "next_follow_up_at": match["next_follow_up_at"]},
+                {
+                    "$unset": {"next_follow_up_at": ""},
+                    "$inc": {"follow_up_count": 1},
+                    "$set": {"last_updated": now}
+                }
+            )
+            if not claimed.modified_count:
+                continue
+            
+            result["processed"] += 1
+            
+            user = users.get(match["user_id"])
+            listing = listings.get(match["listing_id"])
+            summary = outreach.get((match["user_id"], match["listing_id"]), {})
+            
+            if not user or not listing or listing.status != "active":
+                continue
+            
+            # The user already has an unsent draft for this listing
+            if summary.get("has_draft"):
+                continue
+            
+            try:
+                initial_date = summary.get("first_sent_at") or match["next_follow_up_at"]
+                communication = self.email_service.create_follow_up_email(user, listing, initial_date)
+                
+                if not communication:
+                    raise RuntimeError("failed to generate follow-up email")
+                
+                result["drafted"] += 1
+                
+                # Sending reschedules the next follow-up on the match
+                if user.email_automated and self.email_service.send_email(communication._id):
+                    result["sent"] += 1
+            except Exception as e:
+                logging.error(f"Error following up on match {match['_id']}: {str(e)}")
+                result["errors"].append(str(e))
+                
+                db.matches.update_one(
+                    {"_id": match["_id"]},
+                    {
+                        "$set": {"next_follow_up_at": now + RETRY_DELAY},
+                        "$inc": {"follow_up_count": -1}
+                    }
+                )
+    
+    def _load_outreach_summary(self, user_ids, listing_ids):
+        """
+        Summarize outgoing communications for a batch of matches
+        
+        Returns:
+            dict: (user_id, listing_id) -> first sent date and pending draft flag
+        """
+        pipeline = [
+            {"$match": {
+                "user_id": {"$in": user_ids},
+                "listing_id": {"$in": listing_ids},
+                "direction": "outgoing",
+                "status": {"$in": ["draft", "sent"]}
+            }},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "listing_id": "$listing_id"},
+                "first_sent_at": {"$min": "$sent_at"},
+                "has_draft": {"$max": {"$eq": ["$status", "draft"]}}
+            }}
+        ]
+        
+        return {
+            (row["_id"]["user_id"], row["_id"]["listing_id"]): row
+            for row in db.communications.aggregate(pipeline)
+        }
@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime, timedelta
+from app import db
+from app.models.listing_history import ListingHistory
+from app.models.user_stats import UserStats
+from app.config import LISTING_EXPIRY_DAYS, LISTING_EXPIRY_BATCH_SIZE
+
+# Match statuses that expire with their listing (later statuses are kept as a record)
+EXPIRING_MATCH_STATUSES = ("new", "viewed")
+
+class ListingExpiryService:
+    """Service for expiring listings that are no longer on the market"""
+    
+    def __init__(self, expiry_days=LISTING_EXPIRY_DAYS, batch_size=LISTING_EXPIRY_BATCH_SIZE):
+        self.expiry_window = timedelta(days=expiry_days)
+        self.batch_size = batch_size
+    
+    def run_sweep(self, now=None):
+        """
+        Expire active listings that ingestion hasn't seen within the expiry window
+        
+        Listings are expired in batches with one update_many per collection:
+        the listings themselves, their history, and their matches (new and
+        viewed matches become expired, and no match is followed up on). The
+        dashboard counters of users with expired matches are rebuilt.
+        Stale listings are found via the (status, last_seen_at) index, so the
+        cost is proportional to the number of stale listings.
+        
+        Args:
+            now: Time the expiry window is measured back from
+        
+        Returns:
+            dict: Counts of expired listings and matches
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - self.expiry_window
+        
+        result = {
+            "expired_listings": 0,
+            "expired_matches": 0
+        }
+        
+        # Listings stored before last_seen_at was tracked count as seen when last updated
+        db.listings.update_many(
+            {"status": "active", "last_seen_at": None},
+            [{"$set": {"last_seen_at": {"$ifNull": ["$last_updated", "$date_found"]}}}]
+        )
+        
+        while True:
+            stale = list(db.listings.find(
+                {"status": "active", "last_seen_at": {"$lt": cutoff}},
+                {"price": 1}
+            ).limit(self.batch_size))
+            
+            if not stale:
+                break
+            
+            stale_ids = [listing["_id"] for listing in stale]
+            db.listings.update_many(
+                {"_id": {"$in": stale_ids}, "status": "active", "last_seen_at": {"$lt": cutoff}},
+                {"$set": {"status": "expired", "last_updated": now}}
+            )
+            
+            # Leave out listings that ingestion saw again in the meantime
+            expired = list(db.listings.find(
+                {"_id": {"$in": stale_ids}, "status": "expired", "last_updated": now},
+                {"price": 1}
+            ))
+            listing_ids = [listing["_id"] for listing in expired]
+            result["expired_listings"] += len(listing_ids)
+            
+            ListingHistory.record_many(
+                [(listing["_id"], listing.get("price"), "expired") for listing in expired],
+                now
+            )
+            
+            expiring_matches = {"listing_id": {"$in": listing_ids}, "status": {"$in": list(EXPIRING_MATCH_STATUSES)}}
+            user_ids = db.matches.distinct("user_id", expiring_matches)
+            matches = db.matches.update_many(expiring_matches, {"$set": {"status": "expired", "last_updated": now}})
+            result["expired_matches"] += matches.modified_count
+            UserStats.rebuild(user_ids)
+            
+            db.matches.update_many(
+                {"listing_id": {"$in": listing_ids}, "next_follow_up_at": {"$exists": True}},
+                {"$unset": {"next_follow_up_at": ""}}
+            )
+            
+            if len(stale) < self.batch_size:
+                break
+        
+        logging.info(f"Listing expiry sweep completed: {result['expired_listings']} listings and {result['expired_matches']} matches expired")
+        return result
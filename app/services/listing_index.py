@@ -0,0 +1,313 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app import db
+from app.config import LISTING_INDEX_REFRESH_SECONDS
+from app.utils.geo import EARTH_RADIUS_KM, coordinates, haversine_km
+
+# Column dtypes and the fill value for empty rows/missing values
+COLUMNS = {
+    "price": (np.float64, np.nan),
+    "bedrooms": (np.float32, np.nan),
+    "bathrooms": (np.float32, np.nan),
+    "property_type": (np.int16, -1),
+    "latitude": (np.float64, np.nan),
+    "longitude": (np.float64, np.nan),
+    "date_found": ("datetime64[s]", np.datetime64("NaT")),
+    "active": (np.bool_, False)
+}
+
+# Listing fields read to build the index
+INDEX_FIELDS = ("price", "bedrooms", "bathrooms", "property_type", "location", "date_found", "status")
+
+# Sort keys accepted by search (prefix with "-" for descending)
+SORT_KEYS = ("price", "bedrooms", "bathrooms", "date_found", "distance")
+
+# Refreshes re-read this far behind the last one, so listing updates that
+# commit out of order (or from app servers with slightly skewed clocks) aren't missed
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+class ListingIndex:
+    """
+    In-memory columnar snapshot of active listings for search
+    
+    Each searchable field is a NumPy array with one row per listing, so
+    filters and sorts are vectorized masks over the arrays rather than
+    database queries. start() loads the snapshot on a background thread when
+    a worker starts, and keeps refreshing it incrementally from listings
+    whose last_updated moved since the previous refresh (ingestion and
+    expiry bump it on every real change), so searches never wait on MongoDB.
+    Rows of listings that stop being active are cleared and reclaimed by
+    compacting.
+    """
+    
+    def __init__(self, refresh_seconds=LISTING_INDEX_REFRESH_SECONDS, capacity=1024):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._columns = _allocate(capacity)
+        self._ids = np.empty(capacity, dtype=object)
+        self._rows = {}  # listing _id -> row
+        self._size = 0  # rows in use, including cleared ones
+        self._property_types = {}  # property type -> code
+        self._watermark = None
+        self._refreshed_at = None
+        self._loaded = threading.Event()
+        self._thread = None
+    
+    def __len__(self):
+        return len(self._rows)
+    
+    def refresh(self, force=False):
+        """
+        Load the snapshot, or apply listing changes since the last refresh
+        
+        Args:
+            force: Refresh even if the last refresh is recent
+        """
+        with self._lock:
+            if not force and self._refreshed_at and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return
+            
+            started = datetime.utcnow()
+            if self._watermark is None:
+                query = {"status": "active"}
+            else:
+                query = {"last_updated": {"$gte": self._watermark - REFRESH_OVERLAP}}
+            
+            documents = list(db.listings.find(query, {field: 1 for field in INDEX_FIELDS}))
+            self._apply(documents)
+            
+            if self._watermark is None:
+                logging.info(f"Loaded {len(self._rows)} active listings into the listing index")
+            
+            self._watermark = started
+            self._refreshed_at = time.monotonic()
+            self._loaded.set()
+    
+    def start(self):
+        """Load the snapshot and keep it refreshed on a background thread (once per process)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._keep_fresh, name="listing-index", daemon=True)
+                self._thread.start()
+    
+    def wait_loaded(self, timeout=None):
+        """
+        Wait for the first load to finish
+        
+        Returns:
+            bool: False if it didn't finish within timeout
+        """
+        return self._loaded.wait(timeout)
+    
+    def upsert(self, documents):
+        """Add or update listings (documents with at least INDEX_FIELDS and _id)"""
+        with self._lock:
+            self._apply(documents)
+    
+    def search(self, min_price=None, max_price=None, min_bedrooms=None, min_bathrooms=None,
+               property_types=None, near=None, radius_km=None, sort="-date_found", limit=20, skip=0):
+        """
+        Filter and sort active listings
+        
+        Args:
+            min_price, max_price: Price range
+            min_bedrooms, min_bathrooms: Minimum bedrooms/bathrooms
+            property_types: Property types to include
+            near: (latitude, longitude) to measure distance from
+            radius_km: Maximum distance from `near`
+            sort: One of SORT_KEYS, prefixed with "-" for descending
+            limit, skip: Page of results to return
+        
+        Returns:
+            tuple: (list of (listing_id, distance_km) pairs, total matching count)
+        """
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"Invalid sort: {sort}")
+        if (sort_key == "distance" or radius_km is not None) and near is None:
+            raise ValueError("Distance sorting and radius filtering need a location")
+        
+        with self._lock:
+            columns = {name: column[:self._size] for name, column in self._columns.items()}
+            mask = columns["active"].copy()
+            
+            # Comparisons with NaN are False, so listings missing a filtered value drop out
+            if min_price is not None:
+                mask &= columns["price"] >= min_price
+            if max_price is not None:
+                mask &= columns["price"] <= max_price
+            if min_bedrooms is not None:
+                mask &= columns["bedrooms"] >= min_bedrooms
+            if min_bathrooms is not None:
+                mask &= columns["bathrooms"] >= min_bathrooms
+            if property_types:
+                codes = [self._property_types[name] for name in property_types if name in self._property_types]
+                mask &= np.isin(columns["property_type"], codes)
+            
+            if near is not None and radius_km is not None:
+                # Cheap bounding-box prefilter so distances are only computed for nearby rows
+                latitude_delta = np.degrees(radius_km / EARTH_RADIUS_KM)
+                longitude_delta = latitude_delta / max(np.cos(np.radians(near[0])), 1e-6)
+                mask &= np.abs(columns["latitude"] - near[0]) <= latitude_delta
+                mask &= np.abs(columns["longitude"] - near[1]) <= longitude_delta
+            
+            rows = np.flatnonzero(mask)
+            
+            distance = None
+            if near is not None:
+                distance = haversine_km(near[0], near[1], columns["latitude"][rows], columns["longitude"][rows])
+                if radius_km is not None:
+                    within = distance <= radius_km
+                    rows, distance = rows[within], distance[within]
+            
+            total = len(rows)
+            
+            if sort_key == "distance":
+                keys = distance.copy()
+            elif sort_key == "date_found":
+                keys = columns["date_found"][rows].astype(np.int64).astype(np.float64)
+                keys[np.isnat(columns["date_found"][rows])] = np.nan
+            else:
+                keys = columns[sort_key][rows].astype(np.float64)
+            
+            # Missing values sort last either way
+            if descending:
+                keys = -keys
+            
+            # Only order the rows up to the requested page
+            end = min(skip + limit, total)
+            if end <= 0:
+                order = np.empty(0, dtype=np.intp)
+            elif end < total:
+                order = np.argpartition(keys, end - 1)[:end]
+                order = order[np.argsort(keys[order], kind="stable")]
+            else:
+                order = np.argsort(keys, kind="stable")
+            
+            page = order[skip:end]
+            return [
+                (self._ids[rows[position]], float(distance[position]) if distance is not None else None)
+                for position in page
+            ], total
+    
+    def median_prices_by_bedrooms(self):
+        """
+        Get the median price of active listings for each bedroom count
+        
+        Returns:
+            dict: Bedroom count -> median price
+        """
+        with self._lock:
+            active = self._columns["active"][:self._size]
+            bedrooms = self._columns["bedrooms"][:self._size][active]
+            price = self._columns["price"][:self._size][active]
+        
+        known = ~np.isnan(bedrooms) & ~np.isnan(price)
+        bedrooms, price = bedrooms[known], price[known]
+        return {
+            float(count): float(np.median(price[bedrooms == count]))
+            for count in np.unique(bedrooms)
+        }
+    
+    def _apply(self, documents):
+        """Write listing documents into their rows, dropping inactive listings"""
+        active = []
+        for document in documents:
+            if document.get("status") == "active":
+                active.append(document)
+            else:
+                row = self._rows.pop(document["_id"], None)
+                if row is not None:
+                    self._clear(row)
+        
+        if active:
+            rows = np.array([self._row_for(document["_id"]) for document in active], dtype=np.intp)
+            self._write(rows, active)
+        
+        self._compact_if_sparse()
+    
+    def _row_for(self, listing_id):
+        """Get a listing's row, appending a new one if it isn't indexed yet"""
+        row = self._rows.get(listing_id)
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[listing_id] = row
+            self._ids[row] = listing_id
+        return row
+    
+    def _write(self, rows, documents):
+        """Write one column at a time for a batch of rows"""
+        for field in ("price", "bedrooms", "bathrooms", "date_found"):
+            dtype = COLUMNS[field][0]
+            self._columns[field][rows] = np.array([document.get(field) for document in documents], dtype=dtype)
+        
+        points = [coordinates(document.get("location")) for document in documents]
+        self._columns["latitude"][rows] = np.array([latitude for latitude, _ in points], dtype=np.float64)
+        self._columns["longitude"][rows] = np.array([longitude for _, longitude in points], dtype=np.float64)
+        
+        self._columns["property_type"][rows] = [
+            self._property_code(document.get("property_type")) for document in documents
+        ]
+        self._columns["active"][rows] = True
+    
+    def _property_code(self, property_type):
+        if property_type is None:
+            return -1
+        if property_type not in self._property_types:
+            self._property_types[property_type] = len(self._property_types)
+        return self._property_types[property_type]
+    
+    def _clear(self, row):
+        self._ids[row] = None
+        for name, (dtype, fill) in COLUMNS.items():
+            self._columns[name][row] = fill
+    
+    def _grow(self):
+        """Double the capacity of every column"""
+        capacity = len(self._ids) * 2
+        columns = _allocate(capacity)
+        for name, column in self._columns.items():
+            columns[name][:self._size] = column[:self._size]
+        ids = np.empty(capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        
+        self._columns = columns
+        self._ids = ids
+    
+    def _compact_if_sparse(self):
+        """Reclaim cleared rows once they make up more than half the index"""
+        if self._size - len(self._rows) <= self._size // 2:
+            return
+        
+        keep = np.flatnonzero(self._columns["active"][:self._size])
+        for name, (dtype, fill) in COLUMNS.items():
+            column = self._columns[name]
+            column[:len(keep)] = column[keep]
+            column[len(keep):self._size] = fill
+        self._ids[:len(keep)] = self._ids[keep]
+        self._ids[len(keep):self._size] = None
+        
+        self._size = len(keep)
+        self._rows = {self._ids[row]: row for row in range(self._size)}
+    
+    def _keep_fresh(self):
+        while True:
+            try:
+                self.refresh(force=True)
+            except Exception as e:
+                logging.error(f"Error refreshing the listing index: {str(e)}")
+            time.sleep(self.refresh_seconds)
+
+
+def _allocate(capacity):
+    return {
+        name: np.full(capacity, fill, dtype=dtype)
+        for name, (dtype, fill) in COLUMNS.items()
+    }
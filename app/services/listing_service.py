@@ -2,9 +2,28 @@ import logging
 from datetime import datetime
 from app.api.rentcast import RentCastClient
 from app.models.listing import Listing
+from app.models.listing_raw import ListingRaw
+from app.models.listing_history import ListingHistory
+from app.models.user_stats import UserStats
 from app import db
+from app.utils.pagination import keyset_filter
+from app.utils.caching import version_tag
+from app.utils.geo import KM_PER_MILE, bounding_circle, point, preference_area
+from app.utils.address import blocking_key, normalize_address, same_address
 from bson.objectid import ObjectId
 
+# Fields the match feed can be sorted by (descending)
+MATCH_SORT_FIELDS = ("date_matched", "score")
+
+# Match fields a page of the match feed is versioned by (see get_matches_version)
+MATCH_VERSION_PROJECTION = {"status": 1, "score": 1, "date_matched": 1, "last_updated": 1, "listing_id": 1}
+
+# Listing fields read when re-ingesting a listing
+EXISTING_LISTING_PROJECTION = {"fingerprint": 1, "raw_id": 1, "price": 1, "status": 1}
+
+# Most listings in one address block to compare when looking for duplicates
+MAX_BLOCK_CANDIDATES = 50
+
 class ListingService:
     """Service for fetching and managing rental listings"""
     
@@ -17,8 +36,15 @@ class ListingService:
         """
         params = {}
         
-        # Map location preferences
-        if user_preferences.get('location'):
+        # Map location preferences, searching the circle around the
+        # preferred area if there is one (RentCast radius is in miles)
+        area = preference_area(user_preferences)
+        if area:
+            latitude, longitude, radius_km = bounding_circle(area)
+            params['latitude'] = latitude
+            params['longitude'] = longitude
+            params['radius'] = round(radius_km / KM_PER_MILE, 2)
+        elif user_preferences.get('location'):
             params['location'] = user_preferences['location']
         
         # Map price range
@@ -47,14 +73,21 @@ class ListingService:
         
         return params
     
-    def fetch_listings_for_user(self, user):
+    def fetch_listings_for_user(self, user, progress=None):
         """
         Fetch listings for a specific user based on their preferences
         
+        Args:
+            user: User object
+            progress: Optional callback, called with phase="fetching",
+                "processing" or "matching" as each starts and with counts
+                (pages_fetched, listings_total, listings_processed, new_matches)
+        
         Returns:
             dict: Result with counts and any errors
         """
         logging.info(f"Fetching listings for user {user._id}")
+        progress = progress or _ignore_progress
         
         result = {
             "new_listings": 0,
@@ -69,9 +102,15 @@ class ListingService:
             return result
         
         # Convert user preferences to API parameters
-        params = self.map_user_preferences_to_api_params(user.rental_preferences)
+        try:
+            params = self.map_user_preferences_to_api_params(user.rental_preferences)
+        except ValueError as e:
+            logging.warning(f"User {user._id} has invalid rental preferences: {str(e)}")
+            result["errors"].append(str(e))
+            return result
         
         # Fetch listings from RentCast API
+        progress(phase="fetching")
         api_response = self.rentcast_client.search_rental_listings(params)
         
         if not api_response or not api_response.get('data'):
@@ -80,85 +119,221 @@ class ListingService:
             result["errors"].append(error_msg)
             return result
         
+        progress(phase="processing", pages_fetched=1, listings_total=len(api_response['data']))
+        
         # Process each listing
-        new_matches_count = 0
-        for listing_data in api_response.get('data', []):
+        new_listing_ids = []
+        seen_listing_ids = []
+        for processed, listing_data in enumerate(api_response.get('data', []), start=1):
             # Check if listing already exists in our database
-            existing_listing = db.listings.find_one({
-                "external_id": listing_data.get('id')
-            })
+            existing_listing = self._find_existing_listing(listing_data)
             
             if existing_listing:
                 # Listing already exists, update it if needed
                 self._update_existing_listing(existing_listing, listing_data)
+                seen_listing_ids.append(existing_listing["_id"])
             else:
-                # Create new listing and match
+                # Create new listing
                 new_listing_id = self._create_new_listing(listing_data)
                 if new_listing_id:
-                    # Create match between user and listing
-                    self._create_match(user._id, new_listing_id)
-                    new_matches_count += 1
+                    new_listing_ids.append(new_listing_id)
+            
+            progress(listings_processed=processed)
+        
+        # Record that the listings are still on the market, in one write
+        # (unchanged listings are otherwise not written at all)
+        if seen_listing_ids:
+            db.listings.update_many(
+                {"_id": {"$in": seen_listing_ids}},
+                {"$set": {"last_seen_at": datetime.utcnow()}}
+            )
+        
+        # Only match listings inside the user's area (the API searched the
+        # circle around it), using the 2dsphere index on location
+        area = preference_area(user.rental_preferences)
+        if area and new_listing_ids:
+            new_listing_ids = [
+                listing["_id"]
+                for listing in db.listings.find(
+                    {"_id": {"$in": new_listing_ids}, "location": {"$geoWithin": area}},
+                    {"_id": 1}
+                )
+            ]
+        
+        # Create matches between user and listings
+        progress(phase="matching")
+        new_matches_count = 0
+        for new_listing_id in new_listing_ids:
+            if self._create_match(user._id, new_listing_id):
+                new_matches_count += 1
+                progress(new_matches=new_matches_count)
         
         result["new_listings"] = new_matches_count
         logging.info(f"Found {new_matches_count} new matches for user {user._id}")
         
         return result
     
-    def _update_existing_listing(self, existing_listing, new_data):
-        """Update an existing listing with new data"""
-        # Check if any important fields have changed
-        update_needed = False
-        fields_to_check = ['price', 'status', 'description']
-        
-        for field in fields_to_check:
-            if field in new_data and existing_listing.get(field) != new_data.get(field):
-                update_needed = True
-                break
-        
-        if update_needed:
-            db.listings.update_one(
-                {"_id": existing_listing["_id"]},
-                {"$set": {
-                    "price": new_data.get('price'),
-                    "status": new_data.get('status'),
-                    "description": new_data.get('description'),
-                    "last_updated": datetime.utcnow(),
-                    "metadata": new_data
-                }}
+    def _find_existing_listing(self, listing_data):
+        """
+        Find the stored listing for an API listing
+        
+        Listings are found by external ID, or failing that by address, so a
+        unit re-listed under a new ID (or from another source) is merged into
+        the listing users were already matched with. Addresses are compared
+        by canonical key, then fuzzily within their block (house number and
+        ZIP) to catch near-miss spellings. Each step is one indexed lookup.
+        
+        Returns:
+            dict: The listing (EXISTING_LISTING_PROJECTION fields), or None
+        """
+        external_id = listing_data.get('id')
+        listing = db.listings.find_one(
+            {"$or": [{"external_id": external_id}, {"alias_ids": external_id}]},
+            EXISTING_LISTING_PROJECTION
+        )
+        if listing:
+            return listing
+        
+        address_key = normalize_address(self._listing_address(listing_data))
+        if not address_key:
+            return None
+        
+        listing = db.listings.find_one({"address_key": address_key}, EXISTING_LISTING_PROJECTION)
+        
+        block = blocking_key(address_key)
+        if not listing and block:
+            candidates = db.listings.find(
+                {"address_block": block},
+                {**EXISTING_LISTING_PROJECTION, "address_key": 1}
+            ).limit(MAX_BLOCK_CANDIDATES)
+            listing = next(
+                (candidate for candidate in candidates if same_address(address_key, candidate["address_key"])),
+                None
             )
-            logging.info(f"Updated listing {existing_listing['_id']}")
+        
+        if listing:
+            # Later ingests of this ID find the listing directly
+            db.listings.update_one({"_id": listing["_id"]}, {"$addToSet": {"alias_ids": external_id}})
+            logging.info(f"Merged duplicate listing {external_id} into {listing['_id']}")
+        
+        return listing
+    
+    def _listing_address(self, listing_data):
+        return listing_data.get('formattedAddress') or listing_data.get('address', {}).get('full')
+    
+    def _normalize_listing(self, listing_data):
+        """Map a RentCast listing to the fields stored on our listings"""
+        address_key = normalize_address(self._listing_address(listing_data))
+        return {
+            "title": f"{listing_data.get('bedrooms', 'Studio')} {listing_data.get('propertyType', 'Property')} for Rent",
+            "description": listing_data.get('description'),
+            "price": listing_data.get('price'),
+            "bedrooms": listing_data.get('bedrooms'),
+            "bathrooms": listing_data.get('bathrooms'),
+            "address": self._listing_address(listing_data),
+            "address_key": address_key,
+            "address_block": blocking_key(address_key),
+            "url": listing_data.get('listingUrl'),
+            "image_url": listing_data.get('photos', [{}])[0].get('url') if listing_data.get('photos') else None,
+            "property_type": listing_data.get('propertyType'),
+            "available_from": listing_data.get('availableDate'),
+            "location": point(listing_data.get('latitude'), listing_data.get('longitude')),
+            "contact_info": {
+                "email": listing_data.get('contactEmail'),
+                "phone": listing_data.get('contactPhone'),
+                "name": listing_data.get('contactName')
+            },
+            # RentCast reports "Active"/"Inactive"
+            "status": (listing_data.get('status') or 'active').lower()
+        }
+    
+    def _update_existing_listing(self, existing_listing, new_data):
+        """
+        Update an existing listing with new data
+        
+        Re-ingests of an unchanged listing are skipped by comparing the
+        fingerprint of its normalized fields (an expired listing that shows
+        up again is always updated, reactivating it and its matches). Price
+        and status changes are appended to the listing history, and price
+        drops are flagged on the listing's matches.
+        """
+        fields = self._normalize_listing(new_data)
+        fingerprint = ListingRaw.content_hash(fields)
+        
+        if existing_listing.get("fingerprint") == fingerprint and existing_listing.get("status") == fields["status"]:
+            return
+        
+        now = datetime.utcnow()
+        # The listing already holds a reference to an unchanged payload
+        raw_id = ListingRaw.content_hash(new_data)
+        if existing_listing.get("raw_id") != raw_id:
+            raw_id = ListingRaw.store(new_data)
+        db.listings.update_one(
+            {"_id": existing_listing["_id"]},
+            {
+                "$set": {
+                    **fields,
+                    "fingerprint": fingerprint,
+                    "last_updated": now,
+                    "raw_id": raw_id
+                },
+                "$unset": {"metadata": "", "latitude": "", "longitude": ""}
+            }
+        )
+        if existing_listing.get("raw_id") != raw_id:
+            ListingRaw.release(existing_listing.get("raw_id"))
+        
+        old_price = existing_listing.get("price")
+        old_status = (existing_listing.get("status") or "").lower()
+        if fields["price"] != old_price or fields["status"] != old_status:
+            ListingHistory.record(existing_listing["_id"], fields["price"], fields["status"], now)
+        
+        # A listing back on the market after expiring puts its expired matches back in the feed
+        if old_status == "expired" and fields["status"] == "active":
+            expired_matches = {"listing_id": existing_listing["_id"], "status": "expired"}
+            user_ids = db.matches.distinct("user_id", expired_matches)
+            db.matches.update_many(expired_matches, {"$set": {"status": "new", "last_updated": now}})
+            UserStats.rebuild(user_ids)
+        
+        if old_price is not None and fields["price"] is not None and fields["price"] < old_price:
+            self._flag_price_drop(existing_listing["_id"], old_price, fields["price"], now)
+        
+        logging.info(f"Updated listing {existing_listing['_id']}")
+    
+    def _flag_price_drop(self, listing_id, old_price, new_price, dropped_at):
+        """Record a price drop on the open matches for a listing"""
+        db.matches.update_many(
+            {"listing_id": listing_id, "status": {"$ne": "rejected"}},
+            {"$set": {
+                "price_drop": {"from": old_price, "to": new_price, "at": dropped_at},
+                "last_updated": dropped_at
+            }}
+        )
     
     def _create_new_listing(self, listing_data):
         """Create a new listing from API data"""
+        raw_id = None
         try:
+            raw_id = ListingRaw.store(listing_data)
+            fields = self._normalize_listing(listing_data)
+            now = datetime.utcnow()
             listing_doc = {
                 "external_id": listing_data.get('id'),
                 "source": "rentcast",
-                "title": f"{listing_data.get('bedrooms', 'Studio')} {listing_data.get('propertyType', 'Property')} for Rent",
-                "description": listing_data.get('description'),
-                "price": listing_data.get('price'),
-                "bedrooms": listing_data.get('bedrooms'),
-                "bathrooms": listing_data.get('bathrooms'),
-                "address": listing_data.get('address', {}).get('full'),
-                "url": listing_data.get('listingUrl'),
-                "image_url": listing_data.get('photos', [{}])[0].get('url') if listing_data.get('photos') else None,
-                "property_type": listing_data.get('propertyType'),
-                "available_from": listing_data.get('availableDate'),
-                "contact_info": {
-                    "email": listing_data.get('contactEmail'),
-                    "phone": listing_data.get('contactPhone'),
-                    "name": listing_data.get('contactName')
-                },
-                "date_found": datetime.utcnow(),
-                "last_updated": datetime.utcnow(),
-                "status": "active",
-                "metadata": listing_data
+                **fields,
+                "fingerprint": ListingRaw.content_hash(fields),
+                "date_found": now,
+                "last_updated": now,
+                "last_seen_at": now,
+                "raw_id": raw_id
             }
             
             result = db.listings.insert_one(listing_doc)
+            ListingHistory.record(result.inserted_id, fields["price"], fields["status"], now)
             return result.inserted_id
         except Exception as e:
             logging.error(f"Error creating new listing: {str(e)}")
+            ListingRaw.release(raw_id)
             return None
     
     def _create_match(self, user_id, listing_id):
@@ -174,31 +349,99 @@ class ListingService:
             }
             
             db.matches.insert_one(match)
+            UserStats.match_status_changed(user_id, None, "new")
             return True
         except Exception as e:
             logging.error(f"Error creating match: {str(e)}")
             return False
     
-    def get_matches_for_user(self, user_id, status=None, limit=20, skip=0):
-        """Get matches for a specific user"""
+    def _matches_query(self, user_id, status, cursor, sort):
+        """Build the query for a page of a user's match feed"""
+        if sort not in MATCH_SORT_FIELDS:
+            raise ValueError(f"Invalid sort: {sort}")
+        
         query = {"user_id": ObjectId(user_id)}
         
         if status:
             query["status"] = status
         
-        matches = list(db.matches.find(query).sort("date_matched", -1).skip(skip).limit(limit))
+        # Seek past the previous page using the (sort field, _id) index
+        if cursor:
+            query.update(keyset_filter(sort, cursor))
+        
+        return query
+    
+    def get_matches_version(self, user_id, status=None, limit=20, skip=0, cursor=None, sort="date_matched"):
+        """
+        Get a version tag for a page of a user's match feed, without joining
+        the listings or building the page
+        
+        The tag covers the page's matches (IDs, status, score, last change)
+        and the latest last_updated of their listings, so it changes whenever
+        the page would.
+        """
+        query = self._matches_query(user_id, status, cursor, sort)
+        matches = list(db.matches.find(query, MATCH_VERSION_PROJECTION)
+                       .sort([(sort, -1), ("_id", -1)])
+                       .skip(skip)
+                       .limit(limit))
+        
+        listing_ids = [match["listing_id"] for match in matches]
+        latest_listing = None
+        if listing_ids:
+            latest_listing = db.listings.find_one(
+                {"_id": {"$in": listing_ids}},
+                {"last_updated": 1},
+                sort=[("last_updated", -1)]
+            )
+        
+        return version_tag(matches, latest_listing)
+    
+    def get_matches_for_user(self, user_id, status=None, limit=20, skip=0, cursor=None, sort="date_matched"):
+        """Get matches for a specific user (newest or best fit first)"""
+        query = self._matches_query(user_id, status, cursor, sort)
+        
+        # Join each match to its listing server-side in a single round trip,
+        # fetching only the listing fields that Listing.to_dict returns
+        pipeline = [
+            {"$match": query},
+            {"$sort": {sort: -1, "_id": -1}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "listings",
+                "let": {"listing_id": "$listing_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$listing_id"]}}},
+                    {"$project": {field: 1 for field in Listing.DICT_FIELDS}}
+                ],
+                "as": "listing"
+            }},
+            {"$unwind": "$listing"},
+            {"$project": {
+                "status": 1,
+                "contacted": 1,
+                "date_matched": 1,
+                "score": 1,
+                "price_drop": 1,
+                "listing": 1
+            }}
+        ]
         
-        # Load associated listings
         result = []
-        for match in matches:
-            listing = db.listings.find_one({"_id": match["listing_id"]})
-            if listing:
-                result.append({
-                    "match_id": str(match["_id"]),
-                    "match_status": match["status"],
-                    "contacted": match["contacted"],
-                    "date_matched": match["date_matched"],
-                    "listing": Listing(**listing).to_dict()
-                })
-        
-        return result
\ No newline at end of file
+        for match in db.matches.aggregate(pipeline):
+            result.append({
+                "match_id": match["_id"],
+                "match_status": match["status"],
+                "contacted": match["contacted"],
+                "date_matched": match["date_matched"],
+                "score": match.get("score"),
+                "price_drop": match.get("price_drop"),
+                "listing": Listing(**match["listing"]).to_dict()
+            })
+        
+        return result
+
+def _ignore_progress(phase=None, **counts):
+    """Progress callback used when the caller doesn't track progress"""
+    pass
@@ -0,0 +1,105 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from pymongo import UpdateOne
+from app import db
+from app.models.user_stats import UserStats
+from app.config import MATCH_STATUS_FLUSH_MS, MATCH_STATUS_FLUSH_ITEMS
+
+class MatchStatusBuffer:
+    """
+    Write-behind buffer for new -> viewed match transitions
+    
+    Detail views only record the match in memory; a background thread
+    writes the buffered transitions with one bulk_write every
+    MATCH_STATUS_FLUSH_MS, or as soon as MATCH_STATUS_FLUSH_ITEMS are
+    pending, and whatever is left is flushed when the process exits.
+    Repeat views of a match before a flush coalesce into one update, and
+    updates only apply to matches that are still new, so a buffered view
+    never overwrites a status the user set in the meantime.
+    """
+    
+    def __init__(self, flush_ms=MATCH_STATUS_FLUSH_MS, max_items=MATCH_STATUS_FLUSH_ITEMS):
+        self.flush_interval = flush_ms / 1000
+        self.max_items = max_items
+        self._pending = {}  # match ID -> time first viewed
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+    
+    def mark_viewed(self, match_id, viewed_at=None):
+        """Buffer a new -> viewed transition for a match"""
+        with self._lock:
+            self._pending.setdefault(match_id, viewed_at or datetime.utcnow())
+            full = len(self._pending) >= self.max_items
+            
+            # The flusher starts on first use, so it's never inherited across a fork
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        
+        if full:
+            self._wake.set()
+    
+    def flush(self):
+        """
+        Write the buffered transitions with one bulk_write
+        
+        Returns:
+            int: Number of matches moved from new to viewed
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            
+            if not pending:
+                return 0
+            
+            try:
+                still_new = list(db.matches.find(
+                    {"_id": {"$in": list(pending)}, "status": "new"},
+                    {"user_id": 1}
+                ))
+                if not still_new:
+                    return 0
+                
+                result = db.matches.bulk_write([
+                    UpdateOne(
+                        {"_id": match["_id"], "status": "new"},
+                        {"$set": {"status": "viewed", "last_updated": pending[match["_id"]]}}
+                    )
+                    for match in still_new
+                ], ordered=False)
+                
+                for user_id, viewed in Counter(match["user_id"] for match in still_new).items():
+                    UserStats.increment(user_id, {"matches.new": -viewed, "matches.viewed": viewed})
+                
+                return result.modified_count
+            except Exception as e:
+                logging.error(f"Error flushing match status updates: {str(e)}")
+                
+                # Keep the transitions for the next flush
+                with self._lock:
+                    for match_id, viewed_at in pending.items():
+                        self._pending.setdefault(match_id, viewed_at)
+                return 0
+    
+    def close(self):
+        """Stop the flusher and write any remaining transitions"""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+    
+    def _flush_loop(self):
+        """Flush every flush_interval, or sooner when the buffer fills up"""
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
@@ -1,15 +1,19 @@
 import logging
 from datetime import datetime
+from pymongo import ReturnDocument
 from app.services.listing_service import ListingService
+from app.services.scoring_service import ScoringService
 from app.models.user import User
+from app.models.user_stats import UserStats
 from app import db
 from bson.objectid import ObjectId
 
 class MatchingService:
     """Service for matching users with rental listings"""
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, listing_index=None):
         self.listing_service = ListingService(api_key)
+        self.scoring_service = ScoringService(listing_index)
     
     def find_matches_for_all_users(self):
         """
@@ -45,19 +49,31 @@ class MatchingService:
         logging.info(f"Batch matching completed. Found {result['total_new_matches']} new matches for {result['total_users']} users")
         return result
     
-    def find_matches_for_user(self, user):
+    def find_matches_for_user(self, user, progress=None):
         """
-        Find new rental listings for a specific user
+        Find new rental listings for a specific user and re-score their matches
         
         Args:
             user: User object
+            progress: Optional progress callback (see ListingService.fetch_listings_for_user),
+                also called with phase="scoring"
             
         Returns:
             dict: Result with counts and any errors
         """
-        return self.listing_service.fetch_listings_for_user(user)
+        result = self.listing_service.fetch_listings_for_user(user, progress)
+        
+        try:
+            if progress:
+                progress(phase="scoring")
+            self.scoring_service.score_user_matches(user)
+        except Exception as e:
+            logging.error(f"Error scoring matches for user {user._id}: {str(e)}")
+            result.setdefault("errors", []).append(str(e))
+        
+        return result
     
-    def get_user_matches(self, user_id, status=None, limit=20, skip=0):
+    def get_user_matches(self, user_id, status=None, limit=20, skip=0, cursor=None, sort="date_matched"):
         """
         Get matches for a specific user
         
@@ -66,11 +82,26 @@ class MatchingService:
             status: Optional filter by match status
             limit: Max number of results to return
             skip: Number of results to skip (for pagination)
+            cursor: Optional cursor token from the previous page
+            sort: "date_matched" (newest first) or "score" (best fit first)
             
         Returns:
             list: Match results with listing data
         """
-        return self.listing_service.get_matches_for_user(user_id, status, limit, skip)
+        return self.listing_service.get_matches_for_user(user_id, status, limit, skip, cursor, sort)
+    
+    def get_user_matches_version(self, user_id, status=None, limit=20, skip=0, cursor=None, sort="date_matched"):
+        """
+        Get a version tag for a page of matches (for conditional requests)
+        
+        Args:
+            user_id: User ID
+            status, limit, skip, cursor, sort: The page, as for get_user_matches
+            
+        Returns:
+            str: Tag that changes whenever the page's content would
+        """
+        return self.listing_service.get_matches_version(user_id, status, limit, skip, cursor, sort)
     
     def update_match_status(self, match_id, new_status):
         """
@@ -78,19 +109,29 @@ class MatchingService:
         
         Args:
             match_id: Match ID
-            new_status: New status (new, viewed, contacted, viewing_scheduled, rejected)
+            new_status: New status (new, viewed, contacted, viewing_scheduled, rejected, expired)
             
         Returns:
             bool: Success or failure
         """
         try:
-            db.matches.update_one(
+            update = {"$set": {
+                "status": new_status,
+                "last_updated": datetime.utcnow()
+            }}
+            
+            # No point following up on listings the user is done with
+            if new_status in ('viewing_scheduled', 'rejected'):
+                update["$unset"] = {"next_follow_up_at": ""}
+            
+            previous = db.matches.find_one_and_update(
                 {"_id": ObjectId(match_id)},
-                {"$set": {
-                    "status": new_status,
-                    "last_updated": datetime.utcnow()
-                }}
+                update,
+                projection={"user_id": 1, "status": 1},
+                return_document=ReturnDocument.BEFORE
             )
+            if previous:
+                UserStats.match_status_changed(previous["user_id"], previous.get("status"), new_status)
             return True
         except Exception as e:
             logging.error(f"Error updating match status: {str(e)}")
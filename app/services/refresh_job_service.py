@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+from app import db
+from app.models.user import User
+from app.utils.admission import provider_gate
+from app.config import REFRESH_JOB_WORKERS, REFRESH_JOB_STALE_SECONDS
+
+# Job statuses after which nothing changes
+FINISHED_STATUSES = ("completed", "failed")
+
+# Seconds between progress writes while a job runs (finishing always writes)
+PROGRESS_WRITE_INTERVAL = 1.0
+
+# Heartbeats a running job writes per REFRESH_JOB_STALE_SECONDS, whether or not
+# it reports progress (a slow provider call mustn't make it look dead)
+HEARTBEATS_PER_STALE_PERIOD = 5
+
+class RefreshJobService:
+    """
+    Service for running manual listing refreshes in the background
+    
+    Refreshes are recorded in the refresh_jobs collection, so any worker can
+    report a job's progress, and run on a small thread pool in the worker
+    that queued them. A user has at most one active job (a unique partial
+    index on active jobs); asking again returns the job already running.
+    Running jobs write a heartbeat with their progress, and a job whose
+    heartbeat stops for REFRESH_JOB_STALE_SECONDS (its worker died) is failed
+    and replaced on the next request. Each job holds a RentCast slot of the
+    provider gate from being queued until it finishes, renewing the slot's
+    lease with every heartbeat.
+    """
+    
+    def __init__(self, matching_service, max_workers=REFRESH_JOB_WORKERS, stale_seconds=REFRESH_JOB_STALE_SECONDS):
+        self.matching_service = matching_service
+        self.stale_after = timedelta(seconds=stale_seconds)
+        self.heartbeat_interval = stale_seconds / HEARTBEATS_PER_STALE_PERIOD
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh-job")
+    
+    def enqueue(self, user_id):
+        """
+        Queue a refresh for a user, unless one is already active
+        
+        Args:
+            user_id: User ID
+        
+        Returns:
+            tuple: (job document, True if the job was queued by this call)
+        
+        Raises:
+            Overloaded: If RentCast is at its cap
+        """
+        user_id = ObjectId(user_id)
+        
+        while True:
+            now = datetime.utcnow()
+            existing = db.refresh_jobs.find_one({"user_id": user_id, "active": True})
+            
+            if existing and existing["heartbeat_at"] >= now - self.stale_after:
+                return existing, False
+            
+            if existing:
+                # The worker running it died; fail it and queue a new one
+                db.refresh_jobs.update_one(
+                    {"_id": existing["_id"], "heartbeat_at": existing["heartbeat_at"]},
+                    {
+                        "$set": {"status": "failed", "errors": ["Refresh stopped responding"], "finished_at": now},
+                        "$unset": {"active": ""}
+                    }
+                )
+            
+            lease = provider_gate.acquire("rentcast")
+            job = {
+                "user_id": user_id,
+                "active": True,
+                "status": "queued",
+                "phase": None,
+                "progress": {
+                    "pages_fetched": 0,
+                    "listings_total": 0,
+                    "listings_processed": 0,
+                    "new_matches": 0
+                },
+                "errors": [],
+                "created_at": now,
+                "heartbeat_at": now
+            }
+            
+            try:
+                db.refresh_jobs.insert_one(job)
+            except DuplicateKeyError:
+                # Another request queued one first
+                provider_gate.release(lease)
+                continue
+            
+            self._executor.submit(self._run, job["_id"], user_id, lease)
+            return job, True
+    
+    def rescore(self, user_id):
+        """Re-score a user's matches on the job pool (e.g. after their preferences change)"""
+        self._executor.submit(self._rescore, ObjectId(user_id))
+    
+    def get_job(self, job_id, user_id):
+        """
+        Get one of a user's refresh jobs
+        
+        Returns:
+            dict: Job document, or None if the user has no such job
+        """
+        try:
+            return db.refresh_jobs.find_one({"_id": ObjectId(job_id), "user_id": ObjectId(user_id)})
+        except InvalidId:
+            return None
+    
+    @staticmethod
+    def format_job(job):
+        """Format a job document for API responses"""
+        return {
+            "job_id": str(job["_id"]),
+            "status": job["status"],
+            "phase": job.get("phase"),
+            "progress": job["progress"],
+            "errors": job["errors"],
+            "created_at": job["created_at"],
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at")
+        }
+    
+    def _run(self, job_id, user_id, lease):
+        """Run a queued refresh, recording its progress on the job, then give back its RentCast slot"""
+        try:
+            self._run_job(job_id, user_id, lease)
+        finally:
+            provider_gate.release(lease)
+    
+    def _run_job(self, job_id, user_id, lease):
+        # A job that waited so long it was replaced as stale is skipped
+        started = db.refresh_jobs.update_one(
+            {"_id": job_id, "status": "queued", "active": True},
+            {"$set": {"status": "running", "started_at": datetime.utcnow(), "heartbeat_at": datetime.utcnow()}}
+        )
+        if not started.matched_count:
+            return
+        
+        progress = _JobProgress(job_id, self.heartbeat_interval, lease)
+        try:
+            user = User.find_by_id(user_id)
+            if not user:
+                raise ValueError("User not found")
+            
+            result = self.matching_service.find_matches_for_user(user, progress=progress.update)
+            status = "completed"
+            errors = result.get("errors", [])
+        except Exception as e:
+            logging.error(f"Error running refresh job {job_id}: {str(e)}")
+            status = "failed"
+            errors = [str(e)]
+        finally:
+            progress.stop()
+        
+        # A job failed as stale in the meantime keeps that outcome (its replacement is active)
+        finished = db.refresh_jobs.update_one(
+            {"_id": job_id, "status": "running"},
+            {
+                "$set": {
+                    "status": status,
+                    "phase": None,
+                    "errors": errors,
+                    "finished_at": datetime.utcnow(),
+                    "heartbeat_at": datetime.utcnow()
+                },
+                "$unset": {"active": ""}
+            }
+        )
+        if not finished.matched_count:
+            logging.warning(f"Refresh job {job_id} finished after being replaced as stale")
+    
+    def _rescore(self, user_id):
+        try:
+            # Loaded here so the scores use the preferences as saved
+            user = User.find_by_id(user_id)
+            if user:
+                self.matching_service.scoring_service.score_user_matches(user)
+        except Exception as e:
+            logging.error(f"Error re-scoring matches for user {user_id}: {str(e)}")
+
+class _JobProgress:
+    """
+    Collects a running job's progress, writing it at most every
+    PROGRESS_WRITE_INTERVAL, and writes a heartbeat (renewing the job's
+    RentCast lease) on a timer until stopped
+    """
+    
+    def __init__(self, job_id, heartbeat_interval, lease):
+        self.job_id = job_id
+        self.lease = lease
+        self.pending = {}
+        self.last_write = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._beat, args=(heartbeat_interval,), name=f"refresh-heartbeat-{job_id}", daemon=True
+        )
+        self._heartbeat.start()
+    
+    def update(self, phase=None, **counts):
+        """Record progress (phase name and/or progress counters)"""
+        # Locked so the heartbeat's flush can't swap out the dict mid-update
+        with self._lock:
+            if phase:
+                self.pending["phase"] = phase
+            for name, value in counts.items():
+                self.pending[f"progress.{name}"] = value
+            due = time.monotonic() - self.last_write >= PROGRESS_WRITE_INTERVAL
+        
+        # Phase changes are written straight away, counters are throttled
+        if phase or due:
+            self.flush()
+    
+    def flush(self):
+        """Write the progress recorded since the last write, with a heartbeat"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            self.last_write = time.monotonic()
+            db.refresh_jobs.update_one(
+                {"_id": self.job_id, "status": "running"},
+                {"$set": {**pending, "heartbeat_at": datetime.utcnow()}}
+            )
+    
+    def stop(self):
+        """Stop the heartbeat and write any progress not yet written"""
+        self._stopped.set()
+        self._heartbeat.join()
+        self.flush()
+    
+    def _beat(self, interval):
+        # Renewed before the first wait too, since the job may have been queued a while
+        while True:
+            if self.lease and not provider_gate.renew(self.lease):
+                logging.warning(f"Refresh job {self.job_id} lost its RentCast slot (lease expired)")
+                self.lease = None
+            if self._stopped.wait(interval):
+                return
+            self.flush()
@@ -4,12 +4,21 @@ import logging
 import threading
 from datetime import datetime
 from app.services.matching_service import MatchingService
+from app.services.follow_up_service import FollowUpService
+from app.services.listing_expiry_service import ListingExpiryService
+from app.services.archive_service import ArchiveService
+from app.models.user_stats import UserStats
+from app.services import get_listing_index
+from app.config import FOLLOW_UP_SWEEP_MINUTES, LISTING_EXPIRY_SWEEP_HOURS
 
 class SchedulerService:
     """Service for scheduling and running background tasks"""
     
     def __init__(self, api_key=None):
-        self.matching_service = MatchingService(api_key)
+        self.matching_service = MatchingService(api_key, listing_index=get_listing_index())
+        self.follow_up_service = FollowUpService()
+        self.listing_expiry_service = ListingExpiryService()
+        self.archive_service = ArchiveService()
         self.is_running = False
         self.scheduler_thread = None
     
@@ -22,6 +31,26 @@ class SchedulerService:
         schedule.every().day.at("16:00").do(self._run_matching_job)
         
         logging.info("Scheduled matching jobs set for 9:00 AM and 4:00 PM daily")
+        
+        # Sweep for due follow-ups throughout the day
+        schedule.every(FOLLOW_UP_SWEEP_MINUTES).minutes.do(self._run_follow_up_job)
+        
+        logging.info(f"Follow-up sweep scheduled every {FOLLOW_UP_SWEEP_MINUTES} minutes")
+        
+        # Expire listings that have dropped off the market
+        schedule.every(LISTING_EXPIRY_SWEEP_HOURS).hours.do(self._run_listing_expiry_job)
+        
+        logging.info(f"Listing expiry sweep scheduled every {LISTING_EXPIRY_SWEEP_HOURS} hours")
+        
+        # Move old records out of the hot collections overnight
+        schedule.every().day.at("03:00").do(self._run_archive_job)
+        
+        logging.info("Archive job scheduled for 3:00 AM daily")
+        
+        # Correct any drift in the incrementally maintained dashboard counters
+        schedule.every().day.at("04:00").do(self._run_user_stats_job)
+        
+        logging.info("Dashboard counter reconcile scheduled for 4:00 AM daily")
     
     def _run_matching_job(self):
         """Run the matching job and log results"""
@@ -42,6 +71,40 @@ class SchedulerService:
             logging.error(f"Error running matching job: {str(e)}")
             return None
     
+    def _run_follow_up_job(self):
+        """Run the follow-up sweep and log results"""
+        try:
+            return self.follow_up_service.run_sweep()
+        except Exception as e:
+            logging.error(f"Error running follow-up sweep: {str(e)}")
+            return None
+    
+    def _run_listing_expiry_job(self):
+        """Run the listing expiry sweep and log results"""
+        try:
+            return self.listing_expiry_service.run_sweep()
+        except Exception as e:
+            logging.error(f"Error running listing expiry sweep: {str(e)}")
+            return None
+    
+    def _run_archive_job(self):
+        """Run the archive job and log results"""
+        try:
+            return self.archive_service.run()
+        except Exception as e:
+            logging.error(f"Error running archive job: {str(e)}")
+            return None
+    
+    def _run_user_stats_job(self):
+        """Rebuild every user's dashboard counters and log results"""
+        try:
+            reconciled = UserStats.rebuild_all()
+            logging.info(f"Dashboard counters reconciled for {reconciled} users")
+            return reconciled
+        except Exception as e:
+            logging.error(f"Error reconciling dashboard counters: {str(e)}")
+            return None
+    
     def run_now(self):
         """Run the matching job immediately (for testing or manual trigger)"""
         return self._run_matching_job()
@@ -0,0 +1,213 @@
+import logging
+from datetime import datetime
+import numpy as np
+from pymongo import UpdateOne
+from app import db
+from app.utils.geo import coordinates, haversine_km
+
+# Weight of each component in the overall fit score
+SCORE_WEIGHTS = {
+    "price": 0.3,
+    "bedrooms": 0.1,
+    "bathrooms": 0.1,
+    "property_type": 0.1,
+    "distance": 0.2,
+    "freshness": 0.1,
+    "value": 0.1
+}
+
+# Listing fields read to score matches
+SCORE_FIELDS = ("price", "bedrooms", "bathrooms", "property_type", "location", "date_found")
+
+# Component score given when a listing is missing the value it's scored on
+UNKNOWN_SCORE = 0.5
+
+# Distance (km) from the preferred location at which the distance score halves
+DISTANCE_HALF_KM = 5.0
+
+# Listing age (days) at which the freshness score halves
+FRESHNESS_HALF_DAYS = 14.0
+
+# Price/estimate ratio difference that maps to the best/worst value score
+VALUE_SPREAD = 0.2
+
+# Matches scored per batch (and listings looked up per query)
+SCORE_BATCH_SIZE = 5000
+
+def fit_scores(preferences, listings, estimates=None, now=None):
+    """
+    Score listings against a user's rental preferences
+    
+    Each component scores 0-1 and the weighted sum is scaled to 0-100.
+    Components the user has no preference for score 1 for every listing, so
+    they don't affect the ranking.
+    
+    Args:
+        preferences: User rental_preferences
+        listings: Dict of NumPy arrays of price, bedrooms, bathrooms,
+            latitude, longitude, property_type (object array) and date_found
+            (datetime64)
+        estimates: Array of estimated rents for each listing (NaN if unknown)
+        now: Time freshness is measured from
+    
+    Returns:
+        numpy.ndarray: Fit score per listing
+    """
+    now = np.datetime64(now or datetime.utcnow(), "s")
+    price = listings["price"]
+    
+    components = {
+        "price": _price_scores(price, preferences.get("min_price"), preferences.get("max_price")),
+        "bedrooms": _surplus_scores(listings["bedrooms"], preferences.get("min_bedrooms")),
+        "bathrooms": _surplus_scores(listings["bathrooms"], preferences.get("min_bathrooms")),
+        "property_type": _property_type_scores(listings["property_type"], preferences.get("property_types")),
+        "distance": _distance_scores(listings["latitude"], listings["longitude"], preferences.get("center")),
+        "freshness": _freshness_scores(listings["date_found"], now),
+        "value": _value_scores(price, estimates)
+    }
+    
+    total = sum(SCORE_WEIGHTS[name] * scores for name, scores in components.items())
+    return np.round(100 * total / sum(SCORE_WEIGHTS.values()), 1)
+
+def _price_scores(price, min_price, max_price):
+    """1 inside the price range, falling linearly to 0 at 20% outside it"""
+    scores = np.ones_like(price)
+    if min_price:
+        min_price = float(min_price)
+        below = (min_price - price) / (0.2 * min_price)
+        scores = np.minimum(scores, 1 - np.clip(below, 0, 1))
+    if max_price:
+        max_price = float(max_price)
+        above = (price - max_price) / (0.2 * max_price)
+        scores = np.minimum(scores, 1 - np.clip(above, 0, 1))
+    return np.where(np.isnan(price), UNKNOWN_SCORE, scores)
+
+def _surplus_scores(values, minimum):
+    """0 below the minimum, 0.8 at it, plus 0.1 per extra room (up to 1)"""
+    if not minimum:
+        return np.ones_like(values, dtype=np.float64)
+    minimum = float(minimum)
+    scores = np.where(values < minimum, 0.0, np.clip(0.8 + 0.1 * (values - minimum), 0, 1))
+    return np.where(np.isnan(values), UNKNOWN_SCORE, scores)
+
+def _property_type_scores(property_types, preferred):
+    if not preferred:
+        return np.ones(len(property_types))
+    return np.isin(property_types, list(preferred)).astype(np.float64)
+
+def _distance_scores(latitudes, longitudes, center):
+    """Halves every DISTANCE_HALF_KM from the preferred location"""
+    if not center:
+        return np.ones_like(latitudes)
+    distance = haversine_km(float(center["latitude"]), float(center["longitude"]), latitudes, longitudes)
+    return np.where(np.isnan(distance), UNKNOWN_SCORE, 0.5 ** (distance / DISTANCE_HALF_KM))
+
+def _freshness_scores(date_found, now):
+    """Halves every FRESHNESS_HALF_DAYS since the listing was found"""
+    age_days = (now - date_found) / np.timedelta64(1, "D")
+    return np.where(np.isnan(age_days), UNKNOWN_SCORE, 0.5 ** (np.maximum(age_days, 0) / FRESHNESS_HALF_DAYS))
+
+def _value_scores(price, estimates):
+    """1 at VALUE_SPREAD below the estimated rent, 0 at VALUE_SPREAD above it"""
+    if estimates is None:
+        return np.full_like(price, UNKNOWN_SCORE)
+    scores = np.clip(0.5 + (1 - price / estimates) / (2 * VALUE_SPREAD), 0, 1)
+    return np.where(np.isnan(scores), UNKNOWN_SCORE, scores)
+
+class ScoringService:
+    """Service for ranking a user's matches by how well they fit their preferences"""
+    
+    def __init__(self, listing_index=None):
+        self.listing_index = listing_index
+    
+    def score_user_matches(self, user, now=None):
+        """
+        Compute and store the fit score of every match for a user
+        
+        Listings are scored in batches with NumPy, and only scores that
+        changed are written back (in one bulk write per batch).
+        
+        Args:
+            user: User object
+            now: Time freshness is measured from
+        
+        Returns:
+            int: Number of matches whose score changed
+        """
+        preferences = user.rental_preferences or {}
+        estimator = self._rent_estimator()
+        updated = 0
+        
+        matches = db.matches.find({"user_id": user._id}, {"listing_id": 1, "score": 1}).batch_size(SCORE_BATCH_SIZE)
+        batch = []
+        for match in matches:
+            batch.append(match)
+            if len(batch) == SCORE_BATCH_SIZE:
+                updated += self._score_batch(batch, preferences, estimator, now)
+                batch = []
+        if batch:
+            updated += self._score_batch(batch, preferences, estimator, now)
+        
+        logging.info(f"Scored matches for user {user._id}: {updated} updated")
+        return updated
+    
+    def _score_batch(self, matches, preferences, estimator, now):
+        listings = {
+            listing["_id"]: listing
+            for listing in db.listings.find(
+                {"_id": {"$in": [match["listing_id"] for match in matches]}},
+                {field: 1 for field in SCORE_FIELDS}
+            )
+        }
+        matches = [match for match in matches if match["listing_id"] in listings]
+        if not matches:
+            return 0
+        
+        documents = [listings[match["listing_id"]] for match in matches]
+        columns = _score_columns(documents)
+        estimates = estimator(columns["bedrooms"]) if estimator else None
+        scores = fit_scores(preferences, columns, estimates, now)
+        
+        updates = [
+            UpdateOne({"_id": match["_id"]}, {"$set": {"score": float(score)}})
+            for match, score in zip(matches, scores)
+            if match.get("score") != float(score)
+        ]
+        if updates:
+            db.matches.bulk_write(updates, ordered=False)
+        return len(updates)
+    
+    def _rent_estimator(self):
+        """
+        Build a function estimating rents from bedroom counts, using the
+        median price of active listings with the same number of bedrooms
+        """
+        if self.listing_index is None:
+            return None
+        
+        self.listing_index.refresh()
+        medians = self.listing_index.median_prices_by_bedrooms()
+        if not medians:
+            return None
+        
+        bedrooms = np.array(sorted(medians), dtype=np.float64)
+        prices = np.array([medians[count] for count in sorted(medians)])
+        
+        def estimate(values):
+            positions = np.clip(np.searchsorted(bedrooms, values), 0, len(bedrooms) - 1)
+            return np.where(bedrooms[positions] == values, prices[positions], np.nan)
+        
+        return estimate
+
+def _score_columns(documents):
+    """Convert listing documents to the column arrays fit_scores takes"""
+    columns = {
+        field: np.array([document.get(field) for document in documents], dtype=np.float64)
+        for field in ("price", "bedrooms", "bathrooms")
+    }
+    points = [coordinates(document.get("location")) for document in documents]
+    columns["latitude"] = np.array([latitude for latitude, _ in points], dtype=np.float64)
+    columns["longitude"] = np.array([longitude for _, longitude in points], dtype=np.float64)
+    columns["property_type"] = np.array([document.get("property_type") for document in documents], dtype=object)
+    columns["date_found"] = np.array([document.get("date_found") for document in documents], dtype="datetime64[s]")
+    return columns
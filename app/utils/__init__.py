@@ -0,0 +1 @@
+# Utilities initialization
\ No newline at end of file
@@ -0,0 +1,146 @@
+import re
+
+# USPS street suffix and directional abbreviations
+STREET_ABBREVIATIONS = {
+    "street": "st", "str": "st",
+    "avenue": "ave", "av": "ave",
+    "boulevard": "blvd",
+    "drive": "dr",
+    "road": "rd",
+    "lane": "ln",
+    "court": "ct",
+    "circle": "cir",
+    "place": "pl",
+    "parkway": "pkwy",
+    "highway": "hwy",
+    "terrace": "ter",
+    "trail": "trl",
+    "square": "sq",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "northeast": "ne", "northwest": "nw", "southeast": "se", "southwest": "sw"
+}
+
+# Normalized directionals and street suffixes, which must match exactly for
+# two addresses to be the same (E Main St and W Main St are different streets)
+DIRECTIONALS = frozenset(("n", "s", "e", "w", "ne", "nw", "se", "sw"))
+STREET_SUFFIXES = frozenset((
+    "st", "ave", "blvd", "dr", "rd", "ln", "ct", "cir", "pl", "pkwy", "hwy", "ter", "trl", "sq", "way", "loop"
+))
+
+# Unit designators, all normalized to "#"
+UNIT_DESIGNATORS = ("apartment", "apt", "unit", "suite", "ste", "#")
+
+# Most single-character edits (typos) between the street names of two
+# addresses in the same block for them to be the same unit, and the
+# shortest name allowed any (Elm and Elk are different streets)
+MAX_STREET_NAME_EDITS = 1
+MIN_FUZZY_STREET_NAME_LENGTH = 5
+
+# Unit numbers contain a digit or are a single letter, so street names
+# that start with a designator ("Ste Genevieve Ave") aren't read as units
+_UNIT_PATTERN = re.compile(r"(?:\b(?:%s)\b\.?|#)\s*#?\s*([a-z0-9-]*\d[a-z0-9-]*|[a-z])\b" % "|".join(
+    re.escape(designator) for designator in UNIT_DESIGNATORS if designator != "#"
+))
+
+def normalize_address(address):
+    """
+    Reduce an address to a canonical key, so formatting differences
+    ("123 Main Street, Apt 4B" vs "123 MAIN ST #4b") give the same key
+    
+    Returns:
+        str: Canonical key, or None for an empty address
+    """
+    if not address:
+        return None
+    
+    key = address.lower()
+    key = re.sub(r"\b(\d{5})-\d{4}\b", r"\1", key)  # ZIP+4 -> ZIP
+    key = _UNIT_PATTERN.sub(lambda match: f" #{match.group(1).replace('-', '')} ", key)
+    key = re.sub(r"[^a-z0-9# ]+", " ", key)
+    
+    words = [STREET_ABBREVIATIONS.get(word, word) for word in key.split()]
+    return " ".join(words) or None
+
+def blocking_key(address_key):
+    """
+    Get the block an address key is compared within for fuzzy matching
+    (house number and ZIP code), so near-misses are found with one indexed
+    lookup instead of comparing against every listing
+    
+    Returns:
+        str: Block key, or None if the address lacks a house number or ZIP
+    """
+    if not address_key:
+        return None
+    
+    words = address_key.split()
+    if not words[0].isdigit() or not re.fullmatch(r"\d{5}", words[-1]):
+        return None
+    return f"{words[0]}|{words[-1]}"
+
+def address_unit(address_key):
+    """Get the unit number in an address key (None if it has none)"""
+    match = re.search(r"#(\S+)", address_key or "")
+    return match.group(1) if match else None
+
+def same_address(address_key, other_key):
+    """
+    Check whether two address keys from the same block are likely the same
+    unit: everything but the street name must match exactly (house number,
+    directionals, suffix, unit, city, state and ZIP), and the street names
+    may differ by at most MAX_STREET_NAME_EDITS typos
+    """
+    parts = _street_parts(address_key)
+    other_parts = _street_parts(other_key)
+    if not parts or not other_parts:
+        return False
+    
+    name, rest = parts
+    other_name, other_rest = other_parts
+    if rest != other_rest:
+        return False
+    
+    if min(len(name), len(other_name)) < MIN_FUZZY_STREET_NAME_LENGTH:
+        return name == other_name
+    return _edit_distance(name, other_name, MAX_STREET_NAME_EDITS) <= MAX_STREET_NAME_EDITS
+
+def _street_parts(address_key):
+    """
+    Split an address key into its street name and everything else
+    
+    Returns:
+        tuple: (street name, tuple of the other words with the name's place
+            marked), or None if the key has no house number or street suffix
+    """
+    words = (address_key or "").split()
+    if len(words) < 3 or not words[0].isdigit():
+        return None
+    
+    start = 2 if words[1] in DIRECTIONALS else 1
+    # The name is at least one word, so "St Louis Ave" keeps its "St"
+    for end in range(start + 1, len(words)):
+        if words[end] in STREET_SUFFIXES:
+            return " ".join(words[start:end]), tuple(words[:start] + ["*"] + words[end:])
+    return None
+
+def _edit_distance(word, other, limit):
+    """
+    Count the insertions, deletions, substitutions and adjacent swaps
+    between two strings (stopping early once it's over limit)
+    """
+    if abs(len(word) - len(other)) > limit:
+        return limit + 1
+    
+    two_rows_back = None
+    previous_row = list(range(len(other) + 1))
+    for i in range(1, len(word) + 1):
+        row = [i] + [0] * len(other)
+        for j in range(1, len(other) + 1):
+            cost = word[i - 1] != other[j - 1]
+            row[j] = min(row[j - 1] + 1, previous_row[j] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and word[i - 1] == other[j - 2] and word[i - 2] == other[j - 1]:
+                row[j] = min(row[j], two_rows_back[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        two_rows_back, previous_row = previous_row, row
+    return previous_row[-1]
@@ -0,0 +1,328 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+from bson.objectid import ObjectId
+from flask import jsonify, session
+from pymongo import ReturnDocument, UpdateOne
+from app import db
+from app.config import (
+    REFRESH_RATE_LIMIT, REFRESH_RATE_WINDOW_SECONDS, DRAFT_RATE_LIMIT, DRAFT_RATE_WINDOW_SECONDS,
+    RENTCAST_MAX_IN_FLIGHT, OPENAI_MAX_IN_FLIGHT, PROVIDER_SLOT_LEASE_SECONDS, OVERLOAD_RETRY_AFTER_SECONDS
+)
+
+# Per-user budgets for expensive endpoints: name -> (requests, window in seconds)
+RATE_LIMITS = {
+    "refresh": (REFRESH_RATE_LIMIT, REFRESH_RATE_WINDOW_SECONDS),
+    "draft": (DRAFT_RATE_LIMIT, DRAFT_RATE_WINDOW_SECONDS)
+}
+
+# Most calls to each provider that requests may have in flight across all workers
+PROVIDER_LIMITS = {
+    "rentcast": RENTCAST_MAX_IN_FLIGHT,
+    "openai": OPENAI_MAX_IN_FLIGHT
+}
+
+# Rejections since the process started, by (limit name, reason)
+rejections = Counter()
+_rejections_lock = threading.Lock()
+
+class Overloaded(Exception):
+    """Raised when a provider has no capacity for another call"""
+    
+    def __init__(self, provider, retry_after=OVERLOAD_RETRY_AFTER_SECONDS):
+        super().__init__(f"Too many {provider} requests in progress")
+        self.provider = provider
+        self.retry_after = retry_after
+
+def record_rejection(name, reason):
+    """Count a rejected request (see GET /api/health/metrics)"""
+    with _rejections_lock:
+        rejections[(name, reason)] += 1
+    logging.warning(f"Rejected {name} request: {reason}")
+
+def too_many_requests(message, retry_after):
+    """Build a 429 response telling the client when to retry"""
+    return jsonify({"error": message, "retry_after": retry_after}), 429, {"Retry-After": str(retry_after)}
+
+def check_rate_limit(name, user_id, now=None):
+    """
+    Count a request against a user's budget for an endpoint
+    
+    Uses a sliding window counter: the count for the current fixed window
+    plus the previous window's count weighted by how much of it still
+    overlaps the sliding window. Counters live in the rate_limits
+    collection (shared by all workers) and expire after two windows.
+    
+    Args:
+        name: Budget name in RATE_LIMITS
+        user_id: User ID
+        now: Current time (seconds since the epoch)
+    
+    Returns:
+        int: Seconds until the user may retry, or 0 if the request is allowed
+    """
+    window = _RateWindow(name, user_id, now)
+    current = db.rate_limits.find_one_and_update(
+        window.current, window.count_update(), upsert=True, return_document=ReturnDocument.AFTER
+    )
+    previous = db.rate_limits.find_one(window.previous)
+    
+    retry_after = window.retry_after(current, previous)
+    if retry_after:
+        # Rejected requests don't use up the budget
+        db.rate_limits.update_one(window.current, {"$inc": {"count": -1}})
+    return retry_after
+
+async def check_rate_limit_async(adb, name, user_id, now=None):
+    """
+    Count a request against a user's budget (see check_rate_limit), for the
+    ASGI app
+    
+    Args:
+        adb: Motor database
+    
+    Returns:
+        int: Seconds until the user may retry, or 0 if the request is allowed
+    """
+    window = _RateWindow(name, user_id, now)
+    current = await adb.rate_limits.find_one_and_update(
+        window.current, window.count_update(), upsert=True, return_document=ReturnDocument.AFTER
+    )
+    previous = await adb.rate_limits.find_one(window.previous)
+    
+    retry_after = window.retry_after(current, previous)
+    if retry_after:
+        await adb.rate_limits.update_one(window.current, {"$inc": {"count": -1}})
+    return retry_after
+
+class _RateWindow:
+    """The current and previous counters for a request, and the sliding window check over them"""
+    
+    def __init__(self, name, user_id, now=None):
+        self.limit, self.window = RATE_LIMITS[name]
+        now = now or time.time()
+        self.index = int(now // self.window)
+        self.elapsed = now - self.index * self.window
+        self.current = {"_id": f"{name}:{user_id}:{self.index}"}
+        self.previous = {"_id": f"{name}:{user_id}:{self.index - 1}"}
+    
+    def count_update(self):
+        """Update counting the request in the current window (kept for two windows)"""
+        return {
+            "$inc": {"count": 1},
+            "$setOnInsert": {"expires_at": datetime.utcfromtimestamp((self.index + 2) * self.window)}
+        }
+    
+    def retry_after(self, current, previous):
+        """Seconds until the user may retry given the counter documents, or 0 if allowed"""
+        previous_count = previous["count"] if previous else 0
+        if previous_count * (self.window - self.elapsed) / self.window + current["count"] <= self.limit:
+            return 0
+        return _retry_after(self.limit, self.window, self.elapsed, previous_count, current["count"] - 1)
+
+def _retry_after(limit, window, elapsed, previous, current):
+    """Seconds until one more request fits in the sliding window"""
+    if current + 1 <= limit and previous:
+        # Wait for enough of the previous window to slide out
+        wait = window * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        # Wait for the next window, where this window's count is the previous one
+        wait = window - elapsed
+        if current:
+            wait += max(0, window * (1 - (limit - 1) / current))
+    return max(1, math.ceil(wait))
+
+def rate_limited(name):
+    """Decorate a route to reject requests over the session user's budget with 429"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'user_id' in session:
+                retry_after = check_rate_limit(name, session['user_id'])
+                if retry_after:
+                    record_rejection(name, "rate_limit")
+                    return too_many_requests("Rate limit exceeded, try again later", retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class ProviderGate:
+    """
+    Caps the calls to each external provider that requests have in flight
+    across all workers, shedding extra calls instead of queueing them
+    
+    Each provider has one document per allowed call in the provider_slots
+    collection. A call leases a free slot with a single atomic update and
+    clears it when done; slots leased by a worker that died are free again
+    once their lease expires.
+    """
+    
+    def __init__(self, limits=PROVIDER_LIMITS, lease_seconds=PROVIDER_SLOT_LEASE_SECONDS):
+        self.limits = dict(limits)
+        self.lease_seconds = lease_seconds
+        self._created = set()
+    
+    def try_acquire(self, provider):
+        """
+        Lease a slot for a call
+        
+        Returns:
+            tuple: Lease to give back with release, or None if the provider is at its cap
+        """
+        if provider not in self._created:
+            db.provider_slots.bulk_write(self._slot_upserts(provider))
+            self._created.add(provider)
+        slot = db.provider_slots.find_one_and_update(
+            *self._lease_update(provider), return_document=ReturnDocument.AFTER
+        )
+        return self._lease(slot)
+    
+    def acquire(self, provider):
+        """
+        Lease a slot for a call, to be given back with release
+        
+        Returns:
+            tuple: Lease
+        
+        Raises:
+            Overloaded: If the provider is at its cap
+        """
+        lease = self.try_acquire(provider)
+        if not lease:
+            record_rejection(provider, "concurrency")
+            raise Overloaded(provider)
+        return lease
+    
+    def release(self, lease):
+        """Give back a slot"""
+        db.provider_slots.update_one(*self._release_update(lease))
+    
+    def renew(self, lease):
+        """
+        Extend a lease by lease_seconds, for calls that may outlive it
+        
+        Returns:
+            bool: False if the lease already expired and the slot was taken over
+        """
+        slot_id, token = lease
+        expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        renewed = db.provider_slots.update_one({"_id": slot_id, "lease": token}, {"$set": {"expires_at": expires_at}})
+        return bool(renewed.matched_count)
+    
+    @contextmanager
+    def slot(self, provider):
+        """
+        Hold a slot for the duration of a call
+        
+        Raises:
+            Overloaded: If the provider is at its cap
+        """
+        lease = self.acquire(provider)
+        try:
+            yield
+        finally:
+            self.release(lease)
+    
+    async def acquire_async(self, adb, provider):
+        """
+        Lease a slot for a call (see acquire), for the ASGI app
+        
+        Args:
+            adb: Motor database
+        
+        Raises:
+            Overloaded: If the provider is at its cap
+        """
+        if provider not in self._created:
+            await adb.provider_slots.bulk_write(self._slot_upserts(provider))
+            self._created.add(provider)
+        slot = await adb.provider_slots.find_one_and_update(
+            *self._lease_update(provider), return_document=ReturnDocument.AFTER
+        )
+        lease = self._lease(slot)
+        if not lease:
+            record_rejection(provider, "concurrency")
+            raise Overloaded(provider)
+        return lease
+    
+    async def release_async(self, adb, lease):
+        """Give back a slot, for the ASGI app"""
+        await adb.provider_slots.update_one(*self._release_update(lease))
+    
+    @asynccontextmanager
+    async def slot_async(self, adb, provider):
+        """
+        Hold a slot for the duration of a call, for the ASGI app
+        
+        Raises:
+            Overloaded: If the provider is at its cap
+        """
+        lease = await self.acquire_async(adb, provider)
+        try:
+            yield
+        finally:
+            await self.release_async(adb, lease)
+    
+    def in_flight(self):
+        """Count each provider's leased slots across all workers"""
+        now = datetime.utcnow()
+        return {
+            provider: db.provider_slots.count_documents(
+                {"provider": provider, "index": {"$lt": limit}, "expires_at": {"$gte": now}}
+            )
+            for provider, limit in self.limits.items()
+        }
+    
+    def _slot_upserts(self, provider):
+        """Writes creating any of a provider's slots that don't exist yet"""
+        return [
+            UpdateOne(
+                {"_id": f"{provider}:{index}"},
+                {"$setOnInsert": {"provider": provider, "index": index, "lease": None, "expires_at": None}},
+                upsert=True
+            )
+            for index in range(self.limits[provider])
+        ]
+    
+    def _lease_update(self, provider):
+        """Filter and update leasing a free (or expired) slot"""
+        now = datetime.utcnow()
+        return (
+            {
+                "provider": provider,
+                "index": {"$lt": self.limits[provider]},
+                "$or": [{"expires_at": None}, {"expires_at": {"$lt": now}}]
+            },
+            {"$set": {"lease": ObjectId(), "expires_at": now + timedelta(seconds=self.lease_seconds)}}
+        )
+    
+    @staticmethod
+    def _lease(slot):
+        """The lease on a slot just taken, or None if there was no free slot"""
+        return (slot["_id"], slot["lease"]) if slot else None
+    
+    @staticmethod
+    def _release_update(lease):
+        """Filter and update clearing a slot, unless its lease expired and was taken over"""
+        slot_id, token = lease
+        return {"_id": slot_id, "lease": token}, {"$set": {"lease": None, "expires_at": None}}
+
+provider_gate = ProviderGate()
+
+def admission_metrics():
+    """Get this process's rejection counts and the in-flight provider calls across all workers"""
+    with _rejections_lock:
+        rejected = [
+            {"name": name, "reason": reason, "count": count}
+            for (name, reason), count in sorted(rejections.items())
+        ]
+    return {
+        "rejections": rejected,
+        "in_flight": provider_gate.in_flight(),
+        "limits": provider_gate.limits
+    }
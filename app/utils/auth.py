@@ -0,0 +1,17 @@
+from flask import session
+from app.models.user import User
+
+def current_user():
+    """
+    Get the logged-in user for this request
+    
+    Repeated calls within a request return the same instance, and across
+    requests the user document is cached briefly (see User.find_for_session).
+    
+    Returns:
+        User: The user, or None if nobody is logged in or the user no longer exists
+    """
+    if 'user_id' not in session:
+        return None
+    
+    return User.find_for_session(session['user_id'])
@@ -0,0 +1,40 @@
+import hashlib
+import json
+from flask import request
+
+# Responses are per user and must be revalidated on every poll (a 304 is cheap)
+CACHE_CONTROL = "private, no-cache"
+
+def version_tag(*parts):
+    """
+    Build an ETag value from the state a response was rendered from (IDs,
+    last_updated dates and the like, not the response itself)
+    
+    Returns:
+        str: Opaque tag
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+def not_modified(etag, vary=None):
+    """
+    Check the request's If-None-Match against a weak ETag
+    
+    Args:
+        etag: Tag from version_tag
+        vary: Request headers the response depends on (e.g. "Accept")
+    
+    Returns:
+        tuple: Empty 304 response with caching headers if the client's copy
+            is current, otherwise None
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return "", 304, cache_headers(etag, vary)
+
+def cache_headers(etag, vary=None):
+    """Get the ETag, Cache-Control and (if given) Vary headers for a response"""
+    headers = {"ETag": f'W/"{etag}"', "Cache-Control": CACHE_CONTROL}
+    if vary:
+        headers["Vary"] = vary
+    return headers
@@ -0,0 +1,86 @@
+EARTH_RADIUS_KM = 6371.0
+
+KM_PER_MILE = 1.609344
+
+def point(latitude, longitude):
+    """
+    Build a GeoJSON point (note GeoJSON's [longitude, latitude] order)
+    
+    Returns:
+        dict: GeoJSON point, or None if either coordinate is missing
+    """
+    if latitude is None or longitude is None:
+        return None
+    return {"type": "Point", "coordinates": [float(longitude), float(latitude)]}
+
+def coordinates(location):
+    """
+    Get (latitude, longitude) from a GeoJSON point
+    
+    Returns:
+        tuple: (latitude, longitude), or (None, None) if there's no point
+    """
+    if not location:
+        return None, None
+    longitude, latitude = location["coordinates"]
+    return latitude, longitude
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points (NaN where unknown)"""
+    # Imported here so models can use the GeoJSON helpers without loading NumPy at startup
+    import numpy as np
+    
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def preference_area(preferences):
+    """
+    Build a $geoWithin operand for the area in a user's rental preferences
+    
+    The area is either `center` ({"latitude", "longitude"}) with `radius_km`,
+    or `polygon`, a list of [longitude, latitude] pairs (GeoJSON order).
+    
+    Returns:
+        dict: $geoWithin operand, or None if the preferences have no area
+    
+    Raises:
+        ValueError: If the area is malformed
+    """
+    try:
+        if preferences.get('polygon'):
+            ring = [[float(longitude), float(latitude)] for longitude, latitude in preferences['polygon']]
+            if ring[0] != ring[-1]:
+                ring.append(ring[0])
+            if len(ring) < 4:
+                raise ValueError("A polygon needs at least three points")
+            return {"$geometry": {"type": "Polygon", "coordinates": [ring]}}
+        
+        if preferences.get('center') and preferences.get('radius_km'):
+            center = preferences['center']
+            return {"$centerSphere": [
+                [float(center['longitude']), float(center['latitude'])],
+                float(preferences['radius_km']) / EARTH_RADIUS_KM
+            ]}
+    except (TypeError, KeyError) as e:
+        raise ValueError(f"Invalid search area: {str(e)}") from e
+    
+    return None
+
+def bounding_circle(area):
+    """
+    Get a circle covering a preference area (for APIs that only search by radius)
+    
+    Returns:
+        tuple: (latitude, longitude, radius_km)
+    """
+    if "$centerSphere" in area:
+        (longitude, latitude), radians = area["$centerSphere"]
+        return latitude, longitude, radians * EARTH_RADIUS_KM
+    
+    import numpy as np
+    ring = np.array(area["$geometry"]["coordinates"][0][:-1])
+    longitude, latitude = ring.mean(axis=0)
+    radius_km = haversine_km(latitude, longitude, ring[:, 1], ring[:, 0]).max()
+    return float(latitude), float(longitude), float(radius_km)
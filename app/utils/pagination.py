@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+
+EPOCH = datetime(1970, 1, 1)
+
+def encode_cursor(sort_value, object_id):
+    """
+    Build an opaque cursor token for keyset pagination
+    
+    Args:
+        sort_value: Datetime, number or None of the last item on the page
+        object_id: ID of the last item on the page (tie-breaker)
+    
+    Returns:
+        str: URL-safe cursor token
+    """
+    if isinstance(sort_value, datetime):
+        payload = {"t": (sort_value - EPOCH) // timedelta(milliseconds=1)}
+    else:
+        payload = {"v": sort_value}
+    payload["i"] = str(object_id)
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return token.decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor token produced by encode_cursor
+    
+    Returns:
+        tuple: (datetime, number or None, ObjectId)
+    
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if "t" in payload:
+            sort_value = EPOCH + timedelta(milliseconds=int(payload["t"]))
+        else:
+            sort_value = payload["v"]
+            if sort_value is not None and not isinstance(sort_value, (int, float)):
+                raise ValueError("Cursor sort value must be a number or null")
+        return sort_value, ObjectId(payload["i"])
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def keyset_filter(field, cursor):
+    """
+    Build a query filter selecting items after the cursor, for results
+    sorted by (field, _id) descending
+    
+    Nulls (and missing values) sort last in descending order, so a cursor
+    on a null only continues through the nulls, and a cursor on a number
+    also selects every null (e.g. unscored matches when sorting by score).
+    """
+    sort_value, object_id = decode_cursor(cursor)
+    if sort_value is None:
+        return {field: None, "_id": {"$lt": object_id}}
+    
+    after = [
+        {field: {"$lt": sort_value}},
+        {field: sort_value, "_id": {"$lt": object_id}}
+    ]
+    if not isinstance(sort_value, datetime):
+        after.append({field: None})
+    return {"$or": after}
+
+def next_cursor(items, limit, field, id_field):
+    """
+    Build the cursor for the page following items, or None on the last page
+    
+    Args:
+        items: Formatted page items
+        limit: Page size that was requested
+        field: Key holding the sort value in each item
+        id_field: Key holding the item ID in each item
+    """
+    if not items or len(items) < limit:
+        return None
+    
+    last = items[-1]
+    return encode_cursor(last[field], last[id_field])
@@ -0,0 +1,141 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from flask import Response, current_app, request
+from flask.json.provider import DefaultJSONProvider
+from app.models.base import Model
+
+try:
+    import orjson
+except ImportError:
+    # Fall back to the standard library encoder
+    orjson = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Bytes of encoded items to collect before writing a chunk of a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Names used in HTTP dates (fixed, unlike strftime's locale-dependent %a and %b)
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def default(value):
+    """
+    Serialize values the JSON encoder doesn't handle itself: ObjectIds as
+    strings, models via to_dict, and everything Flask handles (datetimes
+    as HTTP dates, decimals, UUIDs, dataclasses)
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        # Naive datetimes (as read from MongoDB) are UTC; same output as
+        # werkzeug's http_date, without its conversions
+        return (
+            f"{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT"
+        )
+    if isinstance(value, Model) and hasattr(value, "to_dict"):
+        return value.to_dict()
+    return DefaultJSONProvider.default(value)
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it's installed
+    
+    Output matches Flask's default provider (datetimes are still HTTP
+    dates, keys are still sorted), so switching encoders is invisible to
+    clients. Calls with encoder options orjson doesn't support go to the
+    standard library encoder.
+    """
+    
+    default = staticmethod(default)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        
+        obj = self._prepare_response_obj(args, kwargs)
+        option = 0
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option = orjson.OPT_INDENT_2
+        return self._app.response_class(self._orjson_dumps(obj, option) + b"\n", mimetype=self.mimetype)
+    
+    def _orjson_dumps(self, obj, option=0):
+        # Datetimes go through default so they keep Flask's HTTP date format
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+def list_mimetype():
+    """Get the representation of a list endpoint that the client accepts (JSON unless it prefers NDJSON)"""
+    if request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return NDJSON_MIMETYPE
+    return "application/json"
+
+def stream_list(key, items, **fields):
+    """
+    Build a response that encodes a list endpoint's items as they're sent,
+    instead of encoding the whole payload at once
+    
+    Clients that accept application/x-ndjson get one item per line, with
+    fields as X- headers (next_cursor -> X-Next-Cursor). Everyone else gets
+    the usual JSON object, {key: [items...], **fields}.
+    
+    Args:
+        key: Key holding the items in the JSON object
+        items: Iterable of items (may be a generator)
+        fields: Other top-level fields (e.g. count, next_cursor)
+    
+    Returns:
+        Response: Streamed response
+    """
+    encode = current_app.json.dumps
+    
+    if list_mimetype() == NDJSON_MIMETYPE:
+        headers = {
+            "X-" + name.replace("_", "-").title(): str(value)
+            for name, value in fields.items() if value is not None
+        }
+        return Response(_chunked(_ndjson_lines(items, encode)), mimetype=NDJSON_MIMETYPE,
+                        headers={**headers, "Vary": "Accept"})
+    
+    return Response(_chunked(_json_parts(key, items, fields, encode)), mimetype=current_app.json.mimetype,
+                    headers={"Vary": "Accept"})
+
+def _ndjson_lines(items, encode):
+    for item in items:
+        yield encode(item) + "\n"
+
+def _json_parts(key, items, fields, encode):
+    yield "{" + encode(key) + ":["
+    for position, item in enumerate(items):
+        yield ("," if position else "") + encode(item)
+    yield "]"
+    for name, value in fields.items():
+        yield "," + encode(name) + ":" + encode(value)
+    yield "}\n"
+
+def _chunked(parts):
+    """Join encoded parts into chunks of about STREAM_CHUNK_SIZE bytes"""
+    chunk = []
+    size = 0
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk)
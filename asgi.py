@@ -0,0 +1,9 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (before config is read)
+load_dotenv()
+
+from app.asgi import create_asgi_app
+
+# ASGI entry point, e.g. `uvicorn asgi:app --workers 2`
+app = create_asgi_app()
@@ -0,0 +1,106 @@
+"""
+Benchmark JSON encoding of list-endpoint payloads: Flask's default provider
+(with IDs converted to strings beforehand, as routes used to) against the
+app's JSONProvider, which serializes ObjectIds itself and uses orjson when
+it's installed. Payloads are synthetic /matches and /inbox pages, so no
+MongoDB server is needed.
+
+    python benchmarks/bench_json.py [--items 100] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import bson
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import serialization
+from app.utils.serialization import JSONProvider
+
+def make_match(index):
+    """Build a /matches item (with ObjectIds left unconverted)"""
+    return {
+        "match_id": bson.ObjectId(),
+        "match_status": "new",
+        "contacted": False,
+        "date_matched": datetime.utcnow(),
+        "score": 50 + index % 50,
+        "price_drop": None,
+        "listing": {
+            "id": bson.ObjectId(),
+            "external_id": f"{index}-Main-St-Austin-TX-78701",
+            "source": "rentcast",
+            "title": "2 Apartment for Rent",
+            "description": "Bright unit close to downtown. " * 20,
+            "price": 1200 + index % 2000,
+            "bedrooms": index % 4,
+            "bathrooms": 1 + index % 3,
+            "address": f"{index} Main St, Austin, TX 78701",
+            "url": None,
+            "image_url": f"https://example.com/{index}/0.jpg",
+            "available_from": None,
+            "property_type": "Apartment",
+            "latitude": 30.2672 + index * 1e-5,
+            "longitude": -97.7431 - index * 1e-5,
+            "date_found": datetime.utcnow(),
+            "status": "active"
+        }
+    }
+
+def make_communication(index):
+    """Build an /inbox item (with ObjectIds left unconverted)"""
+    return {
+        "id": bson.ObjectId(),
+        "listing_id": bson.ObjectId(),
+        "listing_address": f"{index} Main St, Austin, TX 78701",
+        "direction": "outgoing",
+        "type": "email",
+        "subject": f"Inquiry about rental property at {index} Main St",
+        "status": "sent",
+        "created_at": datetime.utcnow(),
+        "sent_at": datetime.utcnow()
+    }
+
+def stringify_ids(value):
+    """Convert ObjectIds to strings the way routes did before the provider handled them"""
+    if isinstance(value, dict):
+        return {key: stringify_ids(item) for key, item in value.items()}
+    if isinstance(value, bson.ObjectId):
+        return str(value)
+    return value
+
+def measure(label, encode, payload, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(payload)
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"  {label:<28} {elapsed * 1000:8.3f} ms/page")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    provider = JSONProvider(app)
+    encoder = "orjson" if serialization.orjson else "json (orjson not installed)"
+    
+    for endpoint, make_item in (("/matches", make_match), ("/inbox", make_communication)):
+        items = [make_item(index) for index in range(args.items)]
+        payload = {"items": items, "count": len(items), "next_cursor": None}
+        
+        print(f"{endpoint}: {args.items} items per page")
+        measure("default provider (before)", lambda payload: default_provider.dumps(
+            {**payload, "items": [stringify_ids(item) for item in payload["items"]]}
+        ), payload, args.repeat)
+        measure(f"JSONProvider, {encoder}", provider.dumps, payload, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark listing index search: time to filter and sort synthetic active
+listings held in the in-memory columnar index
+
+No MongoDB server is needed; listings are loaded with ListingIndex.upsert.
+
+    python benchmarks/bench_listing_index.py [--listings 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.listing_index import ListingIndex
+
+PROPERTY_TYPES = ["Apartment", "Condo", "Townhouse", "Single Family", "Multi-Family"]
+
+SEARCHES = {
+    "price range": {"min_price": 1500, "max_price": 2500},
+    "price range, 2+ beds, sort by price": {"min_price": 1500, "max_price": 2500, "min_bedrooms": 2, "sort": "price"},
+    "condos and townhouses": {"property_types": ["Condo", "Townhouse"]},
+    "within 5 km, sort by distance": {"near": (30.2672, -97.7431), "radius_km": 5, "sort": "distance"},
+    "everything, newest first": {}
+}
+
+def make_listings(count):
+    """Build listing documents with the fields the index reads"""
+    rng = np.random.default_rng(0)
+    now = datetime.utcnow()
+    prices = rng.integers(800, 5000, count)
+    bedrooms = rng.integers(0, 5, count)
+    bathrooms = rng.integers(1, 4, count)
+    types = rng.integers(0, len(PROPERTY_TYPES), count)
+    latitudes = 30.2672 + rng.normal(0, 0.3, count)
+    longitudes = -97.7431 + rng.normal(0, 0.3, count)
+    ages = rng.integers(0, 90 * 24 * 3600, count)
+    
+    return [
+        {
+            "_id": bson.ObjectId(),
+            "price": int(prices[index]),
+            "bedrooms": int(bedrooms[index]),
+            "bathrooms": int(bathrooms[index]),
+            "property_type": PROPERTY_TYPES[types[index]],
+            "location": {"type": "Point", "coordinates": [float(longitudes[index]), float(latitudes[index])]},
+            "date_found": now - timedelta(seconds=int(ages[index])),
+            "status": "active"
+        }
+        for index in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--listings", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    index = ListingIndex()
+    documents = make_listings(args.listings)
+    started = time.perf_counter()
+    index.upsert(documents)
+    print(f"Loaded {len(index)} listings in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    for name, search in SEARCHES.items():
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            results, total = index.search(limit=20, **search)
+        elapsed = (time.perf_counter() - started) / args.runs
+        print(f"{name:40} {elapsed * 1000:7.1f} ms  ({total} matches)")
+
+if __name__ == "__main__":
+    main()
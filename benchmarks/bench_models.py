@@ -0,0 +1,118 @@
+"""
+Benchmark listing model decoding: CPU to build list-endpoint payloads and
+memory held per loaded listing
+
+Compares the eager path (fully decoded dict -> Listing(**doc)) with the lazy
+path (RawBSONDocument -> Listing.from_raw), with and without a projection to
+the fields to_dict uses. Documents are synthetic RentCast-shaped payloads, so
+no MongoDB server is needed.
+
+    python benchmarks/bench_models.py [--listings 5000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.listing import Listing
+
+def make_listing(index):
+    """Build a listing document with a raw payload similar to RentCast's"""
+    payload = {
+        "id": f"{index}-Main-St-Austin-TX-78701",
+        "formattedAddress": f"{index} Main St, Austin, TX 78701",
+        "addressLine1": f"{index} Main St",
+        "city": "Austin",
+        "state": "TX",
+        "zipCode": "78701",
+        "county": "Travis",
+        "latitude": 30.2672 + index * 1e-5,
+        "longitude": -97.7431 - index * 1e-5,
+        "propertyType": "Apartment",
+        "bedrooms": index % 4,
+        "bathrooms": 1 + index % 3,
+        "squareFootage": 600 + index % 900,
+        "yearBuilt": 1990 + index % 30,
+        "status": "Active",
+        "price": 1200 + index % 2000,
+        "listedDate": "2024-01-15T00:00:00.000Z",
+        "lastSeenDate": "2024-02-01T00:00:00.000Z",
+        "daysOnMarket": index % 60,
+        "description": "Bright unit close to downtown. " * 20,
+        "photos": [{"url": f"https://example.com/{index}/{photo}.jpg"} for photo in range(15)],
+        "history": {
+            f"2023-{month:02d}-01": {"event": "Rental Listing", "price": 1200 + month, "daysOnMarket": month}
+            for month in range(1, 13)
+        }
+    }
+    return {
+        "_id": bson.ObjectId(),
+        "external_id": payload["id"],
+        "source": "rentcast",
+        "title": "2 Apartment for Rent",
+        "description": payload["description"],
+        "price": payload["price"],
+        "bedrooms": payload["bedrooms"],
+        "bathrooms": payload["bathrooms"],
+        "address": payload["formattedAddress"],
+        "url": None,
+        "image_url": payload["photos"][0]["url"],
+        "property_type": payload["propertyType"],
+        "available_from": None,
+        "contact_info": {"email": "agent@example.com", "phone": None, "name": None},
+        "date_found": datetime.utcnow(),
+        "last_updated": datetime.utcnow(),
+        "status": "active",
+        "metadata": payload
+    }
+
+def eager(documents):
+    return [Listing(**bson.decode(data)) for data in documents]
+
+def lazy(documents):
+    return [Listing.from_raw(RawBSONDocument(data)) for data in documents]
+
+def measure(label, load, documents):
+    """Time load + to_dict, then measure memory retained by the loaded listings"""
+    started = time.perf_counter()
+    listings = load(documents)
+    payload = [listing.to_dict() for listing in listings]
+    elapsed = time.perf_counter() - started
+    del listings, payload
+    
+    tracemalloc.start()
+    listings = load(documents)
+    for listing in listings:
+        listing.to_dict()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    per_listing = retained / len(documents)
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms  {per_listing / 1024:7.1f} KiB/listing")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listings", type=int, default=5000)
+    args = parser.parse_args()
+    
+    full = [bson.encode(make_listing(index)) for index in range(args.listings)]
+    projected_fields = ("_id",) + Listing.DICT_FIELDS
+    projected = [
+        bson.encode({field: value for field, value in bson.decode(data).items() if field in projected_fields})
+        for data in full
+    ]
+    
+    print(f"{args.listings} listings, {sum(map(len, full)) / len(full) / 1024:.1f} KiB BSON each")
+    measure("eager dict (before)", eager, full)
+    measure("lazy raw BSON", lazy, full)
+    measure("lazy raw BSON + projection", lazy, projected)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark worker cold start: importing the app package and building the app
+
+Each sample runs in a fresh interpreter so nothing is cached between runs.
+No MongoDB server is needed since the client connects lazily.
+
+    python benchmarks/bench_startup.py [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints import and create_app times (in ms) from inside a fresh interpreter
+SNIPPET = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({"SCHEDULER_ENABLED": False})
+created = time.perf_counter()
+print((imported - started) * 1000, (created - imported) * 1000)
+"""
+
+def sample():
+    """Run one cold start and return (import_ms, create_app_ms)"""
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    import_ms, create_ms = output.split()
+    return float(import_ms), float(create_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    
+    samples = [sample() for _ in range(args.runs)]
+    import_times = [import_ms for import_ms, _ in samples]
+    create_times = [create_ms for _, create_ms in samples]
+    total_times = [import_ms + create_ms for import_ms, create_ms in samples]
+    
+    print(f"runs: {args.runs}")
+    print(f"import app:  median {statistics.median(import_times):7.1f} ms")
+    print(f"create_app:  median {statistics.median(create_times):7.1f} ms")
+    print(f"total:       median {statistics.median(total_times):7.1f} ms  (min {min(total_times):.1f} ms)")
+
+if __name__ == "__main__":
+    main()
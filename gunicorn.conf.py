@@ -0,0 +1,12 @@
+# Gunicorn settings, read from the working directory (`gunicorn --preload wsgi:app`)
+
+def post_worker_init(worker):
+    """Load the listing index before the worker takes requests (services are per worker)"""
+    # Imported here so config is read after wsgi.py has loaded .env
+    from app.config import LISTING_INDEX_WARM_TIMEOUT_SECONDS
+    from app.services import get_listing_index
+    
+    index = get_listing_index()
+    index.start()
+    if not index.wait_loaded(LISTING_INDEX_WARM_TIMEOUT_SECONDS):
+        worker.log.warning("Listing index still loading; searches will wait for it")
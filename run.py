@@ -1,10 +1,13 @@
 import os
-from app import app
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before config is read)
 load_dotenv()
 
+from app import create_app
+
+app = create_app()
+
 if __name__ == '__main__':
     # Get port from environment variable or use default
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,12 @@
+import pytest
+from app import create_app, mongo
+
+mongomock = pytest.importorskip("mongomock")
+
+@pytest.fixture
+def db():
+    """In-memory database behind the app's db handle"""
+    app = create_app({"SCHEDULER_ENABLED": False, "TESTING": True})
+    mongo.db = mongomock.MongoClient().db
+    with app.app_context():
+        yield mongo.db
@@ -0,0 +1,17 @@
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from app.models import identity_map
+from app.models.listing import Listing
+
+def _listing(document, fields=None):
+    return Listing.from_raw(RawBSONDocument(bson.encode(document)), fields)
+
+def test_projected_instance_is_not_remembered(db):
+    listing_id = ObjectId()
+    
+    identity_map.add(_listing({"_id": listing_id, "price": 1500}, fields=["price"]))
+    assert identity_map.get(Listing, listing_id) is None
+    
+    full = identity_map.add(_listing({"_id": listing_id, "title": "Loft", "price": 1500}))
+    assert identity_map.get(Listing, listing_id) is full
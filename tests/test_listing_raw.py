@@ -0,0 +1,45 @@
+from app.models.listing_raw import ListingRaw
+from app.services.listing_service import EXISTING_LISTING_PROJECTION, ListingService
+
+PAYLOAD = {
+    "id": "100-Main-St-Austin-TX-78701",
+    "formattedAddress": "100 Main St, Austin, TX 78701",
+    "price": 1500,
+    "bedrooms": 2,
+    "bathrooms": 1,
+    "propertyType": "Apartment",
+    "status": "Active"
+}
+
+def _expired_listing(db, payload):
+    """Insert an expired listing holding a reference to payload, so every re-ingest updates it"""
+    return db.listings.insert_one({
+        "external_id": payload["id"],
+        "status": "expired",
+        "price": payload["price"],
+        "raw_id": ListingRaw.store(payload)
+    }).inserted_id
+
+def _reingest(db, listing_id, payload):
+    db.listings.update_one({"_id": listing_id}, {"$set": {"status": "expired"}})
+    existing = db.listings.find_one({"_id": listing_id}, EXISTING_LISTING_PROJECTION)
+    ListingService()._update_existing_listing(existing, payload)
+
+def test_update_with_same_payload_keeps_one_reference(db):
+    listing_id = _expired_listing(db, PAYLOAD)
+    
+    _reingest(db, listing_id, PAYLOAD)
+    _reingest(db, listing_id, PAYLOAD)
+    
+    raw = db.listing_raw.find_one({"_id": ListingRaw.content_hash(PAYLOAD)})
+    assert raw["refs"] == 1
+    assert db.listings.find_one({"_id": listing_id})["raw_id"] == raw["_id"]
+
+def test_update_with_new_payload_releases_old_one(db):
+    listing_id = _expired_listing(db, PAYLOAD)
+    changed = {**PAYLOAD, "price": 1400}
+    
+    _reingest(db, listing_id, changed)
+    
+    assert db.listing_raw.find_one({"_id": ListingRaw.content_hash(PAYLOAD)}) is None
+    assert db.listing_raw.find_one({"_id": ListingRaw.content_hash(changed)})["refs"] == 1
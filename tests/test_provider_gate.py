@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+from app.utils.admission import ProviderGate
+
+def test_workers_share_the_cap(db):
+    # Each worker process has its own gate over the same slots
+    first, second = ProviderGate({"openai": 2}), ProviderGate({"openai": 2})
+    
+    lease = first.try_acquire("openai")
+    assert second.try_acquire("openai")
+    assert not first.try_acquire("openai")
+    assert first.in_flight() == {"openai": 2}
+    
+    first.release(lease)
+    assert second.try_acquire("openai")
+
+def test_expired_lease_is_taken_over(db):
+    gate = ProviderGate({"rentcast": 1})
+    lease = gate.try_acquire("rentcast")
+    
+    # The worker holding the slot died and its lease ran out
+    db.provider_slots.update_one({"_id": lease[0]}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+    assert gate.in_flight() == {"rentcast": 0}
+    taken = gate.try_acquire("rentcast")
+    assert taken
+    
+    # Releasing the stale lease leaves the new holder's slot alone
+    gate.release(lease)
+    assert gate.in_flight() == {"rentcast": 1}
+
+def test_renew_extends_only_the_current_lease(db):
+    gate = ProviderGate({"rentcast": 1})
+    lease = gate.try_acquire("rentcast")
+    
+    db.provider_slots.update_one({"_id": lease[0]}, {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=1)}})
+    assert gate.renew(lease)
+    assert db.provider_slots.find_one({"_id": lease[0]})["expires_at"] > datetime.utcnow() + timedelta(seconds=60)
+    
+    gate.release(lease)
+    assert not gate.renew(lease)
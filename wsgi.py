@@ -0,0 +1,9 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (before config is read)
+load_dotenv()
+
+from app import create_app
+
+# WSGI entry point, e.g. `gunicorn --preload wsgi:app`
+app = create_app()